@@ -0,0 +1,71 @@
+"""Reports the memory held by loaded data model versions as JSON and compacted
+with `dmdj.compact`, and the time to plan each form.
+
+Run from the repository root:
+
+    python benchmarks/bench_compact.py [tables] [versions]
+
+Memory is measured with `tracemalloc` (Python 3 only); on Python 2 only the
+plan times are reported.
+
+Each version is decoded from its own JSON document, as if fetched separately,
+and differs from the first only in its version string.
+"""
+
+import json
+import sys
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
+
+from common import setup, timed
+
+setup()
+
+from dmdj.compact import compact
+from dmdj.makers import plan_model
+from synthetic import make_data_model
+
+
+def retained(load, documents):
+
+    if tracemalloc is None:
+        return None, [load(d) for d in documents]
+
+    tracemalloc.start()
+    try:
+        start = tracemalloc.get_traced_memory()[0]
+        loaded = [load(d) for d in documents]
+        return tracemalloc.get_traced_memory()[0] - start, loaded
+    finally:
+        tracemalloc.stop()
+
+
+def main(tables=300, versions=3):
+
+    data_model = make_data_model(tables=tables, fields=20, constraints=3,
+                                 indexes=2)
+    documents = []
+
+    for i in range(versions):
+        data_model['version'] = '1.%d.0' % i
+        documents.append(json.dumps(data_model))
+
+    json_bytes, json_models = retained(json.loads, documents)
+    compact_bytes, compact_models = retained(
+        lambda d: compact(json.loads(d)), documents)
+
+    print('%d tables, %d versions' % (tables, versions))
+    print('%-8s %12s %10s' % ('', 'memory (MB)', 'plan (s)'))
+
+    for name, size, models in (('json', json_bytes, json_models),
+                               ('compact', compact_bytes, compact_models)):
+        memory = '%12.1f' % (size / 1e6) if size is not None else \
+            '%12s' % 'n/a'
+        print('%-8s %s %10.3f' % (name, memory, timed(plan_model, models[0])))
+
+
+if __name__ == '__main__':
+    main(*(int(a) for a in sys.argv[1:]))
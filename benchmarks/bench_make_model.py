@@ -0,0 +1,168 @@
+"""Compares the old nested-loop constraint grouping with the single-pass one.
+
+Run from the repository root:
+
+    python benchmarks/bench_make_model.py [tables]
+
+The legacy functions below are the pre-grouping bodies of `make_model` and
+`make_table`, kept here only so the two can be timed side by side.
+"""
+
+import sys
+from copy import copy, deepcopy
+
+from common import isolated, setup, timed
+
+setup()
+
+from django.db.models import Model
+from dmdj.makers import (PKEY_JSON, make_field, make_meta, make_model,
+                         group_by_table)
+from synthetic import make_data_model
+
+
+def legacy_make_table(table_json, constraints, indexes, bases, module,
+                      app_label):
+
+    class_name = ''.join((i.capitalize() for i in
+                          table_json['name'].split('_')))
+
+    class_contents = {'__module__': module}
+
+    if constraints.get('primary_keys') and \
+            len(constraints['primary_keys'][0]['fields']) > 1:
+
+        if 'uniques' not in constraints:
+            constraints['uniques'] = []
+
+        constraints['uniques'].append({
+            'name': 'xnk_%s' % table_json['name'],
+            'table': table_json['name'],
+            'fields': copy(constraints['primary_keys'][0]['fields'])
+        })
+
+        if 'not_null' not in constraints:
+            constraints['not_null'] = []
+
+        for field in constraints['primary_keys'][0]['fields']:
+            constraints['not_null'].append({
+                'table': table_json['name'],
+                'field': field
+            })
+
+    if not constraints.get('primary_keys') or \
+            len(constraints['primary_keys'][0]['fields']) > 1:
+
+        pkey_json = copy(PKEY_JSON)
+        pkey_json['table'] = table_json['name']
+        table_json['fields'].append(pkey_json)
+
+        constraints['primary_keys'] = [{
+            'name': 'xpk_%s' % table_json['name'],
+            'table': table_json['name'],
+            'fields': ['id']
+        }]
+
+    class_contents['Meta'] = make_meta(table_json, constraints, indexes,
+                                       app_label)
+
+    for field_json in table_json['fields']:
+
+        field_cons = {}
+
+        for con_type, con_list in constraints.items():
+
+            field_cons[con_type] = []
+
+            for con in con_list:
+
+                if 'fields' not in con:
+                    fields = [con.get('field') or con.get('source_field')]
+                else:
+                    fields = con['fields']
+                if field_json['name'] in fields:
+                    field_cons[con_type].append(con)
+
+        field_idxs = []
+
+        for index in indexes:
+            if field_json['name'] in index['fields']:
+                field_idxs.append(index)
+
+        class_contents[field_json['name']] = make_field(field_json, field_cons,
+                                                        field_idxs)
+
+    return type(str(class_name), bases, class_contents)
+
+
+def legacy_group_by_table(data_model):
+
+    groups = {}
+
+    for table_json in data_model['tables']:
+
+        table_cons = {}
+
+        for con_type, con_list in data_model['schema']['constraints'].items():
+
+            table_cons[con_type] = []
+
+            for con in con_list:
+                table_name = con.get('table') or con.get('source_table')
+                if table_name == table_json['name']:
+                    table_cons[con_type].append(con)
+
+        table_idxs = []
+
+        for index in data_model['schema']['indexes']:
+            if index['table'] == table_json['name']:
+                table_idxs.append(index)
+
+        groups[table_json['name']] = (table_cons, table_idxs)
+
+    return groups
+
+
+def legacy_make_model(data_model, bases, module, app_label):
+
+    output_models = []
+
+    groups = legacy_group_by_table(data_model)
+
+    for table_json in data_model['tables']:
+        table_cons, table_idxs = groups[table_json['name']]
+        output_models.append(legacy_make_table(table_json, table_cons,
+                                               table_idxs, bases, module,
+                                               app_label))
+
+    return output_models
+
+
+def main(tables=1000):
+
+    data_model = make_data_model(tables=tables, fields=10, constraints=3,
+                                 indexes=2)
+
+    rows = [
+        ('group tables', timed(legacy_group_by_table, data_model),
+         timed(group_by_table, data_model)),
+        ('make_model', isolated(timed, legacy_make_model,
+                                deepcopy(data_model), (Model,),
+                                'bench.legacy', 'bench'),
+         isolated(timed, make_model, deepcopy(data_model), (Model,),
+                  'bench.grouped', 'bench'))
+    ]
+
+    print('%d tables, %d constraints, %d indexes' % (
+        tables,
+        sum(len(v) for v in data_model['schema']['constraints'].values()),
+        len(data_model['schema']['indexes'])))
+    print('%-14s %10s %10s %8s' % ('', 'before (s)', 'after (s)', 'speedup'))
+
+    for name, before, after in rows:
+        print('%-14s %10.3f %10.3f %7.1fx' % (name, before, after,
+                                              before / after))
+
+
+if __name__ == '__main__':
+    main(*(int(a) for a in sys.argv[1:]))
@@ -0,0 +1,63 @@
+"""Reports cold vs. warm model generation with the on-disk plan cache.
+
+Run from the repository root:
+
+    python benchmarks/bench_plan_cache.py [tables]
+
+Cold runs plan the synthetic data model from its JSON, warm runs load the
+pickled plan from `dmdj.cache`. Building the Django classes is timed
+separately, in a fresh process each time, since it is the same either way.
+"""
+
+import shutil
+import sys
+import tempfile
+
+from common import isolated, setup, timed
+
+setup()
+
+from django.db.models import Model
+from dmdj.cache import get_digest, load_plan
+from dmdj.makers import build_model, plan_model
+from synthetic import make_data_model
+
+
+def generate(data_model, cache_dir):
+    build_model(load_plan(data_model, cache_dir), (Model,), 'bench.models',
+                'bench')
+
+
+def main(tables=1000):
+
+    data_model = make_data_model(tables=tables, fields=10, constraints=3,
+                                 indexes=2)
+    cache_dir = tempfile.mkdtemp()
+
+    try:
+        rows = [
+            ('digest', timed(get_digest, data_model)),
+            ('plan_model', timed(plan_model, data_model)),
+            ('load_plan cold', timed(load_plan, data_model, cache_dir)),
+            ('load_plan warm', timed(load_plan, data_model, cache_dir))
+        ]
+
+        shutil.rmtree(cache_dir)
+
+        rows.extend([
+            ('generate cold', isolated(timed, generate, data_model,
+                                       cache_dir)),
+            ('generate warm', isolated(timed, generate, data_model,
+                                       cache_dir))
+        ])
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    print('%d tables' % tables)
+
+    for name, seconds in rows:
+        print('%-16s %8.3f s' % (name, seconds))
+
+
+if __name__ == '__main__':
+    main(*(int(a) for a in sys.argv[1:]))
@@ -0,0 +1,134 @@
+"""Reports per-worker startup time and memory of forked workers with and
+without `dmdj.preload`.
+
+Run from the repository root (Linux only, as it reads `/proc`):
+
+    python benchmarks/bench_preload.py [tables] [workers]
+
+Each mode runs in a fresh process acting as the master, which forks the
+workers:
+
+- `cold` builds the models in each worker after the fork.
+- `fork` builds the models in the master, as `preload_app` does.
+- `preload` also calls `dmdj.preload.preload` in the master before forking.
+
+Each worker then touches every model as a first request would (looking up
+its fields and instantiating it) and runs a full collection, as workers
+eventually do. Startup is the time from the fork until then. RSS is the
+worker's resident memory, most of it shared with the master; private is the
+memory only the worker holds, i.e. the pages it built or copied on write.
+"""
+
+import json
+import os
+import sys
+import time
+
+from common import isolated, setup
+
+setup()
+
+import gc
+
+from django.db.models import Model
+from dmdj.makers import make_model
+from dmdj.preload import preload
+from synthetic import make_data_model
+
+MODES = ('cold', 'fork', 'preload')
+
+
+def memory():
+    # Kilobytes of resident and private (unshared) memory.
+    values = {}
+
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                values[parts[0].rstrip(':')] = int(parts[1])
+
+    return (values['Rss'],
+            values['Private_Clean'] + values['Private_Dirty'])
+
+
+def build(data_model):
+    return make_model(data_model, (Model,), 'bench.models', 'bench')
+
+
+def first_request(models):
+
+    for model in models:
+        model._meta.get_fields()
+        model()
+
+    gc.collect()
+
+
+def worker(mode, data_model, models, write):
+
+    start = time.time()
+
+    if mode == 'cold':
+        models = build(data_model)
+
+    first_request(models)
+    seconds = time.time() - start
+    rss, private = memory()
+
+    os.write(write, (json.dumps([seconds, rss, private]) + '\n').encode())
+
+
+def run(mode, tables, workers):
+
+    data_model = make_data_model(tables=tables, fields=10, constraints=3,
+                                 indexes=2)
+    models = None
+
+    if mode != 'cold':
+        models = build(data_model)
+
+    if mode == 'preload':
+        preload(models)
+
+    read, write = os.pipe()
+    pids = []
+
+    for i in range(workers):
+        pid = os.fork()
+
+        if pid == 0:
+            try:
+                os.close(read)
+                worker(mode, data_model, models, write)
+            finally:
+                os._exit(0)
+
+        pids.append(pid)
+
+    os.close(write)
+
+    for pid in pids:
+        os.waitpid(pid, 0)
+
+    with os.fdopen(read) as f:
+        return [json.loads(line) for line in f]
+
+
+def main(tables=1000, workers=4):
+
+    print('%d tables, %d workers, Python %s' % (tables, workers,
+                                                sys.version.split()[0]))
+    print('%-8s %10s %10s %12s' % ('mode', 'startup s', 'RSS MB',
+                                   'private MB'))
+
+    for mode in MODES:
+        results = isolated(run, mode, tables, workers)
+
+        for seconds, rss, private in results:
+            print('%-8s %10.3f %10.1f %12.1f' % (mode, seconds, rss / 1024.0,
+                                                 private / 1024.0))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
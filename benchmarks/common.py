@@ -0,0 +1,37 @@
+"""Helpers shared by the benchmark scripts."""
+
+import multiprocessing
+import time
+
+import django
+from django.conf import settings
+
+
+def setup():
+
+    if not settings.configured:
+        settings.configure()
+
+    if hasattr(django, 'setup'):
+        django.setup()
+
+
+def timed(func, *args):
+    start = time.time()
+    func(*args)
+    return time.time() - start
+
+
+def isolated(func, *args):
+    """Calls `func(*args)` in a fresh worker process and returns its result.
+
+    Each measurement runs in its own worker so models registered by an
+    earlier run don't inflate Django's app registry bookkeeping.
+    """
+
+    pool = multiprocessing.Pool(1)
+    try:
+        return pool.apply(func, args)
+    finally:
+        pool.close()
+        pool.join()
@@ -0,0 +1,221 @@
+"""Benchmark suite for model generation at scale.
+
+Run from the repository root:
+
+    python benchmarks/suite.py --tables 500 --fields 20 --output results.jsonl
+
+For each of `make_field`, `make_meta`, `make_table` and `make_model` this
+measures, on a synthetic data model (see `synthetic.py`):
+
+    - wall time, in a fresh process so earlier runs don't affect the app
+      registry,
+    - time spent in Django's app registry `register_model`, which is part of
+      the wall time,
+    - peak traced memory with `tracemalloc` (Python 3 only), in a separate
+      run since tracing slows everything down.
+
+Each run is appended as one JSON object per line to `--output`, so results
+can be compared over time; `--compare` prints the change from the last
+recorded run with the same parameters.
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+from datetime import datetime
+
+from common import isolated, setup
+
+setup()
+
+import django
+from django.apps import apps
+from django.db.models import Model
+from dmdj import __version__
+from dmdj.makers import (group_by_field, group_by_table, make_field,
+                         make_meta, make_model, make_table)
+from synthetic import make_data_model
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
+
+TARGETS = ['make_field', 'make_meta', 'make_table', 'make_model']
+
+
+def prepare(target, data_model):
+    """Returns a function running `target` over the whole data model, with
+    the constraint grouping it isn't responsible for done up front.
+    """
+
+    table_groups = group_by_table(data_model)
+    tables = [(t, ) + table_groups[t['name']] for t in data_model['tables']]
+
+    if target == 'make_field':
+        calls = []
+        for table_json, cons, idxs in tables:
+            field_groups = group_by_field(table_json['fields'], cons, idxs)
+            for field_json in table_json['fields']:
+                calls.append((field_json, ) + field_groups[field_json['name']])
+        return lambda: [make_field(*args) for args in calls]
+
+    if target == 'make_meta':
+        return lambda: [make_meta(t, c, i, 'bench') for t, c, i in tables]
+
+    if target == 'make_table':
+        return lambda: [make_table(t, c, i, (Model,), 'bench.models', 'bench')
+                        for t, c, i in tables]
+
+    return lambda: make_model(data_model, (Model,), 'bench.models', 'bench')
+
+
+def measure_time(target, params):
+
+    run = prepare(target, make_data_model(**params))
+    registry = [0.0]
+    register_model = apps.register_model
+
+    def timed_register_model(app_label, model):
+        start = time.time()
+        register_model(app_label, model)
+        registry[0] += time.time() - start
+
+    apps.register_model = timed_register_model
+
+    try:
+        start = time.time()
+        run()
+        return time.time() - start, registry[0]
+    finally:
+        apps.register_model = register_model
+
+
+def measure_memory(target, params):
+
+    if tracemalloc is None:
+        return None
+
+    run = prepare(target, make_data_model(**params))
+
+    tracemalloc.start()
+
+    try:
+        run()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_suite(params, repeat):
+
+    results = {}
+
+    for target in TARGETS:
+
+        times = [isolated(measure_time, target, params)
+                 for _ in range(repeat)]
+        best = min(times)
+
+        results[target] = {
+            'seconds': best[0],
+            'registry_seconds': best[1],
+            'peak_bytes': isolated(measure_memory, target, params)
+        }
+
+    return {
+        'date': datetime.utcnow().isoformat(),
+        'dmdj': __version__,
+        'django': django.get_version(),
+        'python': platform.python_version(),
+        'params': params,
+        'repeat': repeat,
+        'results': results
+    }
+
+
+def load_previous(path, params):
+
+    previous = None
+
+    try:
+        with open(path) as f:
+            for line in f:
+                record = json.loads(line)
+                if record['params'] == params:
+                    previous = record
+    except IOError:
+        pass
+
+    return previous
+
+
+def report(record, previous=None):
+
+    print('%(tables)d tables, %(fields)d fields, %(constraints)s constraints '
+          'and %(indexes)s indexes per table' % record['params'])
+    print('%-11s %10s %12s %12s %9s' % ('', 'wall (s)', 'registry (s)',
+                                        'peak (MiB)', 'vs. last'))
+
+    for target in TARGETS:
+
+        result = record['results'][target]
+        peak = result['peak_bytes']
+        change = ''
+
+        if previous:
+            before = previous['results'][target]['seconds']
+            change = '%+8.1f%%' % (100.0 * result['seconds'] / before - 100)
+
+        print('%-11s %10.3f %12.3f %12s %9s' % (
+            target, result['seconds'], result['registry_seconds'],
+            '-' if peak is None else '%.1f' % (peak / 1024.0 / 1024.0),
+            change))
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--tables', type=int, default=1000)
+    parser.add_argument('--fields', type=int, default=10,
+                        help='Fields per table.')
+    parser.add_argument('--constraints', type=float, default=1.0,
+                        help='Extra constraints per table.')
+    parser.add_argument('--indexes', type=float, default=1.0,
+                        help='Indexes per table.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Timing runs per target, the best is kept.')
+    parser.add_argument('--output',
+                        help='JSON lines file the results are appended to.')
+    parser.add_argument('--compare', action='store_true',
+                        help='Compare with the last run in --output with the '
+                             'same parameters.')
+    args = parser.parse_args(argv)
+
+    params = {
+        'tables': args.tables,
+        'fields': args.fields,
+        'constraints': args.constraints,
+        'indexes': args.indexes,
+        'seed': args.seed
+    }
+
+    previous = None
+
+    if args.compare and args.output:
+        previous = load_previous(args.output, params)
+
+    record = run_suite(params, args.repeat)
+
+    report(record, previous)
+
+    if args.output:
+        with open(args.output, 'a') as f:
+            f.write(json.dumps(record, sort_keys=True) + '\n')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
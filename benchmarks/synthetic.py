@@ -0,0 +1,114 @@
+"""Synthetic data models for benchmarking the dmdj makers.
+
+The generated documents match the chop-dbhi/data-models service format, so
+they can be fed straight into `dmdj.makers.make_model`.
+"""
+
+import random
+
+FIELD_TYPES = ['integer', 'string', 'decimal', 'date', 'datetime', 'text',
+               'boolean']
+
+
+def make_data_model(tables=1000, fields=10, constraints=1.0, indexes=1.0,
+                    seed=0):
+    """Returns a synthetic data model dictionary.
+
+    `tables` is the number of tables and `fields` the number of fields per
+    table.
+
+    `constraints` and `indexes` are densities: the expected number of extra
+    unique/foreign key/not null constraints and indexes per table. Every table
+    gets a primary key, every third one a composite one.
+
+    `seed` seeds the random number generator so runs are comparable.
+    """
+
+    rng = random.Random(seed)
+
+    data_model = {
+        'name': 'synthetic',
+        'version': '0.0.0',
+        'tables': [],
+        'schema': {
+            'constraints': {
+                'primary_keys': [],
+                'foreign_keys': [],
+                'uniques': [],
+                'not_null': []
+            },
+            'indexes': []
+        }
+    }
+
+    cons = data_model['schema']['constraints']
+    idxs = data_model['schema']['indexes']
+
+    for t in range(tables):
+
+        table_name = 'table_%d' % t
+        field_names = ['field_%d' % f for f in range(fields)]
+
+        data_model['tables'].append({
+            'name': table_name,
+            'fields': [{
+                'name': name,
+                'type': FIELD_TYPES[f % len(FIELD_TYPES)],
+                'length': 0,
+                'precision': 0,
+                'scale': 0,
+                'default': '',
+                'description': 'Field %s of %s.' % (name, table_name),
+                'label': name,
+                'required': False
+            } for f, name in enumerate(field_names)]
+        })
+
+        pk_fields = field_names[:2] if t % 3 == 0 else field_names[:1]
+
+        cons['primary_keys'].append({
+            'name': 'xpk_%s' % table_name,
+            'table': table_name,
+            'fields': pk_fields
+        })
+
+        extra = int(constraints) + (rng.random() < constraints % 1)
+
+        for _ in range(extra):
+
+            kind = rng.choice(['foreign_keys', 'uniques', 'not_null'])
+            field = rng.choice(field_names[2:] or field_names)
+
+            if kind == 'foreign_keys' and t > 0:
+                target = rng.randrange(t)
+                cons['foreign_keys'].append({
+                    'name': 'fk_%s_%s' % (table_name, field),
+                    'source_table': table_name,
+                    'source_field': field,
+                    'target_table': 'table_%d' % target,
+                    'target_field': 'field_0'
+                })
+            elif kind == 'uniques':
+                cons['uniques'].append({
+                    'name': 'uq_%s_%s' % (table_name, field),
+                    'table': table_name,
+                    'fields': [field]
+                })
+            else:
+                cons['not_null'].append({
+                    'table': table_name,
+                    'field': field
+                })
+
+        extra = int(indexes) + (rng.random() < indexes % 1)
+
+        for i in range(extra):
+            idx_fields = rng.sample(field_names, min(len(field_names),
+                                                     1 + i % 2))
+            idxs.append({
+                'name': 'idx_%s_%d' % (table_name, i),
+                'table': table_name,
+                'fields': idx_fields
+            })
+
+    return data_model
@@ -0,0 +1,3 @@
+from dmdj.cli import main
+
+main()
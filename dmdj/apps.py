@@ -0,0 +1,81 @@
+import sys
+import types
+
+from django.apps import AppConfig
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from dmdj.cache import load_version_plan
+from dmdj.makers import build_model
+
+MODEL_BASE = 'django.db.models.Model'
+
+
+class DataModelsConfig(AppConfig):
+    """An app config that builds its app's models from data models while
+    Django imports models, instead of a `models.py` that fetches and
+    generates them on every import.
+
+    The data models are listed by the `data_models` attribute, and by the
+    `DMDJ_MODELS` setting for those whose `app_label` is the app's label, as
+    dictionaries of `model` and `version` and optionally `bases`, a list of
+    dot separated paths of model base classes (`django.db.models.Model` by
+    default), and `offline`, `ttl` and `cache_dir`, as for
+    `dmdj.settings.fetch_model`:
+
+        DMDJ_MODELS = [{'model': 'pedsnet', 'version': '2.1.0',
+                        'app_label': 'pedsnet'}]
+
+    Plans are loaded with `dmdj.cache.load_version_plan`, so starting with
+    an unchanged cached data model only unpickles its plan and builds the
+    classes. The models' module is the app's `models` module, which is
+    created if the app has none; the models are added to it unless it
+    defines the same names.
+    """
+
+    data_models = ()
+
+    def get_data_models(self):
+        """Returns the list of data model dictionaries of the app."""
+
+        return list(self.data_models) + [
+            d for d in getattr(settings, 'DMDJ_MODELS', ())
+            if d['app_label'] == self.label]
+
+    def make_models(self):
+        """Builds and returns the models of the app's data models."""
+
+        module = '%s.models' % self.name
+        models = []
+
+        for options in self.get_data_models():
+
+            table_specs = load_version_plan(
+                options['model'], options['version'],
+                options.get('cache_dir'), options.get('ttl'),
+                options.get('offline', False))
+
+            bases = tuple(b if isinstance(b, type) else import_string(b)
+                          for b in options.get('bases', [MODEL_BASE]))
+
+            models.extend(build_model(table_specs, bases, module,
+                                      self.label))
+
+        return models
+
+    def import_models(self, *args):
+
+        models = self.make_models()
+
+        # Before Django 2.0 the app's models dictionary is passed.
+        super(DataModelsConfig, self).import_models(*args)
+
+        if self.models_module is None:
+            name = '%s.models' % self.name
+            self.models_module = sys.modules[name] = types.ModuleType(
+                str(name))
+            setattr(self.module, 'models', self.models_module)
+
+        for model in models:
+            if not hasattr(self.models_module, model.__name__):
+                setattr(self.models_module, model.__name__, model)
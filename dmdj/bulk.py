@@ -0,0 +1,272 @@
+from collections import namedtuple
+from contextlib import contextmanager
+from multiprocessing.pool import ThreadPool
+
+from django.db import connections, transaction
+
+# What a model's table should have besides its primary key: sets of column
+# name tuples for `indexes` and `uniques` and of (column, target table,
+# target column) tuples for `foreign_keys`.
+Declared = namedtuple('Declared', ['indexes', 'uniques', 'foreign_keys'])
+
+# An index or constraint dropped for a bulk load. `kind` is 'index', 'unique'
+# or 'foreign_key' and `definition` the SQL that recreates it.
+Dropped = namedtuple('Dropped', ['table', 'kind', 'name', 'definition'])
+
+PG_INDEXES = '''
+SELECT i.relname, ix.indisunique, pg_get_indexdef(ix.indexrelid)
+FROM pg_index ix
+JOIN pg_class i ON i.oid = ix.indexrelid
+JOIN pg_class t ON t.oid = ix.indrelid
+WHERE t.relname = %s AND pg_table_is_visible(t.oid) AND NOT ix.indisprimary
+AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = ix.indexrelid)
+'''
+
+PG_CONSTRAINTS = '''
+SELECT c.conname, c.contype, pg_get_constraintdef(c.oid)
+FROM pg_constraint c
+JOIN pg_class t ON t.oid = c.conrelid
+WHERE t.relname = %s AND pg_table_is_visible(t.oid) AND c.contype IN ('f', 'u')
+'''
+
+SQLITE_INDEXES = '''
+SELECT name, sql FROM sqlite_master
+WHERE type = 'index' AND tbl_name = %s AND sql IS NOT NULL
+'''
+
+
+def _rel(field):
+    return field.remote_field if hasattr(field, 'remote_field') else field.rel
+
+
+def get_declared(model):
+    """Returns the `Declared` indexes and constraints of a model's table, from
+    the `db_index`, `unique` and foreign keys of its fields, as set by
+    `make_field`, and its `index_together` and `unique_together`, as set by
+    `make_meta`.
+    """
+
+    indexes = set()
+    uniques = set()
+    foreign_keys = set()
+
+    columns = dict((f.name, f.column) for f in model._meta.local_fields)
+
+    for field in model._meta.local_fields:
+
+        if field.primary_key:
+            continue
+
+        if field.unique:
+            uniques.add((field.column,))
+        elif field.db_index:
+            indexes.add((field.column,))
+
+        if _rel(field) is not None:
+            target = field.target_field if hasattr(field, 'target_field') \
+                else field.related_field
+            foreign_keys.add((field.column, target.model._meta.db_table,
+                              target.column))
+
+    for names in model._meta.index_together:
+        indexes.add(tuple(columns[n] for n in names))
+
+    for names in model._meta.unique_together:
+        uniques.add(tuple(columns[n] for n in names))
+
+    return Declared(indexes, uniques, foreign_keys)
+
+
+def check_schema(models, using='default'):
+    """Returns a list of the declared indexes and constraints missing from
+    the models' tables, as descriptions, or an empty list.
+
+    An index is satisfied by any index or unique constraint on the same
+    columns, in the same order.
+    """
+
+    connection = connections[using]
+    introspection = connection.introspection
+    missing = []
+
+    with connection.cursor() as cursor:
+
+        for model in models:
+
+            table = model._meta.db_table
+            declared = get_declared(model)
+            existing = introspection.get_constraints(cursor, table).values()
+
+            indexes = set(tuple(c['columns']) for c in existing
+                          if c['index'] or c['unique'])
+            uniques = set(tuple(c['columns']) for c in existing
+                          if c['unique'])
+            foreign_keys = set(introspection.get_key_columns(cursor, table))
+
+            for columns in sorted(declared.indexes - indexes):
+                missing.append('%s: index on %s' % (table, ', '.join(
+                    columns)))
+
+            for columns in sorted(declared.uniques - uniques):
+                missing.append('%s: unique constraint on %s' % (
+                    table, ', '.join(columns)))
+
+            for fkey in sorted(declared.foreign_keys - foreign_keys):
+                missing.append('%s: foreign key %s to %s.%s' % (
+                    (table,) + fkey))
+
+    return missing
+
+
+def _quote(connection, name):
+    return connection.ops.quote_name(name)
+
+
+def _find_dropped(cursor, connection, table, uniques):
+
+    dropped = []
+    quoted = _quote(connection, table)
+
+    if connection.vendor == 'postgresql':
+
+        cursor.execute(PG_CONSTRAINTS, [table])
+
+        for name, contype, definition in cursor.fetchall():
+            if contype == 'u' and not uniques:
+                continue
+            dropped.append(Dropped(
+                table, 'foreign_key' if contype == 'f' else 'unique', name,
+                'ALTER TABLE %s ADD CONSTRAINT %s %s' % (
+                    quoted, _quote(connection, name), definition)))
+
+        cursor.execute(PG_INDEXES, [table])
+
+        for name, unique, definition in cursor.fetchall():
+            if not unique or uniques:
+                dropped.append(Dropped(table, 'unique' if unique else 'index',
+                                       name, definition))
+
+    else:
+        # SQLite can only drop indexes created by CREATE INDEX; unique and
+        # foreign key constraints are part of the table.
+        cursor.execute(SQLITE_INDEXES, [table])
+
+        for name, definition in cursor.fetchall():
+            unique = definition.upper().startswith('CREATE UNIQUE')
+            if not unique or uniques:
+                dropped.append(Dropped(table, 'unique' if unique else 'index',
+                                       name, definition))
+
+    return dropped
+
+
+def drop_constraints(models, using='default', uniques=False):
+    """Drops the indexes and foreign key constraints of the models' tables,
+    in a single transaction, and returns a list of what was dropped as
+    `Dropped` tuples, to pass to `rebuild_constraints`.
+
+    Primary keys are kept. Unique constraints are kept unless `uniques` is
+    true, since without them duplicate rows can be loaded. On SQLite, unique
+    and foreign key constraints declared with the table can't be dropped, so
+    only separately created indexes are.
+    """
+
+    connection = connections[using]
+    dropped = []
+
+    with transaction.atomic(using):
+        with connection.cursor() as cursor:
+
+            for model in models:
+                dropped.extend(_find_dropped(cursor, connection,
+                                             model._meta.db_table, uniques))
+
+            # Foreign keys first, since they may depend on unique
+            # constraints.
+            order = {'foreign_key': 0, 'unique': 1, 'index': 2}
+
+            for item in sorted(dropped, key=lambda d: order[d.kind]):
+                if item.definition.startswith('CREATE'):
+                    cursor.execute('DROP INDEX %s' % _quote(connection,
+                                                            item.name))
+                else:
+                    cursor.execute('ALTER TABLE %s DROP CONSTRAINT %s' % (
+                        _quote(connection, item.table),
+                        _quote(connection, item.name)))
+
+    return dropped
+
+
+def _execute(using, statement):
+    # Runs in a pool thread, which has its own connection.
+    try:
+        with connections[using].cursor() as cursor:
+            cursor.execute(statement)
+    finally:
+        connections[using].close()
+
+
+def rebuild_constraints(dropped, using='default', workers=4):
+    """Recreates the indexes and constraints returned by `drop_constraints`.
+
+    On PostgreSQL, indexes and unique constraints are built by up to
+    `workers` connections at the same time, each statement in its own
+    transaction, and foreign keys are added afterwards, one at a time, so
+    their locks can't deadlock. Elsewhere, or inside an atomic block, whose
+    locks the other connections would wait on forever, the statements run
+    one after another in a single transaction on this connection.
+    """
+
+    connection = connections[using]
+    first = [d.definition for d in dropped if d.kind != 'foreign_key']
+    last = [d.definition for d in dropped if d.kind == 'foreign_key']
+
+    if connection.vendor != 'postgresql' or workers <= 1 or \
+            connection.in_atomic_block:
+        with transaction.atomic(using):
+            with connection.cursor() as cursor:
+                for statement in first + last:
+                    cursor.execute(statement)
+        return
+
+    pool = ThreadPool(workers)
+
+    try:
+        pool.map(lambda statement: _execute(using, statement), first)
+    finally:
+        pool.close()
+        pool.join()
+
+    with transaction.atomic(using):
+        with connection.cursor() as cursor:
+            for statement in last:
+                cursor.execute(statement)
+
+
+@contextmanager
+def bulk_load_mode(models, using='default', uniques=False, workers=4,
+                   check=True):
+    """Drops the indexes and foreign keys of the models' tables for the
+    duration of the block and yields the `Dropped` list.
+
+    Afterwards, even if the block raises, they are recreated with
+    `rebuild_constraints` and, if `check` is true, the tables are checked
+    against the models with `check_schema`, raising a `ValueError` listing
+    anything missing.
+
+    `uniques` is as for `drop_constraints` and `workers` as for
+    `rebuild_constraints`.
+    """
+
+    dropped = drop_constraints(models, using, uniques)
+
+    try:
+        yield dropped
+    finally:
+        rebuild_constraints(dropped, using, workers)
+
+    if check:
+        missing = check_schema(models, using)
+        if missing:
+            raise ValueError('The tables are missing:\n%s' % '\n'.join(
+                missing))
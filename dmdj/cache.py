@@ -0,0 +1,122 @@
+import hashlib
+import json
+import os
+import sys
+import time
+
+try:
+    import cPickle as pickle
+except ImportError:  # Python 3
+    import pickle
+
+from dmdj import __version__, makers
+from dmdj.compact import Record
+from dmdj.makers import build_model, plan_model
+from dmdj.settings import (CACHE_DIR, CACHE_TTL, _write_atomic, fetch_model,
+                           get_cache_path)
+
+
+def _get_prefix():
+    # What plans depend on besides the data model.
+    types = ','.join('%s=%s.%s' % (k, v.__module__, v.__name__)
+                     for k, v in sorted(makers.FIELD_TYPE_MAP.items()))
+    kwargs = ','.join('%s=%s' % item
+                      for item in sorted(makers.FIELD_KWARGS_MAP.items()))
+
+    return '%s:%d:%s:%s:' % (__version__, sys.version_info[0], types, kwargs)
+
+
+def get_digest(data_model):
+    """Returns a hex digest of the data model JSON that ignores key order.
+    A data model compacted with `dmdj.compact.compact` has the same digest.
+
+    The dmdj version, Python major version and the current contents of
+    `dmdj.makers.FIELD_TYPE_MAP` and `FIELD_KWARGS_MAP` are included, so
+    plans cached by a different release or interpreter, or before the maps
+    were changed, are never reused.
+    """
+
+    data = json.dumps(data_model, sort_keys=True, separators=(',', ':'),
+                      default=Record.to_dict)
+
+    return hashlib.sha1((_get_prefix() + data).encode('utf-8')).hexdigest()
+
+
+def get_plan_path(digest, cache_dir=None):
+    return os.path.join(cache_dir or CACHE_DIR, 'plans', '%s.pickle' % digest)
+
+
+def load_plan(data_model, cache_dir=None):
+    """Returns `plan_model(data_model)`, cached on disk by content hash.
+
+    `cache_dir` is the cache directory, `dmdj.settings.CACHE_DIR` by default.
+    Plans are pickled to `<cache_dir>/plans/<digest>.pickle`, where the digest
+    is from `get_digest`, so an unchanged data model is only planned once.
+    Unreadable cache files are ignored and replaced.
+    """
+
+    path = get_plan_path(get_digest(data_model), cache_dir)
+
+    try:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    except Exception:
+        # Missing, truncated or otherwise unreadable, plan it again.
+        pass
+
+    table_specs = plan_model(data_model)
+
+    _write_atomic(path, pickle.dumps(table_specs, pickle.HIGHEST_PROTOCOL))
+
+    return table_specs
+
+
+def make_cached_model(data_model, bases, module, app_label, cache_dir=None):
+    """Returns a list of dynamically constructed Django model classes, like
+    `dmdj.makers.make_model`, but planned with `load_plan`.
+    """
+
+    return build_model(load_plan(data_model, cache_dir), bases, module,
+                       app_label)
+
+
+def load_version_plan(model, version, cache_dir=None, ttl=None,
+                      offline=False):
+    """Returns the plan of a data model version from the service, like
+    `load_plan(fetch_model(model, version))` but without reading the JSON
+    when the plan of the cached copy is already cached.
+
+    The data model is fetched with `fetch_model`, and its arguments are the
+    same, unless the cached copy is within `ttl` or `offline` is true. The
+    plan is cached under a hash of the cached copy's bytes, so when they
+    haven't changed it is unpickled without parsing the JSON or planning.
+    """
+
+    path = get_cache_path(model, version, cache_dir)
+
+    if ttl is None:
+        ttl = CACHE_TTL
+
+    if not os.path.exists(path) or not (
+            offline or time.time() - os.path.getmtime(path) < ttl):
+        fetch_model(model, version, cache_dir, ttl, offline)
+
+    with open(path, 'rb') as f:
+        body = f.read()
+
+    digest = hashlib.sha1((_get_prefix() + 'file:').encode('utf-8'))
+    digest.update(body)
+    plan_path = get_plan_path(digest.hexdigest(), cache_dir)
+
+    try:
+        with open(plan_path, 'rb') as f:
+            return pickle.load(f)
+    except Exception:
+        pass
+
+    table_specs = plan_model(json.loads(body.decode('utf-8')))
+
+    _write_atomic(plan_path, pickle.dumps(table_specs,
+                                          pickle.HIGHEST_PROTOCOL))
+
+    return table_specs
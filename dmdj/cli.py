@@ -0,0 +1,288 @@
+import argparse
+import io
+import json
+import sys
+
+import django
+from django.conf import settings
+
+
+def _setup():
+
+    if not settings.configured:
+        settings.configure()
+
+    if hasattr(django, 'setup'):
+        django.setup()
+
+
+def _text(value):
+    # Arguments are byte strings on Python 2.
+    if isinstance(value, bytes):
+        return value.decode(sys.getfilesystemencoding() or 'utf-8')
+
+    return value
+
+
+def _write(output, text):
+
+    if isinstance(text, bytes):
+        text = text.decode('utf-8')
+
+    if output and output != '-':
+        with io.open(output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text)
+
+
+def _load_model(args):
+
+    if args.path:
+        with open(args.path) as f:
+            return json.load(f)
+
+    if not (args.model and args.version):
+        raise SystemExit('Either a data model JSON file or --model and '
+                         '--version are required.')
+
+    from dmdj.settings import fetch_model
+
+    return fetch_model(args.model, args.version, offline=args.offline)
+
+
+def codegen(args):
+
+    from dmdj.codegen import MODEL_BASE, make_source
+
+    source = make_source(_load_model(args), tuple(args.base or [MODEL_BASE]),
+                         args.app_label)
+
+    _write(args.output, source)
+
+
+def ddl(args):
+
+    from dmdj.ddl import make_ddl
+
+    script = make_ddl(_load_model(args), args.vendor).script()
+
+    _write(args.output, script)
+
+
+def _pairs(values, convert=str):
+
+    pairs = {}
+
+    for value in values or []:
+        if '=' not in value:
+            raise SystemExit('Expected TABLE=VALUE, got %s.' % value)
+        key, value = value.split('=', 1)
+        pairs.setdefault(key, []).append(convert(value))
+
+    return pairs
+
+
+def profile(args):
+
+    from dmdj.profiling import (apply_suggestions, profile_data_model,
+                                suggest_types)
+
+    data_model = _load_model(args)
+    sources = _pairs(args.data)
+
+    if not sources:
+        raise SystemExit('At least one --data TABLE=FILE is required.')
+
+    row_counts = dict((k, v[-1]) for k, v in _pairs(args.rows, int).items())
+
+    suggestions = suggest_types(
+        data_model, profile_data_model(data_model, sources, args.delimiter,
+                                       args.null),
+        args.headroom, row_counts)
+
+    for s in suggestions:
+        sys.stdout.write('%s.%s: %s (%s)\n' % (
+            s.table, s.field, ', '.join('%s=%s' % i for i in sorted(
+                s.changes.items())), s.reason))
+
+    if args.output:
+        _write(args.output, json.dumps(
+            apply_suggestions(data_model, suggestions), indent=2,
+            sort_keys=True))
+
+
+def validate(args):
+
+    from django.db.models import Model
+    from dmdj.makers import make_model
+    from dmdj.validation import validate_tables
+
+    sources = dict((k, v[-1]) for k, v in _pairs(args.data).items())
+
+    if not sources:
+        raise SystemExit('At least one --data TABLE=FILE is required.')
+
+    models = make_model(_load_model(args), (Model,), 'dmdj.validation',
+                        'dmdj_validate')
+
+    report = validate_tables(models, sources, args.workers,
+                             delimiter=args.delimiter, null=args.null)
+
+    for table, rows in report.rows.items():
+        sys.stdout.write('%s: %d rows\n' % (table, rows))
+
+    if not report:
+        sys.stdout.write(report.format() + '\n')
+        raise SystemExit(1)
+
+
+def _fetch_or_load(path, model, version, offline):
+
+    if path:
+        with open(path) as f:
+            return json.load(f)
+
+    from dmdj.settings import fetch_model
+
+    return fetch_model(model, version, offline=offline)
+
+
+def migration(args):
+
+    from django.db.migrations.writer import MigrationWriter
+    from dmdj.operations import make_migration
+
+    # A single file is the new data model of an initial migration.
+    if args.old and not args.new:
+        args.old, args.new = None, args.old
+
+    if not (args.new or (args.model and args.version)):
+        raise SystemExit('Either a data model JSON file or --model and '
+                         '--version are required.')
+
+    old_model = None
+
+    if args.old or args.from_version:
+        old_model = _fetch_or_load(args.old, args.model, args.from_version,
+                                   args.offline)
+
+    new_model = _fetch_or_load(args.new, args.model, args.version,
+                               args.offline)
+
+    dependencies = [tuple(d.split('.', 1)) for d in args.dependency or []]
+
+    source = MigrationWriter(make_migration(
+        old_model, new_model, args.app_label, args.name,
+        dependencies)).as_string()
+
+    _write(args.output, source)
+
+
+def add_model_arguments(parser):
+
+    parser.add_argument('path', nargs='?',
+                        help='Data model JSON file. If omitted, --model and '
+                             '--version are fetched from the service.')
+    parser.add_argument('--model', help='Data model name, e.g. pedsnet.')
+    parser.add_argument('--version', help='Data model version, e.g. 2.1.0.')
+    parser.add_argument('--offline', action='store_true',
+                        help='Only use the local data model cache.')
+
+
+def make_parser():
+
+    parser = argparse.ArgumentParser(
+        prog='dmdj', description='Django model generator for JSON metadata.')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    sub = subparsers.add_parser(
+        'codegen', help='Write a models.py module for a data model.')
+    add_model_arguments(sub)
+    sub.add_argument('--app-label', required=True, type=_text,
+                     help='The app_label of the generated models.')
+    sub.add_argument('--base', action='append', type=_text,
+                     help='Dot separated path of a model base class. May be '
+                          'repeated. Defaults to django.db.models.Model.')
+    sub.add_argument('-o', '--output',
+                     help='Output file. Defaults to standard output.')
+    sub.set_defaults(func=codegen)
+
+    sub = subparsers.add_parser(
+        'ddl', help='Write the SQL creating a data model\'s tables.')
+    add_model_arguments(sub)
+    sub.add_argument('--vendor', choices=['postgresql', 'sqlite'],
+                     default='postgresql', help='Database vendor.')
+    sub.add_argument('-o', '--output',
+                     help='Output file. Defaults to standard output.')
+    sub.set_defaults(func=ddl)
+
+    sub = subparsers.add_parser(
+        'profile', help='Suggest field types from sample data.')
+    add_model_arguments(sub)
+    sub.add_argument('--data', action='append', metavar='TABLE=FILE',
+                     help='A delimited file of sample data for a table, with '
+                          'a header of field names. May be repeated.')
+    sub.add_argument('--rows', action='append', metavar='TABLE=ROWS',
+                     help='The expected number of rows of a table. May be '
+                          'repeated.')
+    sub.add_argument('--headroom', type=float, default=1.5,
+                     help='Room to leave for values larger than those '
+                          'sampled, as a multiple. Defaults to 1.5.')
+    sub.add_argument('--delimiter', default=',', help='Defaults to ",".')
+    sub.add_argument('--null', default='',
+                     help='The value read as NULL. Defaults to empty.')
+    sub.add_argument('-o', '--output',
+                     help='Write the data model with the suggestions applied '
+                          'to this JSON file.')
+    sub.set_defaults(func=profile)
+
+    sub = subparsers.add_parser(
+        'validate', help='Check data files against a data model.')
+    add_model_arguments(sub)
+    sub.add_argument('--data', action='append', metavar='TABLE=FILE',
+                     help='A delimited file of a table\'s data, with a header '
+                          'of field names. May be repeated.')
+    sub.add_argument('--workers', type=int,
+                     help='Worker processes. Defaults to the number of CPUs.')
+    sub.add_argument('--delimiter', default=',', help='Defaults to ",".')
+    sub.add_argument('--null', default='',
+                     help='The value read as NULL. Defaults to empty.')
+    sub.set_defaults(func=validate)
+
+    sub = subparsers.add_parser(
+        'migration', help='Write a migration between two data model versions.')
+    sub.add_argument('old', nargs='?',
+                     help='Previous data model JSON file. Omit for an '
+                          'initial migration.')
+    sub.add_argument('new', nargs='?', help='New data model JSON file.')
+    sub.add_argument('--model', help='Data model name, e.g. pedsnet.')
+    sub.add_argument('--from-version',
+                     help='Previous data model version, e.g. 2.0.0.')
+    sub.add_argument('--version', help='New data model version, e.g. 2.1.0.')
+    sub.add_argument('--offline', action='store_true',
+                     help='Only use the local data model cache.')
+    sub.add_argument('--app-label', required=True, type=_text,
+                     help='The app_label of the generated models.')
+    sub.add_argument('--name', required=True, type=_text,
+                     help='The migration name, e.g. 0002_pedsnet_2_1_0.')
+    sub.add_argument('--dependency', action='append', type=_text,
+                     help='A migration this one depends on, as '
+                          'app_label.migration_name. May be repeated.')
+    sub.add_argument('-o', '--output',
+                     help='Output file. Defaults to standard output.')
+    sub.set_defaults(func=migration)
+
+    return parser
+
+
+def main(argv=None):
+
+    args = make_parser().parse_args(argv)
+    _setup()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+import keyword
+import re
+
+from dmdj import __version__
+from dmdj.makers import _text, build_field, plan_model
+
+MODEL_BASE = 'django.db.models.Model'
+
+IDENTIFIER_RE = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+MODULE_TEMPLATE = '''\
+# -*- coding: utf-8 -*-
+# Generated by dmdj %(version)s from the %(name)s data model.
+# Regenerate this file instead of editing it.
+from __future__ import unicode_literals
+
+%(imports)s
+%(classes)s'''
+
+
+def _check_name(name):
+
+    if not IDENTIFIER_RE.match(name) or keyword.iskeyword(name):
+        raise ValueError('%r is not a valid Python identifier' % name)
+
+    return name
+
+
+def _import_base(path):
+
+    if path == MODEL_BASE:
+        return 'models.Model', 'from django.db import models'
+
+    module, _, name = path.rpartition('.')
+
+    if not module:
+        raise ValueError('%r is not a dotted import path' % path)
+
+    return name, 'from %s import %s' % (module, name)
+
+
+def make_source(data_model, bases, app_label):
+    """Returns the source of a Python module defining the data model's models.
+
+    `data_model` is a declarative style nested data model object retrieved from
+    the chop-dbhi/data-models service or at least matching the format specified
+    there.
+
+    `bases` is a tuple of dot separated import paths of the base classes the
+    models should inherit from. This could simply be
+    ('django.db.models.Model',).
+
+    `app_label` is the string `app_label`, which will be included in the
+    models' Meta classes.
+
+    The classes are defined with ordinary class statements, but their fields
+    and Meta options are planned by `plan_model`, so importing the module gives
+    the same models `make_model` does.
+    """
+
+    # The migration writer defines a model at import time, so it can only be
+    # imported once the app registry is ready.
+    from django.db.migrations.writer import MigrationWriter
+
+    imports = set(['from django.db import models'])
+    base_names = []
+
+    for path in bases:
+        name, statement = _import_base(path)
+        base_names.append(name)
+        imports.add(statement)
+
+    classes = []
+
+    for table_spec in plan_model(data_model):
+
+        lines = ['', '', 'class %s(%s):' % (_check_name(table_spec.name),
+                                            ', '.join(base_names))]
+
+        for field_spec in table_spec.fields:
+            string, field_imports = MigrationWriter.serialize(
+                build_field(field_spec))
+            imports.update(field_imports)
+            lines.append('    %s = %s' % (_check_name(field_spec.name),
+                                          string))
+
+        lines.extend(['', '    class Meta:'])
+
+        options = [('db_table', table_spec.meta.db_table),
+                   ('app_label', _text(app_label)),
+                   ('index_together', [list(i) for i in
+                                       table_spec.meta.index_together]),
+                   ('unique_together', table_spec.meta.unique_together)]
+
+        for option, value in options:
+            string, option_imports = MigrationWriter.serialize(value)
+            imports.update(option_imports)
+            lines.append('        %s = %s' % (option, string))
+
+        classes.append('\n'.join(lines))
+
+    return MODULE_TEMPLATE % {
+        'version': __version__,
+        'name': ' '.join(str(data_model[k]) for k in ('name', 'version')
+                         if data_model.get(k)) or 'given',
+        'imports': '\n'.join(sorted(imports)),
+        'classes': '\n'.join(classes) + '\n'
+    }
@@ -0,0 +1,178 @@
+import re
+
+try:
+    from sys import intern
+except ImportError:  # Python 2, where the builtin intern takes byte strings
+    pass
+
+IDENTIFIER_RE = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+# Record classes keyed by their frozen set of keys, so every object with the
+# same keys, e.g. every field, shares one class.
+_record_classes = {}
+
+# Interned unicode strings on Python 2.
+_strings = {}
+
+
+class Record(object):
+    """The base of the compact, immutable records `compact` turns JSON objects
+    into.
+
+    A record stores its members in `__slots__`, one per key of the object it
+    was made from, so they can be read as attributes, e.g. `field.name`. It
+    also supports the read-only dictionary methods the `dmdj.makers`
+    functions use, so records can be passed wherever data model JSON is
+    expected.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, *values):
+        for key, value in zip(self.__slots__, values):
+            object.__setattr__(self, key, value)
+
+    def __setattr__(self, key, value):
+        raise AttributeError('%s is immutable' % type(self).__name__)
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return getattr(self, key)
+        except (AttributeError, TypeError):
+            return default
+
+    def __contains__(self, key):
+        return key in self.__slots__
+
+    def __iter__(self):
+        return iter(self.__slots__)
+
+    def __len__(self):
+        return len(self.__slots__)
+
+    def keys(self):
+        return list(self.__slots__)
+
+    def values(self):
+        return [getattr(self, key) for key in self.__slots__]
+
+    def items(self):
+        return [(key, getattr(self, key)) for key in self.__slots__]
+
+    def __eq__(self, other):
+        if isinstance(other, Record):
+            return sorted(self.items()) == sorted(other.items())
+        return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def __hash__(self):
+        return hash(frozenset(self.items()))
+
+    def __repr__(self):
+        return '%s(%s)' % (type(self).__name__, ', '.join(
+            '%s=%r' % item for item in self.items()))
+
+    def __reduce__(self):
+        return _make_record, (tuple(self.__slots__), tuple(self.values()))
+
+    def to_dict(self):
+        """Returns the record as a dictionary, for `json.dumps(default=...)`.
+        """
+
+        return dict(self.items())
+
+
+# Keys that would hide the methods of `Record`.
+_RESERVED = frozenset(dir(Record))
+
+
+def _record_class(keys):
+
+    key_set = frozenset(keys)
+
+    try:
+        return _record_classes[key_set]
+    except KeyError:
+        pass
+
+    cls = type(str('Record'), (Record,), {
+        '__slots__': tuple(str(k) if str is bytes else k for k in keys)})
+
+    return _record_classes.setdefault(key_set, cls)
+
+
+def _make_record(keys, values):
+
+    cls = _record_class(keys)
+
+    # The class may have been created with the keys in a different order.
+    values = dict(zip(keys, values))
+
+    return cls(*[values[k] for k in cls.__slots__])
+
+
+def intern_string(value):
+    """Returns the canonical copy of a string, so equal strings in compacted
+    data models share memory.
+    """
+
+    if isinstance(value, str):
+        return intern(value)
+
+    return _strings.setdefault(value, value)
+
+
+def compact(obj):
+    """Returns a compact, immutable copy of a data model JSON document or any
+    part of it.
+
+    Objects become `Record`s, lists become tuples and strings are interned.
+    The result can be passed to `make_model` and the other `dmdj.makers`
+    functions in place of the JSON, and uses a fraction of its memory when
+    several data models or versions are kept loaded.
+
+    Objects with keys that aren't Python identifiers or that clash with the
+    methods of `Record`, e.g. `items`, are left as dictionaries.
+    """
+
+    if isinstance(obj, dict):
+
+        keys = list(obj)
+        values = [compact(obj[k]) for k in keys]
+
+        if not all(IDENTIFIER_RE.match(k) and k not in _RESERVED
+                   for k in keys):
+            return dict(zip((intern_string(k) for k in keys), values))
+
+        return _make_record(tuple(keys), tuple(values))
+
+    if isinstance(obj, (list, tuple)):
+        return tuple(compact(v) for v in obj)
+
+    if isinstance(obj, (type(u''), bytes)):
+        return intern_string(obj)
+
+    return obj
+
+
+def expand(obj):
+    """Returns the JSON compatible form of a compacted object, the inverse of
+    `compact`.
+    """
+
+    if isinstance(obj, (Record, dict)):
+        return dict((k, expand(v)) for k, v in obj.items())
+
+    if isinstance(obj, (list, tuple)):
+        return [expand(v) for v in obj]
+
+    return obj
@@ -0,0 +1,284 @@
+import binascii
+import base64
+from datetime import date, datetime, time
+from decimal import Decimal
+
+from django.utils.dateparse import parse_date, parse_datetime, parse_time
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+INTEGER_TYPES = ('AutoField', 'BigAutoField', 'BigIntegerField',
+                 'IntegerField', 'PositiveIntegerField',
+                 'PositiveSmallIntegerField', 'SmallIntegerField')
+
+TEXT_TYPES = ('CharField', 'TextField')
+
+BOOLEANS = {
+    't': True, 'true': True, 'y': True, 'yes': True, '1': True,
+    'f': False, 'false': False, 'n': False, 'no': False, '0': False
+}
+
+TRUE_VALUES = [k for k, v in BOOLEANS.items() if v]
+
+# Formats are strptime formats for dates and times, or 'iso' for the ISO 8601
+# formats the data models service and most databases export, which have fast
+# paths. Blobs are 'hex' (optionally prefixed with \x) or 'base64'.
+DEFAULT_FORMATS = {
+    'date': 'iso',
+    'datetime': 'iso',
+    'time': 'iso',
+    'blob': 'hex'
+}
+
+
+def get_target_field(field):
+    """Returns the field a foreign key points to, or the field itself."""
+
+    rel = field.remote_field if hasattr(field, 'remote_field') else field.rel
+
+    if rel is None:
+        return field
+
+    return getattr(field, 'target_field', None) or field.related_field
+
+
+def _parsed(parse, value):
+    # Django's parsers return None for values that don't match their format.
+    parsed = parse(value)
+
+    if parsed is None:
+        raise ValueError('%r is not a valid ISO 8601 value' % (value,))
+
+    return parsed
+
+
+def _is_iso_date(value):
+    return len(value) >= 10 and value[4] == '-' and value[7] == '-'
+
+
+def _iso_date(value):
+    if len(value) == 10 and _is_iso_date(value):
+        return date(int(value[0:4]), int(value[5:7]), int(value[8:10]))
+    return _parsed(parse_date, value)
+
+
+def _iso_datetime(value):
+    if len(value) == 19 and _is_iso_date(value) and value[10] in ' T' and \
+            value[13] == ':' and value[16] == ':':
+        return datetime(int(value[0:4]), int(value[5:7]), int(value[8:10]),
+                        int(value[11:13]), int(value[14:16]),
+                        int(value[17:19]))
+    if len(value) == 10 and _is_iso_date(value):
+        return datetime(int(value[0:4]), int(value[5:7]), int(value[8:10]))
+    return _parsed(parse_datetime, value)
+
+
+def _iso_time(value):
+    if len(value) == 8 and value[2] == ':' and value[5] == ':':
+        return time(int(value[0:2]), int(value[3:5]), int(value[6:8]))
+    return _parsed(parse_time, value)
+
+
+def _decimal(max_digits, decimal_places):
+    # Values are rounded to the field's scale, as the database would, and
+    # those with more integer digits than the field's precision allows are
+    # rejected.
+    exponent = Decimal(1).scaleb(-decimal_places)
+    limit = Decimal(10) ** (max_digits - decimal_places)
+
+    def convert(value):
+        number = Decimal(value)
+        if not number.is_finite():
+            raise ValueError('%r is not a finite number' % (value,))
+        number = number.quantize(exponent)
+        if abs(number) >= limit:
+            raise ValueError('%r has more than %d digits' % (value,
+                                                             max_digits))
+        return number
+
+    return convert
+
+
+def _strptime(fmt, result):
+
+    def convert(value):
+        parsed = datetime.strptime(value, fmt)
+        return getattr(parsed, result)() if result else parsed
+
+    return convert
+
+
+def _hex(value):
+    if value[:2] in ('\\x', '0x'):
+        value = value[2:]
+    return binascii.unhexlify(value)
+
+
+def _boolean(value):
+    return BOOLEANS[value.lower()]
+
+
+def get_cell_converter(field, formats=None):
+    """Returns a function converting a raw string to a Python value for a
+    field, chosen once from the field's type (as `make_field` picked it from
+    `FIELD_TYPE_MAP`) instead of on every call like `Field.to_python`.
+    """
+
+    formats = dict(DEFAULT_FORMATS, **(formats or {}))
+    target = get_target_field(field)
+    internal_type = target.get_internal_type()
+
+    if internal_type in INTEGER_TYPES:
+        return int
+
+    if internal_type in TEXT_TYPES:
+        return None
+
+    if internal_type == 'DecimalField':
+        if target.max_digits is None or target.decimal_places is None:
+            return Decimal
+        return _decimal(target.max_digits, target.decimal_places)
+
+    if internal_type == 'FloatField':
+        return float
+
+    if internal_type in ('BooleanField', 'NullBooleanField'):
+        return _boolean
+
+    if internal_type == 'DateField':
+        if formats['date'] == 'iso':
+            return _iso_date
+        return _strptime(formats['date'], 'date')
+
+    if internal_type == 'DateTimeField':
+        if formats['datetime'] == 'iso':
+            return _iso_datetime
+        return _strptime(formats['datetime'], None)
+
+    if internal_type == 'TimeField':
+        if formats['time'] == 'iso':
+            return _iso_time
+        return _strptime(formats['time'], 'time')
+
+    if internal_type == 'BinaryField':
+        if formats['blob'] == 'base64':
+            return base64.b64decode
+        return _hex
+
+    return field.to_python
+
+
+def make_converter(model, columns, null='', formats=None):
+    """Returns a function converting a row of raw strings to a tuple of Python
+    values ready to be inserted.
+
+    `model` is a Django model class, such as one generated by `make_model`.
+
+    `columns` is the list of database column names (the data model's field
+    names) in row order, e.g. a CSV header.
+
+    `null` is the raw value converted to None.
+
+    `formats` overrides `DEFAULT_FORMATS` for the 'date', 'datetime', 'time'
+    and 'blob' types.
+
+    The function is compiled for the given columns, so converting a row
+    involves no per-cell field lookup or type dispatch. Values that can't be
+    parsed raise `ValueError` (or `KeyError` for booleans,
+    `decimal.InvalidOperation` for decimals), as do decimals with more
+    integer digits than their field's `max_digits` and `decimal_places`
+    allow. Decimals are rounded to `decimal_places`.
+    """
+
+    fields = dict((f.column, f) for f in model._meta.concrete_fields)
+    namespace = {'null': null}
+    names = []
+    values = []
+
+    for i, column in enumerate(columns):
+
+        convert = get_cell_converter(fields[column], formats)
+        names.append('v%d' % i)
+
+        if convert is None:
+            values.append('None if v%d == null else v%d' % (i, i))
+        else:
+            namespace['c%d' % i] = convert
+            values.append('None if v%d == null else c%d(v%d)' % (i, i, i))
+
+    if names:
+        source = 'def convert(row):\n    %s, = row\n    return (%s,)\n' % (
+            ', '.join(names), ', '.join(values))
+    else:
+        source = 'def convert(row):\n    return ()\n'
+
+    exec(compile(source, '<converter %s>' % model.__name__, 'exec'),
+         namespace)
+
+    return namespace['convert']
+
+
+def make_column_converter(model, columns, null='', formats=None):
+    """Returns a function converting a batch of columns, each a sequence of
+    raw strings, to a list of NumPy arrays.
+
+    Arguments are as for `make_converter`. Integer, float, boolean and ISO
+    date and datetime columns without nulls are converted by NumPy in a single
+    call. Other columns, and columns with nulls, fall back to the cell
+    converters and become object arrays. Requires NumPy.
+    """
+
+    if numpy is None:
+        raise ImportError('make_column_converter requires NumPy')
+
+    formats = dict(DEFAULT_FORMATS, **(formats or {}))
+    fields = dict((f.column, f) for f in model._meta.concrete_fields)
+    plans = []
+
+    for column in columns:
+
+        field = fields[column]
+        internal_type = get_target_field(field).get_internal_type()
+
+        if internal_type in INTEGER_TYPES:
+            dtype = numpy.int64
+        elif internal_type == 'FloatField':
+            dtype = numpy.float64
+        elif internal_type == 'DateField' and formats['date'] == 'iso':
+            dtype = 'datetime64[D]'
+        elif internal_type == 'DateTimeField' and \
+                formats['datetime'] == 'iso':
+            dtype = 'datetime64[us]'
+        else:
+            dtype = None
+
+        plans.append((dtype, get_cell_converter(field, formats),
+                      internal_type in ('BooleanField', 'NullBooleanField')))
+
+    def convert(batch):
+
+        arrays = []
+
+        for (dtype, cell, boolean), values in zip(plans, batch):
+
+            raw = numpy.asarray(values)
+
+            if boolean and not (raw == null).any():
+                lowered = numpy.char.lower(raw.astype(numpy.str_))
+                if not numpy.in1d(lowered, list(BOOLEANS)).all():
+                    raise ValueError('Invalid boolean in column %s' %
+                                     len(arrays))
+                arrays.append(numpy.in1d(lowered, TRUE_VALUES))
+            elif dtype is not None and not (raw == null).any():
+                arrays.append(raw.astype(dtype))
+            else:
+                arrays.append(numpy.array(
+                    [None if v == null else (cell(v) if cell else v)
+                     for v in values], dtype=object))
+
+        return arrays
+
+    return convert
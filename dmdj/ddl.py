@@ -0,0 +1,332 @@
+import hashlib
+from collections import namedtuple
+
+from django.db import connections, transaction
+from django.utils.module_loading import import_string
+
+from dmdj.makers import FieldSpec, MetaSpec, TableSpec, plan_model
+
+# Column types by field class name, as Django's backends define them.
+DATA_TYPES = {
+    'postgresql': {
+        'AutoField': 'serial',
+        'BigAutoField': 'bigserial',
+        'BigIntegerField': 'bigint',
+        'BinaryField': 'bytea',
+        'BooleanField': 'boolean',
+        'CharField': 'varchar(%(max_length)s)',
+        'DateField': 'date',
+        'DateTimeField': 'timestamp with time zone',
+        'DecimalField': 'numeric(%(max_digits)s, %(decimal_places)s)',
+        'FloatField': 'double precision',
+        'IntegerField': 'integer',
+        'SmallIntegerField': 'smallint',
+        'TextField': 'text',
+        'TimeField': 'time'
+    },
+    'sqlite': {
+        'AutoField': 'integer',
+        'BigAutoField': 'integer',
+        'BigIntegerField': 'bigint',
+        'BinaryField': 'BLOB',
+        'BooleanField': 'bool',
+        'CharField': 'varchar(%(max_length)s)',
+        'DateField': 'date',
+        'DateTimeField': 'datetime',
+        'DecimalField': 'decimal',
+        'FloatField': 'real',
+        'IntegerField': 'integer',
+        'SmallIntegerField': 'smallint',
+        'TextField': 'text',
+        'TimeField': 'time'
+    }
+}
+
+# The type of a foreign key column pointing at an auto-incrementing key.
+RELATED_TYPES = {
+    'serial': 'integer',
+    'bigserial': 'bigint'
+}
+
+MAX_NAME_LENGTH = {
+    'postgresql': 63,
+    'sqlite': 128
+}
+
+
+class DDL(namedtuple('DDL', ['tables', 'indexes', 'foreign_keys'])):
+    """Lists of the SQL statements creating a data model's tables, their
+    indexes and their foreign key constraints, in the order they must run.
+
+    Unique constraints are part of the `CREATE TABLE` statements. Foreign
+    keys are too on SQLite, which can't add them to existing tables, so
+    `foreign_keys` is empty for it.
+    """
+
+    def statements(self):
+        return self.tables + self.indexes + self.foreign_keys
+
+    def script(self):
+        """Returns all the statements as an SQL script."""
+
+        return ''.join('%s;\n' % s for s in self.statements())
+
+
+def _quote(name):
+    return '"%s"' % name.replace('"', '""')
+
+
+def _name(vendor, table, columns, suffix):
+    # A deterministic constraint or index name that fits the vendor's limit,
+    # hashed like Django's when it doesn't.
+    name = '%s_%s_%s' % (table, '_'.join(columns), suffix)
+    limit = MAX_NAME_LENGTH[vendor]
+
+    if len(name) <= limit:
+        return name
+
+    digest = hashlib.md5(name.encode('utf-8')).hexdigest()[:8]
+
+    return '%s_%s_%s' % (table[:limit - len(suffix) - 10], digest, suffix)
+
+
+def get_model_spec(model):
+    """Returns a `TableSpec` describing an existing Django model, such as one
+    built by `make_model`, from its fields' `deconstruct` methods.
+    """
+
+    fields = []
+
+    for field in model._meta.local_fields:
+
+        name, path, args, kwargs = field.deconstruct()
+        args = list(args)
+
+        if 'to' in kwargs:
+            args.insert(0, kwargs.pop('to'))
+
+        kwargs.pop('on_delete', None)
+        kwargs.setdefault('db_column', field.column)
+
+        fields.append(FieldSpec(name, path, tuple(args),
+                                tuple(sorted(kwargs.items()))))
+
+    meta = MetaSpec(model._meta.db_table,
+                    tuple(tuple(i) for i in model._meta.index_together),
+                    tuple(tuple(u) for u in model._meta.unique_together))
+
+    return TableSpec(model.__name__, meta, tuple(fields))
+
+
+def _get_specs(source):
+
+    if isinstance(source, dict) or hasattr(source, 'keys'):
+        return plan_model(source)
+
+    return tuple(s if isinstance(s, TableSpec) else get_model_spec(s)
+                 for s in source)
+
+
+_base_names = {}
+
+
+def _base_name(path, data_types):
+    # The name of the nearest class in the field class's MRO with a known
+    # column type, so subclasses of the standard fields work.
+    key = (path, id(data_types))
+
+    if key not in _base_names:
+        name = path.rsplit('.', 1)[-1]
+        if name not in data_types and name != 'ForeignKey':
+            for cls in import_string(path).__mro__:
+                if cls.__name__ in data_types:
+                    name = cls.__name__
+                    break
+        _base_names[key] = name
+
+    return _base_names[key]
+
+
+def make_ddl(source, vendor='postgresql'):
+    """Returns the `DDL` creating a data model's tables on a database vendor.
+
+    `source` is a declarative style nested data model object, a list of
+    Django models, such as the output of `make_model`, or a list of
+    `TableSpec`s.
+
+    `vendor` is 'postgresql' or 'sqlite', the `vendor` of a Django
+    connection.
+
+    The statements match the tables `make_model`'s models would have: the
+    same columns, primary keys, not null and unique constraints and indexes,
+    including the index Django gives each foreign key column.
+    Foreign keys are deferrable and initially deferred, as Django creates
+    them. Indexes are always separate statements, so `indexes` and
+    `foreign_keys` hold everything that can be created after the data is
+    loaded.
+    """
+
+    if vendor not in DATA_TYPES:
+        raise ValueError('vendor must be one of %s' % ', '.join(
+            sorted(DATA_TYPES)))
+
+    data_types = DATA_TYPES[vendor]
+    specs = _get_specs(source)
+    by_name = dict((s.name, s) for s in specs)
+
+    def column(field_spec):
+        return dict(field_spec.kwargs).get('db_column') or field_spec.name
+
+    def primary_key(spec):
+        for field_spec in spec.fields:
+            if dict(field_spec.kwargs).get('primary_key'):
+                return field_spec
+
+    def target(field_spec, kwargs):
+        # The (TableSpec, FieldSpec) a foreign key points to.
+        name = field_spec.args[0].split('.')[-1]
+
+        if name not in by_name:
+            raise ValueError('%s has a foreign key to %s, which is not in '
+                             'the data model' % (field_spec.name, name))
+
+        target_spec = by_name[name]
+
+        for other in target_spec.fields:
+            if other.name == kwargs.get('to_field'):
+                return target_spec, other
+
+        return target_spec, primary_key(target_spec)
+
+    def column_type(field_spec, kwargs):
+
+        base = _base_name(field_spec.type, data_types)
+
+        if base != 'ForeignKey':
+            return data_types[base] % kwargs
+
+        target_field = target(field_spec, kwargs)[1]
+        target_type = column_type(target_field, dict(target_field.kwargs))
+
+        return RELATED_TYPES.get(target_type, target_type)
+
+    tables = []
+    indexes = []
+    foreign_keys = []
+
+    for spec in specs:
+
+        table = spec.meta.db_table
+        lines = []
+
+        for field_spec in spec.fields:
+
+            kwargs = dict(field_spec.kwargs)
+            name = column(field_spec)
+            line = '%s %s' % (_quote(name), column_type(field_spec, kwargs))
+
+            if kwargs.get('primary_key'):
+                line += ' NOT NULL PRIMARY KEY'
+                if vendor == 'sqlite' and field_spec.type.endswith(
+                        'AutoField'):
+                    line += ' AUTOINCREMENT'
+            else:
+                line += ' NULL' if kwargs.get('null') else ' NOT NULL'
+                if kwargs.get('unique'):
+                    line += ' UNIQUE'
+
+            if field_spec.type.endswith('.ForeignKey'):
+
+                target_spec, target_field = target(field_spec, kwargs)
+                references = 'REFERENCES %s (%s) DEFERRABLE INITIALLY ' \
+                    'DEFERRED' % (_quote(target_spec.meta.db_table),
+                                  _quote(column(target_field)))
+
+                if vendor == 'sqlite':
+                    line += ' ' + references
+                else:
+                    foreign_keys.append(
+                        'ALTER TABLE %s ADD CONSTRAINT %s FOREIGN KEY (%s) '
+                        '%s' % (_quote(table),
+                                _quote(_name(vendor, table, [name], 'fk')),
+                                _quote(name), references))
+
+            lines.append(line)
+
+            # Foreign keys are indexed unless db_index is False, as Django
+            # does.
+            db_index = kwargs.get('db_index',
+                                  field_spec.type.endswith('.ForeignKey'))
+
+            if db_index and not kwargs.get('unique') and \
+                    not kwargs.get('primary_key'):
+                indexes.append('CREATE INDEX %s ON %s (%s)' % (
+                    _quote(_name(vendor, table, [name], 'idx')),
+                    _quote(table), _quote(name)))
+
+        columns = dict((f.name, column(f)) for f in spec.fields)
+
+        for fields in spec.meta.unique_together:
+            lines.append('UNIQUE (%s)' % ', '.join(
+                _quote(columns[f]) for f in fields))
+
+        for fields in spec.meta.index_together:
+            names = [columns[f] for f in fields]
+            indexes.append('CREATE INDEX %s ON %s (%s)' % (
+                _quote(_name(vendor, table, names, 'idx')), _quote(table),
+                ', '.join(_quote(n) for n in names)))
+
+        tables.append('CREATE TABLE %s (\n    %s\n)' % (
+            _quote(table), ',\n    '.join(lines)))
+
+    return DDL(tables, indexes, foreign_keys)
+
+
+def execute_ddl(statements, using='default', batch_size=100):
+    """Runs SQL statements on a Django database connection in batches of
+    `batch_size` statements per round trip where the backend allows it.
+    Transactions are left to the caller.
+    """
+
+    connection = connections[using]
+
+    with connection.cursor() as cursor:
+
+        if connection.vendor != 'postgresql':
+            # SQLite runs one statement per execute.
+            for statement in statements:
+                cursor.execute(statement)
+            return
+
+        for i in range(0, len(statements), batch_size):
+            cursor.execute(';\n'.join(statements[i:i + batch_size]))
+
+
+def provision(source, using='default', deferred=False, batch_size=100):
+    """Creates a data model's tables on a Django database connection in a
+    single transaction and returns the `DDL`.
+
+    `source` is as for `make_ddl`. If `deferred` is true, only the tables are
+    created and the returned `DDL` should be passed to `finish_provision`
+    once the data is loaded, to create its indexes and foreign keys. On
+    SQLite foreign keys are always created with their tables.
+    """
+
+    connection = connections[using]
+    ddl = make_ddl(source, connection.vendor)
+
+    statements = ddl.tables if deferred else ddl.statements()
+
+    with transaction.atomic(using):
+        execute_ddl(statements, using, batch_size)
+
+    return ddl
+
+
+def finish_provision(ddl, using='default', batch_size=100):
+    """Creates the indexes and foreign key constraints of a `DDL` returned by
+    `provision(..., deferred=True)`, in a single transaction.
+    """
+
+    with transaction.atomic(using):
+        execute_ddl(ddl.indexes + ddl.foreign_keys, using, batch_size)
@@ -0,0 +1,219 @@
+import json
+import threading
+from collections import OrderedDict, namedtuple
+
+from django.apps import apps
+
+from dmdj.compact import Record
+from dmdj.makers import build_table, group_by_table, plan_table
+
+
+class TableDiff(namedtuple('TableDiff', [
+        'name', 'added_fields', 'removed_fields', 'changed_fields',
+        'added_constraints', 'removed_constraints', 'added_indexes',
+        'removed_indexes'])):
+    """The differences in a table present in both data models.
+
+    Fields are given by name. Constraints are (constraint type, constraint)
+    pairs and indexes are index objects, as in the data model JSON.
+    """
+
+
+class ModelDiff(namedtuple('ModelDiff', ['added_tables', 'removed_tables',
+                                         'changed_tables'])):
+    """The differences between two data models. Added and removed tables are
+    given by name, changed tables as `TableDiff`s.
+    """
+
+    def __bool__(self):
+        return any(self)
+
+    __nonzero__ = __bool__
+
+
+BuildResult = namedtuple('BuildResult', ['diff', 'built', 'reused',
+                                         'removed'])
+
+
+def _key(obj):
+    return json.dumps(obj, sort_keys=True, default=Record.to_dict)
+
+
+def _diff_lists(old, new):
+
+    old_keys = OrderedDict((_key(o), o) for o in old)
+    new_keys = OrderedDict((_key(n), n) for n in new)
+
+    return (tuple(n for k, n in new_keys.items() if k not in old_keys),
+            tuple(o for k, o in old_keys.items() if k not in new_keys))
+
+
+def diff_tables(old_table, new_table, old_cons, new_cons, old_idxs,
+                new_idxs):
+    """Returns a `TableDiff` of two versions of a table, or None if they are
+    the same.
+
+    `old_cons` and `new_cons` are the tables' dictionaries of constraint lists
+    and `old_idxs` and `new_idxs` their lists of indexes, as grouped by
+    `dmdj.makers.group_by_table`.
+    """
+
+    old_fields = OrderedDict((f['name'], f) for f in old_table['fields'])
+    new_fields = OrderedDict((f['name'], f) for f in new_table['fields'])
+
+    added_cons = []
+    removed_cons = []
+
+    for con_type in sorted(set(old_cons) | set(new_cons)):
+        added, removed = _diff_lists(old_cons.get(con_type, []),
+                                     new_cons.get(con_type, []))
+        added_cons.extend((con_type, con) for con in added)
+        removed_cons.extend((con_type, con) for con in removed)
+
+    added_idxs, removed_idxs = _diff_lists(old_idxs, new_idxs)
+
+    table_diff = TableDiff(
+        new_table['name'],
+        tuple(n for n in new_fields if n not in old_fields),
+        tuple(n for n in old_fields if n not in new_fields),
+        tuple(n for n, f in new_fields.items()
+              if _key(f) != _key(old_fields.get(n, f))),
+        tuple(added_cons), tuple(removed_cons), added_idxs, removed_idxs)
+
+    if any(table_diff[1:]):
+        return table_diff
+
+
+def diff_models(old_model, new_model):
+    """Returns a `ModelDiff` of two data model documents, comparing their
+    tables, fields, constraints and indexes.
+
+    `old_model` and `new_model` are declarative style nested data model
+    objects retrieved from the chop-dbhi/data-models service or at least
+    matching the format specified there, e.g. two versions of the same data
+    model.
+    """
+
+    old_tables = OrderedDict((t['name'], t) for t in old_model['tables'])
+    new_tables = OrderedDict((t['name'], t) for t in new_model['tables'])
+
+    old_groups = group_by_table(old_model)
+    new_groups = group_by_table(new_model)
+
+    changed = []
+
+    for name, new_table in new_tables.items():
+        if name in old_tables:
+            table_diff = diff_tables(old_tables[name], new_table,
+                                     old_groups[name][0], new_groups[name][0],
+                                     old_groups[name][1], new_groups[name][1])
+            if table_diff:
+                changed.append(table_diff)
+
+    return ModelDiff(tuple(n for n in new_tables if n not in old_tables),
+                     tuple(n for n in old_tables if n not in new_tables),
+                     tuple(changed))
+
+
+class IncrementalBuilder(object):
+    """Builds the models of successive versions of a data model, rebuilding
+    only the models that change.
+
+    `bases`, `module` and `app_label` are as for `dmdj.makers.make_model`.
+
+    Each table is planned with `plan_table` and its model is rebuilt only if
+    the plan differs from the previous version's, or if it has a foreign key
+    to a model that is rebuilt, so its relation points at the new class.
+    Replaced and removed models are unregistered from the Django app registry
+    first, so a long-running process can reload the schema in place.
+    """
+
+    def __init__(self, bases, module, app_label):
+
+        self.bases = bases
+        self.module = module
+        self.app_label = app_label
+
+        self.data_model = None
+        self.models = OrderedDict()
+
+        self._specs = {}
+        self._lock = threading.Lock()
+
+    def _unregister(self, model):
+
+        app_models = apps.all_models[self.app_label]
+        model_name = model._meta.model_name
+
+        if app_models.get(model_name) is model:
+            del app_models[model_name]
+
+    def update(self, data_model):
+        """Builds the models for a new version of the data model and returns a
+        `BuildResult` of the `ModelDiff` from the previous version and the
+        names of the tables built, reused and removed.
+
+        The models, keyed by class name in table order, are in `models`.
+        """
+
+        with self._lock:
+
+            old_model = self.data_model or {'tables': [], 'schema': {
+                'constraints': {}, 'indexes': []}}
+
+            diff = diff_models(old_model, data_model)
+
+            table_groups = group_by_table(data_model)
+            specs = OrderedDict()
+            targets = {}
+
+            for table_json in data_model['tables']:
+                table_cons, table_idxs = table_groups[table_json['name']]
+                specs[table_json['name']] = plan_table(table_json, table_cons,
+                                                       table_idxs)
+                targets[table_json['name']] = set(
+                    fkey['target_table'] for fkey in
+                    table_cons.get('foreign_keys', []))
+
+            changed = set(name for name, spec in specs.items()
+                          if self._specs.get(name) != spec)
+
+            # Rebuild everything with a foreign key path to a rebuilt model.
+            growing = True
+
+            while growing:
+                growing = False
+                for name in specs:
+                    if name not in changed and targets[name] & changed:
+                        changed.add(name)
+                        growing = True
+
+            removed = [name for name in self._specs if name not in specs]
+            old_models = dict((m._meta.db_table, m)
+                              for m in self.models.values())
+
+            for name in list(changed) + removed:
+                if name in old_models:
+                    self._unregister(old_models[name])
+
+            apps.clear_cache()
+
+            models = OrderedDict()
+            built = []
+            reused = []
+
+            for name, spec in specs.items():
+                if name in changed:
+                    models[spec.name] = build_table(spec, self.bases,
+                                                    self.module,
+                                                    self.app_label)
+                    built.append(name)
+                else:
+                    models[spec.name] = old_models[name]
+                    reused.append(name)
+
+            self.data_model = data_model
+            self.models = models
+            self._specs = specs
+
+            return BuildResult(diff, built, reused, removed)
@@ -0,0 +1,286 @@
+import binascii
+import bz2
+import csv
+import gzip
+import io
+import multiprocessing
+import os
+import time
+import traceback
+from collections import OrderedDict, namedtuple
+
+from django.apps import apps
+from django.core.serializers.json import DjangoJSONEncoder
+
+from dmdj.loaders import PY2, _make_pool
+from dmdj.upsert import _is_surrogate
+
+try:
+    text_type = unicode
+except NameError:  # Python 3
+    text_type = str
+
+FORMATS = ('csv', 'jsonl')
+
+COMPRESSIONS = {
+    'gzip': ('.gz', gzip.open),
+    'bz2': ('.bz2', bz2.BZ2File)
+}
+
+
+class ExportStats(namedtuple('ExportStats', ['rows', 'batches',
+                                             'seconds'])):
+    """Rows and batches exported and the seconds it took."""
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else float(self.rows)
+
+
+class _Encoder(DjangoJSONEncoder):
+    # Dates and times as ISO 8601 and decimals as strings, as Django does,
+    # and binary values as hex.
+
+    def default(self, o):
+
+        if isinstance(o, (bytes, bytearray, memoryview)):
+            return binascii.hexlify(bytes(o)).decode('ascii')
+
+        return super(_Encoder, self).default(o)
+
+
+def get_export_fields(model):
+    """Returns a model's concrete fields in the data model's field order,
+    without the surrogate `id` primary key `make_table` adds.
+    """
+
+    return [f for f in model._meta.concrete_fields
+            if not (f.primary_key and _is_surrogate(f))]
+
+
+def _cell(value, null):
+
+    if value is None:
+        return null
+
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+
+    if isinstance(value, (bytes, bytearray, memoryview)) and \
+            not (PY2 and isinstance(value, str)):
+        return binascii.hexlify(bytes(value)).decode('ascii')
+
+    return value
+
+
+def _batches(model, fields, batch_size, using):
+    # Keyset pagination on the primary key, so each batch is an indexed
+    # range scan and memory doesn't grow with the table.
+    pk = model._meta.pk
+    names = [f.attname for f in fields]
+
+    try:
+        position = names.index(pk.attname)
+        names_pk = names
+    except ValueError:
+        position = len(names)
+        names_pk = names + [pk.attname]
+
+    queryset = model._default_manager.using(using).order_by(pk.attname)
+    last = None
+
+    while True:
+
+        batch_qs = queryset
+
+        if last is not None:
+            batch_qs = batch_qs.filter(**{'%s__gt' % pk.attname: last})
+
+        rows = list(batch_qs.values_list(*names_pk)[:batch_size])
+
+        if not rows:
+            return
+
+        last = rows[-1][position]
+
+        if len(names_pk) > len(names):
+            rows = [row[:-1] for row in rows]
+
+        yield rows
+
+        if len(rows) < batch_size:
+            return
+
+
+def _open(dest, compression, encoding):
+
+    if compression is not None:
+        raw = COMPRESSIONS[compression][1](dest, 'wb')
+    else:
+        raw = io.open(dest, 'wb')
+
+    if PY2:
+        return raw
+
+    return io.TextIOWrapper(raw, encoding=encoding, newline='')
+
+
+def _compression(dest, compression):
+
+    if compression == 'infer':
+        compression = None
+        for name, (suffix, opener) in COMPRESSIONS.items():
+            if str(dest).endswith(suffix):
+                compression = name
+
+    if compression is not None and compression not in COMPRESSIONS:
+        raise ValueError('compression must be one of %s' % ', '.join(
+            sorted(COMPRESSIONS)))
+
+    return compression
+
+
+def export_table(model, dest, format='csv', compression='infer',
+                 batch_size=10000, using='default', delimiter=',', null='',
+                 encoding='utf-8', progress=None):
+    """Writes the rows of a model's table to a file and returns
+    `ExportStats`.
+
+    `model` is a Django model class, such as one generated by `make_model`,
+    and `dest` a path or an open file object, which on Python 3 should be
+    a text file opened with `newline=''`.
+
+    `format` is 'csv' for a delimited file with a header of database column
+    names (the data model's field names), which `dmdj.loaders.load_csv` can
+    load, or 'jsonl' for JSON Lines, an object per row. Columns are in the
+    data model's field order, without the surrogate `id` primary key
+    `make_table` adds to tables without a single field primary key.
+
+    `compression` is 'gzip', 'bz2', None, or 'infer' to choose it from the
+    extension of a `dest` path ('.gz' or '.bz2').
+
+    Rows are read `batch_size` at a time, ordered by primary key and
+    starting after the last key of the previous batch, so memory stays flat
+    whatever the table's size and no long running cursor is held open.
+
+    In CSV files, NULLs are written as the `null` string, booleans as
+    'true' and 'false' and binary values as hex. In JSON Lines, dates and
+    times are ISO 8601 strings, decimals are strings and binary values are
+    hex.
+
+    `progress`, if given, is called with the `ExportStats` so far after
+    every batch.
+    """
+
+    if format not in FORMATS:
+        raise ValueError('format must be one of %s' % ', '.join(FORMATS))
+
+    if not hasattr(dest, 'write'):
+        compression = _compression(dest, compression)
+        with _open(dest, compression, encoding) as fp:
+            return export_table(model, fp, format, None, batch_size, using,
+                                delimiter, null, encoding, progress)
+
+    fields = get_export_fields(model)
+    columns = [f.column for f in fields]
+
+    if format == 'csv':
+        writer = csv.writer(dest, delimiter=str(delimiter))
+
+        def write_row(row):
+            cells = [_cell(v, null) for v in row]
+            if PY2:
+                cells = [c.encode(encoding) if isinstance(c, text_type)
+                         else c for c in cells]
+            writer.writerow(cells)
+
+        write_row(columns)
+
+    else:
+        encoder = _Encoder(separators=(',', ':'))
+
+        def write_row(row):
+            line = encoder.encode(OrderedDict(zip(columns, row))) + '\n'
+            dest.write(line.encode(encoding) if PY2 else line)
+
+    start = time.time()
+    stats = ExportStats(0, 0, 0.0)
+
+    for batch in _batches(model, fields, batch_size, using):
+
+        for row in batch:
+            write_row(row)
+
+        stats = ExportStats(stats.rows + len(batch), stats.batches + 1,
+                            time.time() - start)
+
+        if progress:
+            progress(stats)
+
+    return stats._replace(seconds=time.time() - start)
+
+
+def _export_one(task):
+    # Runs in a worker process, as `dmdj.loaders._load_component` does.
+    app_label, model_name, dest, kwargs = task
+
+    try:
+        model = apps.all_models[app_label][model_name]
+        return model._meta.db_table, export_table(model, dest, **kwargs), None
+    except Exception:
+        return None, None, traceback.format_exc()
+
+
+def export_tables(models, directory, format='csv', compression=None,
+                  workers=None, **kwargs):
+    """Exports the tables of several models in parallel, each to a file in
+    `directory` named after the table, e.g. `person.csv.gz`, and returns an
+    ordered dictionary of `ExportStats` keyed by table name, in the order of
+    `models`.
+
+    `format` and `compression` are as for `export_table`. The tables are
+    exported by up to `workers` worker processes, the number of CPUs by
+    default, which are forked as for `dmdj.loaders.load_tables`, and each
+    opens its own database connection. With a single worker the tables are
+    exported in this process. The remaining keyword arguments are passed to
+    `export_table`.
+    """
+
+    if format not in FORMATS:
+        raise ValueError('format must be one of %s' % ', '.join(FORMATS))
+
+    compression = _compression('', compression)
+    suffix = '.' + format
+
+    if compression is not None:
+        suffix += COMPRESSIONS[compression][0]
+
+    models = list(models)
+
+    if not models:
+        return OrderedDict()
+
+    kwargs = dict(kwargs, format=format, compression=compression)
+    tasks = [(m._meta.app_label, m._meta.model_name,
+              os.path.join(directory, m._meta.db_table + suffix), kwargs)
+             for m in models]
+
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+
+    if workers <= 1:
+        results = [_export_one(task) for task in tasks]
+    else:
+        pool = _make_pool(min(workers, len(tasks)))
+        try:
+            results = pool.map(_export_one, tasks)
+        finally:
+            pool.close()
+            pool.join()
+
+    for (app_label, model_name, dest, _), (table, stats, error) in zip(
+            tasks, results):
+        if error:
+            raise RuntimeError('Exporting %s failed:\n%s' % (dest, error))
+
+    return OrderedDict((table, stats) for table, stats, error in results)
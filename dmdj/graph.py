@@ -0,0 +1,178 @@
+from collections import OrderedDict
+
+
+class ForeignKeyGraph(object):
+    """The tables of a data model and the tables their foreign keys point to.
+
+    `edges` maps each table name, in data model order, to a tuple of the
+    tables it has foreign keys to. Foreign keys to tables outside the data
+    model are ignored.
+    """
+
+    def __init__(self, edges):
+        self.edges = edges
+
+    @classmethod
+    def from_data_model(cls, data_model):
+        """Returns the graph of a declarative style nested data model object,
+        from its `foreign_keys` constraints.
+        """
+
+        edges = OrderedDict((t['name'], []) for t in data_model['tables'])
+
+        constraints = data_model['schema']['constraints']
+
+        for fkey in constraints.get('foreign_keys', []):
+            targets = edges.get(fkey['source_table'])
+            if targets is not None and fkey['target_table'] in edges and \
+                    fkey['target_table'] not in targets:
+                targets.append(fkey['target_table'])
+
+        return cls(OrderedDict((t, tuple(v)) for t, v in edges.items()))
+
+    @classmethod
+    def from_models(cls, models):
+        """Returns the graph of a list of Django models, such as those returned
+        by `make_model`, keyed by their `db_table`s.
+        """
+
+        edges = OrderedDict((m._meta.db_table, []) for m in models)
+
+        for model in models:
+            targets = edges[model._meta.db_table]
+            for field in model._meta.concrete_fields:
+                rel = field.remote_field if hasattr(field, 'remote_field') \
+                    else field.rel
+                if rel is None:
+                    continue
+                target = getattr(rel, 'model', None) or rel.to
+                # Unresolved targets are model name strings.
+                if not hasattr(target, '_meta'):
+                    continue
+                target = target._meta.db_table
+                if target in edges and target not in targets:
+                    targets.append(target)
+
+        return cls(OrderedDict((t, tuple(v)) for t, v in edges.items()))
+
+    def strong_components(self):
+        """Returns a list of the graph's strongly connected components, as
+        tuples of table names, ordered so each component comes after the
+        components it has foreign keys to.
+
+        Tables in a foreign key cycle share a component, other tables are
+        alone in theirs. This is Tarjan's algorithm, without recursion so
+        long foreign key chains can't exceed the recursion limit.
+        """
+
+        position = dict((t, i) for i, t in enumerate(self.edges))
+        index = {}
+        lowlink = {}
+        stack = []
+        on_stack = set()
+        components = []
+
+        for root in self.edges:
+
+            if root in index:
+                continue
+
+            # (table, iterator over its targets) pairs standing in for the
+            # recursive calls.
+            work = [(root, iter(self.edges[root]))]
+            index[root] = lowlink[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+
+            while work:
+
+                table, targets = work[-1]
+                descended = False
+
+                for target in targets:
+                    if target not in index:
+                        index[target] = lowlink[target] = len(index)
+                        stack.append(target)
+                        on_stack.add(target)
+                        work.append((target, iter(self.edges[target])))
+                        descended = True
+                        break
+                    elif target in on_stack:
+                        lowlink[table] = min(lowlink[table], index[target])
+
+                if descended:
+                    continue
+
+                work.pop()
+
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[table])
+
+                if lowlink[table] == index[table]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == table:
+                            break
+                    # Keep the data model order within a component.
+                    components.append(tuple(sorted(component,
+                                                   key=position.get)))
+
+        return components
+
+    def topological_order(self):
+        """Returns the table names ordered so every table comes after the
+        tables it has foreign keys to, except within a cycle, whose tables are
+        adjacent.
+        """
+
+        return [t for component in self.strong_components()
+                for t in component]
+
+    def cycles(self):
+        """Returns the components of `strong_components` that are foreign key
+        cycles, including tables with foreign keys to themselves.
+        """
+
+        return [c for c in self.strong_components()
+                if len(c) > 1 or c[0] in self.edges[c[0]]]
+
+    def connected_components(self):
+        """Returns the groups of tables connected by foreign keys in either
+        direction, as tuples of table names in data model order. Tables in
+        different groups can be loaded or dropped independently.
+        """
+
+        position = dict((t, i) for i, t in enumerate(self.edges))
+        neighbours = dict((t, set()) for t in self.edges)
+
+        for table, targets in self.edges.items():
+            for target in targets:
+                neighbours[table].add(target)
+                neighbours[target].add(table)
+
+        seen = set()
+        components = []
+
+        for root in self.edges:
+
+            if root in seen:
+                continue
+
+            seen.add(root)
+            found = set([root])
+            todo = [root]
+
+            while todo:
+                for other in neighbours[todo.pop()]:
+                    if other not in seen:
+                        seen.add(other)
+                        found.add(other)
+                        todo.append(other)
+
+            components.append(tuple(sorted(found, key=position.get)))
+
+        return components
@@ -0,0 +1,168 @@
+import random
+from collections import defaultdict
+from contextlib import contextmanager
+from timeit import default_timer
+
+from dmdj import makers
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
+
+# In the order they happen for each table. 'group' is recorded once per data
+# model, with a table name of None.
+PHASES = ('group', 'plan', 'meta', 'fields', 'class')
+
+PHASE_DESCRIPTIONS = {
+    'group': 'grouping constraints and indexes by table',
+    'plan': 'walking the table JSON and resolving field kwargs',
+    'meta': 'creating the Meta class',
+    'fields': 'constructing Field instances',
+    'class': "ModelBase and the app registry, inside type()"
+}
+
+
+class Recorder(object):
+    """Collects the time and, optionally, the memory allocated by each phase of
+    model generation for each table.
+
+    `callback`, if given, is called as `callback(table, phase, seconds,
+    allocated)` for every phase recorded.
+
+    If `allocations` is true, the net bytes allocated during each phase are
+    recorded with `tracemalloc`, which is started if it isn't tracing
+    already. It is not available on Python 2 and slows generation down, so
+    the allocation counts are None by default.
+    """
+
+    def __init__(self, callback=None, allocations=False):
+
+        self.callback = callback
+        self.allocations = allocations and tracemalloc is not None
+        self.seconds = defaultdict(float)
+        self.allocated = defaultdict(int) if self.allocations else None
+
+    def _traced(self):
+        return tracemalloc.get_traced_memory()[0] if self.allocations else 0
+
+    def start(self):
+        """Returns a mark to pass to `stop` at the end of a phase."""
+
+        return default_timer(), self._traced()
+
+    def stop(self, table, phase, mark):
+        """Records a phase of a table since `mark` and returns a new mark, so
+        consecutive phases can be chained.
+        """
+
+        now = default_timer(), self._traced()
+        seconds = now[0] - mark[0]
+
+        self.seconds[(table, phase)] += seconds
+
+        allocated = None
+
+        if self.allocations:
+            allocated = now[1] - mark[1]
+            self.allocated[(table, phase)] += allocated
+
+        if self.callback:
+            self.callback(table, phase, seconds, allocated)
+
+        return now
+
+    def phase_totals(self):
+        """Returns a dictionary of total seconds keyed by phase."""
+
+        totals = defaultdict(float)
+
+        for (table, phase), seconds in self.seconds.items():
+            totals[phase] += seconds
+
+        return dict(totals)
+
+    def table_totals(self):
+        """Returns a dictionary of total seconds keyed by table name."""
+
+        totals = defaultdict(float)
+
+        for (table, phase), seconds in self.seconds.items():
+            if table is not None:
+                totals[table] += seconds
+
+        return dict(totals)
+
+    def slowest_tables(self, n=10):
+        """Returns the `n` slowest (table name, seconds) pairs."""
+
+        totals = self.table_totals()
+
+        return sorted(totals.items(), key=lambda item: -item[1])[:n]
+
+    def summary(self, n=10):
+        """Returns a printable report of the phase totals and slowest tables.
+        """
+
+        lines = ['Phase totals:']
+        totals = self.phase_totals()
+
+        for phase in PHASES:
+            if phase in totals:
+                line = '  %-7s %9.4fs  %s' % (phase, totals[phase],
+                                              PHASE_DESCRIPTIONS[phase])
+                if self.allocations:
+                    allocated = sum(v for (t, p), v in
+                                    self.allocated.items() if p == phase)
+                    line += ' (%d bytes)' % allocated
+                lines.append(line)
+
+        lines.append('Slowest tables:')
+
+        for table, seconds in self.slowest_tables(n):
+            phases = ', '.join('%s %.4fs' % (phase, self.seconds[(table,
+                                                                  phase)])
+                               for phase in PHASES
+                               if (table, phase) in self.seconds)
+            lines.append('  %-30s %9.4fs  (%s)' % (table, seconds, phases))
+
+        return '\n'.join(lines)
+
+
+@contextmanager
+def instrument(sample_rate=1.0, callback=None, allocations=False):
+    """Records model generation by the `dmdj.makers` functions inside the
+    block and yields the `Recorder`.
+
+    `sample_rate` is the probability the block is recorded at all, so
+    instrumentation can be left in production code and only sampled. When a
+    block isn't sampled the recorder stays empty and generation runs
+    uninstrumented.
+
+    `callback` and `allocations` are as for `Recorder`.
+
+    Only generation in the block's own thread is recorded, so blocks in
+    other threads, overlapping or not, each record their own.
+    """
+
+    recorder = Recorder(callback, allocations)
+    recorder.sampled = sample_rate >= 1 or random.random() < sample_rate
+
+    if not recorder.sampled:
+        yield recorder
+        return
+
+    started_tracing = recorder.allocations and not tracemalloc.is_tracing()
+
+    if started_tracing:
+        tracemalloc.start()
+
+    previous = getattr(makers._local, 'recorder', None)
+    makers._local.recorder = recorder
+
+    try:
+        yield recorder
+    finally:
+        makers._local.recorder = previous
+        if started_tracing:
+            tracemalloc.stop()
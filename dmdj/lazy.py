@@ -0,0 +1,109 @@
+import threading
+from collections import OrderedDict
+
+try:
+    from collections.abc import Mapping
+except ImportError:  # Python 2
+    from collections import Mapping
+
+from dmdj.makers import get_class_name, group_by_table, make_table
+
+
+class LazyModels(Mapping):
+    """A mapping of model class names to models that are only built when they
+    are first accessed.
+
+    `data_model`, `bases`, `module` and `app_label` are as for
+    `dmdj.makers.make_model`.
+
+    Accessing a model, as `models['Person']` or `models.Person`, builds it
+    with `make_table` along with every model it has a foreign key to, so its
+    relations resolve in the Django app registry. Models that are never
+    accessed are never built or registered, so `apps.get_models()` and
+    reverse relations only include the models built so far. Use `build_all`
+    where every model must be registered, e.g. for `makemigrations`.
+    """
+
+    def __init__(self, data_model, bases, module, app_label):
+
+        self.bases = bases
+        self.module = module
+        self.app_label = app_label
+
+        self._groups = group_by_table(data_model)
+        self._tables = OrderedDict((get_class_name(t['name']), t)
+                                   for t in data_model['tables'])
+        self._models = {}
+        self._lock = threading.RLock()
+
+    def __getitem__(self, name):
+
+        try:
+            return self._models[name]
+        except KeyError:
+            pass
+
+        if name not in self._tables:
+            raise KeyError(name)
+
+        with self._lock:
+            return self._build(name)
+
+    def __getattr__(self, name):
+
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __iter__(self):
+        return iter(self._tables)
+
+    def __len__(self):
+        return len(self._tables)
+
+    def __contains__(self, name):
+        return name in self._tables
+
+    def _build(self, requested):
+        # Models are only published to `_models`, which is read without the
+        # lock, once every model they lead to by foreign keys is built.
+        built = {}
+        pending = [requested]
+
+        while pending:
+
+            name = pending.pop()
+
+            if name in self._models or name in built:
+                continue
+
+            table_json = self._tables[name]
+            table_cons, table_idxs = self._groups[table_json['name']]
+
+            built[name] = make_table(table_json, table_cons, table_idxs,
+                                     self.bases, self.module, self.app_label)
+
+            for fkey_json in table_cons.get('foreign_keys', []):
+                target = get_class_name(fkey_json['target_table'])
+                if target in self._tables:
+                    pending.append(target)
+
+        self._models.update(built)
+
+        return self._models[requested]
+
+    def loaded(self):
+        """Returns the names of the models built so far, in table order."""
+
+        return [name for name in self._tables if name in self._models]
+
+    def build_all(self):
+        """Builds any models not built yet and returns all of them as a list,
+        in table order, like `make_model`.
+        """
+
+        return [self[name] for name in self._tables]
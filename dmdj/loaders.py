@@ -0,0 +1,407 @@
+import csv
+import io
+import multiprocessing
+import sys
+import time
+import traceback
+from collections import OrderedDict, namedtuple
+
+from django.apps import apps
+from django.db import connections, transaction
+
+from dmdj.converters import make_converter
+from dmdj.graph import ForeignKeyGraph
+
+PY2 = sys.version_info[0] == 2
+
+TRANSACTION_MODES = ('load', 'batch', None)
+
+# Seconds between checks on the tasks and workers of a pool.
+POLL_INTERVAL = 0.1
+
+
+class LoadStats(namedtuple('LoadStats', ['rows', 'batches', 'seconds'])):
+    """Rows and batches loaded and the seconds it took."""
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else float(self.rows)
+
+
+def get_columns(model):
+    """Returns a dictionary of a model's concrete fields keyed by database
+    column name, which for generated models is the data model field name
+    `make_field` sets as `db_column`.
+    """
+
+    return dict((field.column, field) for field in model._meta.concrete_fields)
+
+
+def _read_rows(fp, delimiter, encoding):
+
+    reader = csv.reader(fp, delimiter=str(delimiter))
+
+    if not PY2:
+        return reader
+
+    return ([cell.decode(encoding) for cell in row] for row in reader)
+
+
+def _batches(rows, batch_size):
+
+    batch = []
+
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+
+class _nullcontext(object):
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+def _insert_objects(model, fields, batch, using, convert):
+
+    attnames = [field.attname for field in fields]
+
+    objs = [model(**dict(zip(attnames, convert(row)))) for row in batch]
+
+    model.objects.using(using).bulk_create(objs)
+
+
+def _copy_rows(model, fields, batch, using, null):
+
+    connection = connections[using]
+    quote = connection.ops.quote_name
+
+    buf = io.BytesIO() if PY2 else io.StringIO()
+    writer = csv.writer(buf)
+
+    for row in batch:
+        if PY2:
+            row = [value.encode('utf-8') for value in row]
+        writer.writerow(row)
+
+    buf.seek(0)
+
+    sql = 'COPY %s (%s) FROM STDIN WITH CSV NULL %s' % (
+        quote(model._meta.db_table),
+        ', '.join(quote(field.column) for field in fields),
+        "'%s'" % null.replace("'", "''"))
+
+    with connection.cursor() as cursor:
+        cursor.cursor.copy_expert(sql, buf)
+
+
+def load_csv(model, source, delimiter=',', batch_size=10000, using='default',
+             method=None, transaction_mode='load', null='', encoding='utf-8',
+             formats=None, progress=None):
+    """Loads the rows of a delimited file into a model's table and returns
+    `LoadStats`.
+
+    `model` is a Django model class, such as one generated by `make_model`.
+
+    `source` is a path or an open file object, which on Python 3 should be
+    opened in text mode with `newline=''`. Its first row is a header of
+    database column names, i.e. the data model's field names. Columns missing
+    from the file are left to their defaults.
+
+    `delimiter` separates the values, e.g. '\\t' for TSV files.
+
+    `batch_size` is the number of rows read into memory and inserted at a
+    time.
+
+    `method` is 'copy' for PostgreSQL's `COPY ... FROM STDIN` or 'bulk_create'
+    for Django's `bulk_create`, which works with any backend. By default
+    'copy' is used for PostgreSQL connections.
+
+    `transaction_mode` is 'load' to load the whole file in a single
+    transaction, 'batch' for a transaction per batch or None to leave
+    transactions to the caller.
+
+    `null` is the value that is loaded as NULL.
+
+    `formats` sets the date, time and blob formats used to parse values for
+    'bulk_create', see `dmdj.converters.make_converter`.
+
+    `progress`, if given, is called with the `LoadStats` so far after every
+    batch.
+    """
+
+    if transaction_mode not in TRANSACTION_MODES:
+        raise ValueError('transaction_mode must be one of %r' %
+                         (TRANSACTION_MODES,))
+
+    if not hasattr(source, 'read'):
+        if PY2:
+            fp = open(source, 'rb')
+        else:
+            fp = io.open(source, newline='', encoding=encoding)
+        with fp:
+            return load_csv(model, fp, delimiter, batch_size, using, method,
+                            transaction_mode, null, encoding, formats,
+                            progress)
+
+    if method is None:
+        method = 'copy' if connections[using].vendor == 'postgresql' else \
+            'bulk_create'
+
+    if method not in ('copy', 'bulk_create'):
+        raise ValueError("method must be 'copy' or 'bulk_create'")
+
+    rows = _read_rows(source, delimiter, encoding)
+
+    columns = get_columns(model)
+    header = next(rows, [])
+    unknown = [name for name in header if name not in columns]
+
+    if unknown:
+        raise ValueError('%s has no columns named %s' % (
+            model.__name__, ', '.join(unknown)))
+
+    fields = [columns[name] for name in header]
+
+    if method == 'copy':
+        def insert(batch):
+            _copy_rows(model, fields, batch, using, null)
+    else:
+        convert = make_converter(model, header, null, formats)
+
+        def insert(batch):
+            _insert_objects(model, fields, batch, using, convert)
+
+    start = time.time()
+    stats = LoadStats(0, 0, 0.0)
+
+    with transaction.atomic(using) if transaction_mode == 'load' else \
+            _nullcontext():
+
+        for batch in _batches(rows, batch_size):
+
+            with transaction.atomic(using) if transaction_mode == 'batch' \
+                    else _nullcontext():
+                insert(batch)
+
+            stats = LoadStats(stats.rows + len(batch), stats.batches + 1,
+                              time.time() - start)
+
+            if progress:
+                progress(stats)
+
+    return stats._replace(seconds=time.time() - start)
+
+
+def _load_component(task):
+    # Runs in a worker process, so it is given model names rather than models
+    # and returns a formatted traceback rather than raising. Models are looked
+    # up in `all_models`, since generated models' apps needn't be installed.
+
+    models, using, kwargs = task
+
+    try:
+        results = []
+
+        if len(models) == 1:
+            app_label, model_name, source = models[0]
+            model = apps.all_models[app_label][model_name]
+            results.append((model._meta.db_table,
+                            load_csv(model, source, using=using, **kwargs)))
+            return results, None
+
+        # A foreign key cycle is loaded in one transaction, with constraint
+        # checks deferred to the commit.
+        kwargs = dict(kwargs, transaction_mode=None)
+
+        with transaction.atomic(using):
+
+            if connections[using].vendor == 'postgresql':
+                with connections[using].cursor() as cursor:
+                    cursor.execute('SET CONSTRAINTS ALL DEFERRED')
+
+            for app_label, model_name, source in models:
+                model = apps.all_models[app_label][model_name]
+                results.append((model._meta.db_table,
+                                load_csv(model, source, using=using,
+                                         **kwargs)))
+
+        return results, None
+
+    except Exception:
+        return None, traceback.format_exc()
+
+
+class _Result(object):
+    # A finished task, with the methods of `AsyncResult` `load_tables` uses.
+
+    def __init__(self, value):
+        self.value = value
+
+    def ready(self):
+        return True
+
+    def wait(self, timeout=None):
+        pass
+
+    def get(self, timeout=None):
+        return self.value
+
+
+class _InlinePool(object):
+    # Runs tasks in this process, for a single worker.
+
+    def apply_async(self, func, args):
+        return _Result(func(*args))
+
+    def close(self):
+        pass
+
+    def join(self):
+        pass
+
+    def terminate(self):
+        pass
+
+
+def _make_pool(workers):
+
+    # Workers inherit the generated models registered in this process, so
+    # they must be forked rather than spawned. Connections are closed first
+    # so the workers don't share them. (`connections.close_all` is Django
+    # 1.8 and later.)
+    for connection in connections.all():
+        connection.close()
+
+    if hasattr(multiprocessing, 'get_context'):
+        return multiprocessing.get_context('fork').Pool(workers)
+
+    return multiprocessing.Pool(workers)
+
+
+def _worker_pids(pool):
+    # A pool replaces a worker that dies, and the task it was running never
+    # completes, so a change in the pool's workers means a task was lost.
+    return set(process.pid for process in getattr(pool, '_pool', []))
+
+
+def load_tables(models, sources, workers=None, using='default', **kwargs):
+    """Loads files into the tables of several models in parallel and returns
+    an ordered dictionary of `LoadStats` keyed by table name, in the order
+    the tables may be loaded in.
+
+    `models` is a list of Django models, such as one returned by
+    `make_model`, and `sources` a dictionary of paths keyed by the models'
+    table names. Tables without a source are skipped.
+
+    `workers` is the number of worker processes, the number of CPUs by
+    default. Each table is loaded once the tables its foreign keys point to
+    have been, so independent tables load at the same time. The tables of a
+    foreign key cycle are loaded one after another by one worker in a single
+    transaction, with constraint checks deferred to the commit on PostgreSQL.
+    With a single worker the tables are loaded in this process.
+
+    Workers are forked, so this is not available on Windows, and each opens
+    its own database connection.
+
+    The remaining keyword arguments are passed to `load_csv` and must be
+    picklable. A `RuntimeError` is raised if a table fails to load, the
+    arguments can't be sent to a worker or a worker exits.
+    """
+
+    graph = ForeignKeyGraph.from_models(models)
+    by_table = dict((m._meta.db_table, m) for m in models)
+
+    unknown = [t for t in sources if t not in by_table]
+
+    if unknown:
+        raise ValueError('No models for tables %s' % ', '.join(unknown))
+
+    components = graph.strong_components()
+    component_of = dict((t, i) for i, c in enumerate(components) for t in c)
+
+    waiting = {}
+    dependents = dict((i, []) for i in range(len(components)))
+
+    for i, component in enumerate(components):
+        targets = set(component_of[target] for table in component
+                      for target in graph.edges[table]) - set([i])
+        waiting[i] = targets
+        for target in targets:
+            dependents[target].append(i)
+
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+
+    pool = _InlinePool() if workers <= 1 else _make_pool(workers)
+    pids = _worker_pids(pool)
+    ready = [i for i in range(len(components)) if not waiting[i]]
+    pending = OrderedDict()
+    results = {}
+
+    try:
+        while ready or pending:
+
+            for i in ready:
+
+                tables = [(by_table[t]._meta.app_label,
+                           by_table[t]._meta.model_name, sources[t])
+                          for t in components[i] if t in sources]
+
+                if not tables:
+                    pending[i] = _Result(([], None))
+                else:
+                    pending[i] = pool.apply_async(
+                        _load_component, ((tables, using, kwargs),))
+
+            ready = []
+
+            # Results are polled rather than waited on, so a task that
+            # can't be sent to a worker, or whose worker dies, fails the
+            # load instead of blocking it forever.
+            while not any(r.ready() for r in pending.values()):
+
+                if _worker_pids(pool) != pids:
+                    raise RuntimeError(
+                        'A worker process exited while loading %s' % ', '.join(
+                            t for i in pending for t in components[i]))
+
+                next(iter(pending.values())).wait(POLL_INTERVAL)
+
+            i = next(i for i, r in pending.items() if r.ready())
+
+            try:
+                component_results, error = pending.pop(i).get()
+            except Exception:
+                component_results, error = None, traceback.format_exc()
+
+            if error:
+                raise RuntimeError('Loading %s failed:\n%s' % (
+                    ', '.join(components[i]), error))
+
+            results.update(component_results)
+
+            for dependent in dependents[i]:
+                waiting[dependent].discard(i)
+                if not waiting[dependent]:
+                    ready.append(dependent)
+
+        pool.close()
+
+    except BaseException:
+        pool.terminate()
+        raise
+
+    finally:
+        pool.join()
+
+    return OrderedDict((t, results[t]) for t in graph.topological_order()
+                       if t in results)
@@ -1,10 +1,19 @@
+import json
+import threading
+from collections import OrderedDict, namedtuple
 from copy import copy
 from django.db.models import (IntegerField, DecimalField, CharField, DateField,
                               DateTimeField, ForeignKey, TextField, FloatField,
-                              TimeField, BooleanField, BinaryField)
+                              TimeField, BooleanField, BinaryField,
+                              SmallIntegerField, BigIntegerField)
+from django.utils.module_loading import import_string
+
+from dmdj.compact import Record
 
 FIELD_TYPE_MAP = {
     'integer': IntegerField,
+    'smallinteger': SmallIntegerField,
+    'biginteger': BigIntegerField,
     'number': DecimalField,
     'decimal': DecimalField,
     'float': FloatField,
@@ -39,22 +48,219 @@ PKEY_JSON = {
     'type': 'integer'
 }
 
+# The planned, immutable form of a model, produced by the `plan_*` functions
+# and turned into Django classes by the `build_*` functions. Field classes are
+# stored as dotted import paths and field kwargs as sorted (key, value) pairs,
+# so specs can be pickled and compared.
+FieldSpec = namedtuple('FieldSpec', ['name', 'type', 'args', 'kwargs'])
+MetaSpec = namedtuple('MetaSpec', ['db_table', 'index_together',
+                                   'unique_together'])
+TableSpec = namedtuple('TableSpec', ['name', 'meta', 'fields'])
 
-def make_field(field_json, constraints, indexes):
-    """Returns a dynamically constructed Django model Field class.
+# The number of table and field plans `plan_table` and `plan_field` keep.
+PLAN_CACHE_SIZE = 2048
 
-    `field_json` is a declarative style nested field object retrieved from the
-    chop-dbhi/data-models service or at least matching the format specified
+_field_classes = {}
+
+# The active `dmdj.instrument.Recorder` of each thread, if any, as its
+# `recorder` attribute. It is checked once per table, so generation without
+# instrumentation only pays for an attribute lookup.
+_local = threading.local()
+
+
+class LRUCache(object):
+    """A thread safe mapping of up to `maxsize` items that evicts the least
+    recently used item when full. The numbers of `hits` and `misses` of `get`
+    are counted.
+    """
+
+    def __init__(self, maxsize):
+
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key, default=None):
+
+        with self._lock:
+            try:
+                value = self._items.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+
+            self._items[key] = value
+            self.hits += 1
+
+            return value
+
+    def put(self, key, value):
+
+        with self._lock:
+            self._items.pop(key, None)
+            self._items[key] = value
+
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self):
+
+        with self._lock:
+            self._items.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+_plan_cache = LRUCache(PLAN_CACHE_SIZE)
+
+
+def _to_json(obj):
+
+    if isinstance(obj, Record):
+        return obj.to_dict()
+
+    raise TypeError('%r is not JSON serializable' % (obj,))
+
+
+def _plan_key(kind, *args):
+    # The arguments' JSON with sorted keys, so equal arguments give equal keys
+    # whatever their key order or whether they are compacted. None if they
+    # can't be serialized, in which case the plan isn't cached.
+    try:
+        return kind + json.dumps(args, sort_keys=True, separators=(',', ':'),
+                                 default=_to_json)
+    except (TypeError, ValueError):
+        return None
+
+
+def _memoized(kind, plan, *args):
+
+    if not _plan_cache.maxsize:
+        return plan(*args)
+
+    key = _plan_key(kind, *args)
+
+    if key is None:
+        return plan(*args)
+
+    spec = _plan_cache.get(key)
+
+    if spec is None:
+        spec = plan(*args)
+        _plan_cache.put(key, spec)
+
+    return spec
+
+
+def _text(value):
+    # Byte strings as text, in plans, so that on Python 2 plans memoized on
+    # their text don't depend on whether the data model had byte or unicode
+    # strings.
+    if isinstance(value, bytes):
+        return value.decode('utf-8')
+
+    if isinstance(value, tuple):
+        return tuple(_text(v) for v in value)
+
+    return value
+
+
+def clear_plan_cache():
+    """Empties the cache of table and field plans, e.g. after changing
+    `FIELD_TYPE_MAP` or `FIELD_KWARGS_MAP`.
+    """
+
+    _plan_cache.clear()
+
+
+def get_class_name(table_name):
+    """Returns the model class name for a table name, e.g. `visit_occurrence`
+    becomes `VisitOccurrence`.
+    """
+
+    return ''.join((i.capitalize() for i in table_name.split('_')))
+
+
+def group_by_table(data_model):
+    """Returns a dictionary of (constraints, indexes) tuples keyed by table
+    name.
+
+    `data_model` is a declarative style nested data model object retrieved from
+    the chop-dbhi/data-models service or at least matching the format specified
     there.
 
-    `constraints` is a dictionary of constraint lists retrieved from the
-    chop-dbhi/data-models service or matching that format. Only relevant
-    constraints should be included.
+    The constraints and indexes in `data_model['schema']` are visited exactly
+    once, so the cost is linear in the size of the schema rather than the
+    product of the number of tables and constraints. Every table gets every
+    constraint type key, even if the list is empty, as `make_table` expects.
+    """
 
-    `indexes` is a list of index objects retrieved from chop-dbhi/data-models
-    or similar. Only relevant indexes should be included.
+    con_types = list(data_model['schema']['constraints'].keys())
+
+    groups = {}
+
+    for table_json in data_model['tables']:
+        groups[table_json['name']] = ({con_type: [] for con_type in
+                                       con_types}, [])
+
+    for con_type, con_list in data_model['schema']['constraints'].items():
+        for con in con_list:
+            table_name = con.get('table') or con.get('source_table')
+            if table_name in groups:
+                groups[table_name][0][con_type].append(con)
+
+    for index in data_model['schema']['indexes']:
+        if index['table'] in groups:
+            groups[index['table']][1].append(index)
+
+    return groups
+
+
+def group_by_field(fields_json, constraints, indexes):
+    """Returns a dictionary of (constraints, indexes) tuples keyed by field
+    name.
+
+    `fields_json` is a list of declarative style field objects belonging to a
+    single table.
+
+    `constraints` is a dictionary of constraint lists and `indexes` is a list
+    of index objects, both already restricted to that table.
+
+    Like `group_by_table`, each constraint and index is visited once and every
+    field gets every constraint type key.
     """
 
+    groups = {}
+
+    for field_json in fields_json:
+        groups[field_json['name']] = ({con_type: [] for con_type in
+                                       constraints}, [])
+
+    for con_type, con_list in constraints.items():
+        for con in con_list:
+            if 'fields' not in con:
+                fields = [con.get('field') or con.get('source_field')]
+            else:
+                fields = con['fields']
+            for name in set(fields):
+                if name in groups:
+                    groups[name][0][con_type].append(con)
+
+    for index in indexes:
+        for name in set(index['fields']):
+            if name in groups:
+                groups[name][1].append(index)
+
+    return groups
+
+
+def _plan_field(field_json, constraints, indexes):
+
     args = []
     kwargs = {}
 
@@ -92,8 +298,7 @@ def make_field(field_json, constraints, indexes):
         datatype = ForeignKey
         fkey_json = constraints['foreign_keys'][0]
 
-        target_model_name = ''.join((i.capitalize() for i in
-                                     fkey_json['target_table'].split('_')))
+        target_model_name = get_class_name(fkey_json['target_table'])
 
         args.append(target_model_name)
 
@@ -103,13 +308,16 @@ def make_field(field_json, constraints, indexes):
         kwargs['related_name'] = '%s_%s_set' % (fkey_json['source_table'],
                                                 fkey_json['source_field'])
 
-    return datatype(*args, **kwargs)
+    return FieldSpec(_text(field_json['name']),
+                     '%s.%s' % (datatype.__module__, datatype.__name__),
+                     _text(tuple(args)),
+                     tuple((k, _text(v)) for k, v in sorted(kwargs.items())))
 
 
-def make_meta(table_json, constraints, indexes, app_label):
-    """Returns a dynamically constructed Django model Meta class.
+def plan_field(field_json, constraints, indexes):
+    """Returns a `FieldSpec` planning a Django model Field.
 
-    `table_json` is a declarative style nested table object retrieved from the
+    `field_json` is a declarative style nested field object retrieved from the
     chop-dbhi/data-models service or at least matching the format specified
     there.
 
@@ -120,20 +328,63 @@ def make_meta(table_json, constraints, indexes, app_label):
     `indexes` is a list of index objects retrieved from chop-dbhi/data-models
     or similar. Only relevant indexes should be included.
 
-    `app_label` is the string `app_label`, which will be included in the
-    models' Meta classes. It is useful for associating the models with a
-    particular Django app.
+    Plans are memoized on the arguments' content, see `plan_table`.
     """
 
-    class_contents = {'db_table': table_json['name'], 'app_label': app_label}
+    return _memoized('field', _plan_field, field_json, constraints,
+                     indexes)
+
+
+def build_field(field_spec):
+    """Returns a Django model Field class instance from a `FieldSpec`."""
+
+    try:
+        datatype = _field_classes[field_spec.type]
+    except KeyError:
+        datatype = _field_classes[field_spec.type] = \
+            import_string(field_spec.type)
+
+    return datatype(*field_spec.args, **dict(field_spec.kwargs))
+
+
+def make_field(field_json, constraints, indexes):
+    """Returns a dynamically constructed Django model Field class.
+
+    `field_json` is a declarative style nested field object retrieved from the
+    chop-dbhi/data-models service or at least matching the format specified
+    there.
+
+    `constraints` is a dictionary of constraint lists retrieved from the
+    chop-dbhi/data-models service or matching that format. Only relevant
+    constraints should be included.
+
+    `indexes` is a list of index objects retrieved from chop-dbhi/data-models
+    or similar. Only relevant indexes should be included.
+    """
+
+    return build_field(plan_field(field_json, constraints, indexes))
+
+
+def plan_meta(table_json, constraints, indexes):
+    """Returns a `MetaSpec` planning a Django model Meta class.
+
+    `table_json` is a declarative style nested table object retrieved from the
+    chop-dbhi/data-models service or at least matching the format specified
+    there.
+
+    `constraints` is a dictionary of constraint lists retrieved from the
+    chop-dbhi/data-models service or matching that format. Only relevant
+    constraints should be included.
+
+    `indexes` is a list of index objects retrieved from chop-dbhi/data-models
+    or similar. Only relevant indexes should be included.
+    """
 
     multi_idxs = []
 
     for index in indexes:
         if len(index['fields']) > 1:
-            multi_idxs.append(copy(index['fields']))
-
-    class_contents['index_together'] = multi_idxs
+            multi_idxs.append(tuple(index['fields']))
 
     multi_uqs = []
 
@@ -142,13 +393,29 @@ def make_meta(table_json, constraints, indexes, app_label):
             if len(unique['fields']) > 1:
                 multi_uqs.append(tuple(unique['fields']))
 
-    class_contents['unique_together'] = tuple(multi_uqs)
+    return MetaSpec(_text(table_json['name']), _text(tuple(multi_idxs)),
+                    _text(tuple(multi_uqs)))
+
+
+def build_meta(meta_spec, app_label):
+    """Returns a Django model Meta class from a `MetaSpec`.
+
+    `app_label` is the string `app_label`, which will be included in the
+    Meta class.
+    """
+
+    class_contents = {
+        'db_table': meta_spec.db_table,
+        'app_label': app_label,
+        'index_together': [list(i) for i in meta_spec.index_together],
+        'unique_together': meta_spec.unique_together
+    }
 
     return type(str('Meta'), (), class_contents)
 
 
-def make_table(table_json, constraints, indexes, bases, module, app_label):
-    """Returns a dynamically constructed Django table model class.
+def make_meta(table_json, constraints, indexes, app_label):
+    """Returns a dynamically constructed Django model Meta class.
 
     `table_json` is a declarative style nested table object retrieved from the
     chop-dbhi/data-models service or at least matching the format specified
@@ -161,27 +428,23 @@ def make_table(table_json, constraints, indexes, bases, module, app_label):
     `indexes` is a list of index objects retrieved from chop-dbhi/data-models
     or similar. Only relevant indexes should be included.
 
-    `bases` is a tuple of base classes the produced model should inherit from.
-    This could simply be (django.db.models.Model,).
-
-    `module` is the dot separated string path of the module within which the
-    models will reside. It is required by the Django model constructor.
-
     `app_label` is the string `app_label`, which will be included in the
     models' Meta classes. It is useful for associating the models with a
     particular Django app.
     """
 
-    class_name = ''.join((i.capitalize() for i in
-                          table_json['name'].split('_')))
+    return build_meta(plan_meta(table_json, constraints, indexes), app_label)
+
 
-    class_contents = {'__module__': module}
+def _plan_table(table_json, constraints, indexes):
+
+    fields_json = table_json['fields']
+    constraints = dict(constraints)
 
     if constraints.get('primary_keys') and \
             len(constraints['primary_keys'][0]['fields']) > 1:
 
-        if 'uniques' not in constraints:
-            constraints['uniques'] = []
+        constraints['uniques'] = list(constraints.get('uniques', []))
 
         constraints['uniques'].append({
             'name': 'xnk_%s' % table_json['name'],
@@ -189,8 +452,7 @@ def make_table(table_json, constraints, indexes, bases, module, app_label):
             'fields': copy(constraints['primary_keys'][0]['fields'])
         })
 
-        if 'not_null' not in constraints:
-            constraints['not_null'] = []
+        constraints['not_null'] = list(constraints.get('not_null', []))
 
         for field in constraints['primary_keys'][0]['fields']:
             constraints['not_null'].append({
@@ -203,7 +465,7 @@ def make_table(table_json, constraints, indexes, bases, module, app_label):
 
         pkey_json = copy(PKEY_JSON)
         pkey_json['table'] = table_json['name']
-        table_json['fields'].append(pkey_json)
+        fields_json = list(fields_json) + [pkey_json]
 
         constraints['primary_keys'] = [{
             'name': 'xpk_%s' % table_json['name'],
@@ -211,46 +473,124 @@ def make_table(table_json, constraints, indexes, bases, module, app_label):
             'fields': ['id']
         }]
 
-    class_contents['Meta'] = make_meta(table_json, constraints, indexes,
-                                       app_label)
+    meta_spec = plan_meta(table_json, constraints, indexes)
 
-    for field_json in table_json['fields']:
+    field_groups = group_by_field(fields_json, constraints, indexes)
 
-        field_cons = {}
+    field_specs = []
 
-        for con_type, con_list in constraints.items():
+    for field_json in fields_json:
 
-            field_cons[con_type] = []
+        field_cons, field_idxs = field_groups[field_json['name']]
 
-            for con in con_list:
+        field_specs.append(_plan_field(field_json, field_cons, field_idxs))
 
-                if 'fields' not in con:
-                    fields = [con.get('field') or con.get('source_field')]
-                else:
-                    fields = con['fields']
-                if field_json['name'] in fields:
-                    field_cons[con_type].append(con)
+    return TableSpec(_text(get_class_name(table_json['name'])), meta_spec,
+                     tuple(field_specs))
 
-        field_idxs = []
 
-        for index in indexes:
-            if field_json['name'] in index['fields']:
-                field_idxs.append(index)
+def plan_table(table_json, constraints, indexes):
+    """Returns a `TableSpec` planning a Django table model.
 
-        class_contents[field_json['name']] = make_field(field_json, field_cons,
-                                                        field_idxs)
+    `table_json` is a declarative style nested table object retrieved from the
+    chop-dbhi/data-models service or at least matching the format specified
+    there.
 
-    return type(str(class_name), bases, class_contents)
+    `constraints` is a dictionary of constraint lists retrieved from the
+    chop-dbhi/data-models service or matching that format. Only relevant
+    constraints should be included.
 
+    `indexes` is a list of index objects retrieved from chop-dbhi/data-models
+    or similar. Only relevant indexes should be included.
 
-def make_model(data_model, bases, module, app_label):
-    """Returns a list of dynamically constructed Django model classes.
+    A surrogate `id` primary key is planned if the table has no primary key
+    or a composite one, in which case the composite key becomes an `xnk_`
+    unique constraint with not null fields. The arguments are not modified.
 
-    `data_model` is a declarative style nested data model object retrieved from
-    the chop-dbhi/data-models service or at least matching the format specified
+    Plans are memoized on a key of the arguments' content that ignores key
+    order, in an LRU cache of the `PLAN_CACHE_SIZE` most recently used plans,
+    so planning the same tables again, e.g. for another app label, is cheap.
+    Specs are immutable, so they are shared safely; the Django classes built
+    from them are always new. Strings in specs are text, so on Python 2 byte
+    and unicode strings with the same text share plans.
+    """
+
+    recorder = getattr(_local, 'recorder', None)
+
+    if recorder is None:
+        return _memoized('table', _plan_table, table_json, constraints,
+                         indexes)
+
+    mark = recorder.start()
+    table_spec = _memoized('table', _plan_table, table_json, constraints,
+                           indexes)
+    recorder.stop(table_json['name'], 'plan', mark)
+
+    return table_spec
+
+
+def build_table_contents(table_spec, module, app_label):
+    """Returns the class contents of a Django table model from a `TableSpec`:
+    a dictionary of the model's fields, its `Meta` class and `__module__`,
+    ready to be passed to `type` with the model's bases.
+
+    `module` and `app_label` are as for `make_table`.
+    """
+
+    class_contents = {'__module__': module,
+                      'Meta': build_meta(table_spec.meta, app_label)}
+
+    for field_spec in table_spec.fields:
+        class_contents[field_spec.name] = build_field(field_spec)
+
+    return class_contents
+
+
+def build_table(table_spec, bases, module, app_label):
+    """Returns a dynamically constructed Django table model class from a
+    `TableSpec`.
+
+    `bases`, `module` and `app_label` are as for `make_table`.
+    """
+
+    recorder = getattr(_local, 'recorder', None)
+
+    if recorder is None:
+        return type(str(table_spec.name), bases,
+                    build_table_contents(table_spec, module, app_label))
+
+    table_name = table_spec.meta.db_table
+
+    mark = recorder.start()
+    class_contents = {'__module__': module,
+                      'Meta': build_meta(table_spec.meta, app_label)}
+    mark = recorder.stop(table_name, 'meta', mark)
+
+    for field_spec in table_spec.fields:
+        class_contents[field_spec.name] = build_field(field_spec)
+
+    mark = recorder.stop(table_name, 'fields', mark)
+    model = type(str(table_spec.name), bases, class_contents)
+    recorder.stop(table_name, 'class', mark)
+
+    return model
+
+
+def make_table(table_json, constraints, indexes, bases, module, app_label):
+    """Returns a dynamically constructed Django table model class.
+
+    `table_json` is a declarative style nested table object retrieved from the
+    chop-dbhi/data-models service or at least matching the format specified
     there.
 
-    `bases` is a tuple of base classes the produced models should inherit from.
+    `constraints` is a dictionary of constraint lists retrieved from the
+    chop-dbhi/data-models service or matching that format. Only relevant
+    constraints should be included.
+
+    `indexes` is a list of index objects retrieved from chop-dbhi/data-models
+    or similar. Only relevant indexes should be included.
+
+    `bases` is a tuple of base classes the produced model should inherit from.
     This could simply be (django.db.models.Model,).
 
     `module` is the dot separated string path of the module within which the
@@ -261,28 +601,66 @@ def make_model(data_model, bases, module, app_label):
     particular Django app.
     """
 
-    output_models = []
+    return build_table(plan_table(table_json, constraints, indexes), bases,
+                       module, app_label)
+
+
+def plan_model(data_model):
+    """Returns a tuple of `TableSpec`s planning a data model's Django models.
+
+    `data_model` is a declarative style nested data model object retrieved from
+    the chop-dbhi/data-models service or at least matching the format specified
+    there. It is not modified.
+    """
+
+    table_specs = []
+
+    recorder = getattr(_local, 'recorder', None)
+
+    if recorder is not None:
+        mark = recorder.start()
+
+    table_groups = group_by_table(data_model)
+
+    if recorder is not None:
+        recorder.stop(None, 'group', mark)
 
     for table_json in data_model['tables']:
 
-        table_cons = {}
+        table_cons, table_idxs = table_groups[table_json['name']]
 
-        for con_type, con_list in data_model['schema']['constraints'].items():
+        table_specs.append(plan_table(table_json, table_cons, table_idxs))
 
-            table_cons[con_type] = []
+    return tuple(table_specs)
 
-            for con in con_list:
-                table_name = con.get('table') or con.get('source_table')
-                if table_name == table_json['name']:
-                    table_cons[con_type].append(con)
 
-        table_idxs = []
+def build_model(table_specs, bases, module, app_label):
+    """Returns a list of dynamically constructed Django model classes from
+    `TableSpec`s, such as those returned by `plan_model`.
 
-        for index in data_model['schema']['indexes']:
-            if index['table'] == table_json['name']:
-                table_idxs.append(index)
+    `bases`, `module` and `app_label` are as for `make_model`.
+    """
+
+    return [build_table(table_spec, bases, module, app_label)
+            for table_spec in table_specs]
 
-        output_models.append(make_table(table_json, table_cons, table_idxs,
-                                        bases, module, app_label))
 
-    return output_models
+def make_model(data_model, bases, module, app_label):
+    """Returns a list of dynamically constructed Django model classes.
+
+    `data_model` is a declarative style nested data model object retrieved from
+    the chop-dbhi/data-models service or at least matching the format specified
+    there.
+
+    `bases` is a tuple of base classes the produced models should inherit from.
+    This could simply be (django.db.models.Model,).
+
+    `module` is the dot separated string path of the module within which the
+    models will reside. It is required by the Django model constructor.
+
+    `app_label` is the string `app_label`, which will be included in the
+    models' Meta classes. It is useful for associating the models with a
+    particular Django app.
+    """
+
+    return build_model(plan_model(data_model), bases, module, app_label)
@@ -0,0 +1,162 @@
+from collections import OrderedDict
+
+from django.db import migrations
+
+from dmdj.makers import _text, build_field, plan_model
+
+
+def _create_model(table_spec, fields):
+
+    options = OrderedDict([('db_table', table_spec.meta.db_table)])
+
+    if table_spec.meta.index_together:
+        options['index_together'] = set(table_spec.meta.index_together)
+
+    if table_spec.meta.unique_together:
+        options['unique_together'] = set(table_spec.meta.unique_together)
+
+    return migrations.CreateModel(
+        name=table_spec.name,
+        fields=[(f.name, build_field(f)) for f in fields],
+        options=options)
+
+
+def _target(field_spec):
+    # The class name of a foreign key's target model, or None.
+    if field_spec.type.endswith('.ForeignKey'):
+        return field_spec.args[0]
+
+
+def _alter_together(old_spec, new_spec, before, after):
+
+    for option, operation in (('unique_together',
+                               migrations.AlterUniqueTogether),
+                              ('index_together',
+                               migrations.AlterIndexTogether)):
+
+        old = set(getattr(old_spec.meta, option))
+        new = set(getattr(new_spec.meta, option))
+
+        # Sets over fields about to be removed or altered are dropped first,
+        # new ones are added once their fields exist.
+        if old - new:
+            before.append(operation(new_spec.name, old & new))
+
+        if new - old:
+            after.append(operation(new_spec.name, new))
+
+
+def make_operations(old_model, new_model):
+    """Returns a list of Django migration operations changing the models of
+    `old_model` into those of `new_model`.
+
+    `old_model` and `new_model` are declarative style nested data model
+    objects retrieved from the chop-dbhi/data-models service or at least
+    matching the format specified there, e.g. two versions of the same data
+    model.
+
+    Both are planned with `dmdj.makers.plan_model`, so the operations make
+    the same primary key, `unique_together` and `index_together` decisions as
+    `make_model`. Tables and fields are matched by name only, so a rename is
+    a removal and an addition. Fields whose plans differ are altered in place.
+    """
+
+    old_specs = OrderedDict((s.meta.db_table, s) for s in
+                            plan_model(old_model))
+    new_specs = OrderedDict((s.meta.db_table, s) for s in
+                            plan_model(new_model))
+
+    before = []
+    removals = []
+    creations = []
+    deferred = []
+    changes = []
+    after = []
+    deletions = []
+
+    for table, new_spec in new_specs.items():
+
+        if table not in old_specs:
+            continue
+
+        old_spec = old_specs[table]
+
+        if old_spec == new_spec:
+            continue
+
+        old_fields = OrderedDict((f.name, f) for f in old_spec.fields)
+        new_fields = OrderedDict((f.name, f) for f in new_spec.fields)
+
+        _alter_together(old_spec, new_spec, before, after)
+
+        for name in old_fields:
+            if name not in new_fields:
+                removals.append(migrations.RemoveField(new_spec.name, name))
+
+        for name, field_spec in new_fields.items():
+            if name not in old_fields:
+                changes.append(migrations.AddField(
+                    new_spec.name, name, build_field(field_spec)))
+            elif old_fields[name] != field_spec:
+                changes.append(migrations.AlterField(
+                    new_spec.name, name, build_field(field_spec)))
+
+    # Foreign keys to new models that haven't been created yet are added once
+    # all of them have been, so cycles between new tables are fine.
+    pending = set(s.name for t, s in new_specs.items() if t not in old_specs)
+
+    for table, new_spec in new_specs.items():
+
+        if table in old_specs:
+            continue
+
+        pending.discard(new_spec.name)
+        fields = []
+
+        for field_spec in new_spec.fields:
+            if _target(field_spec) in pending:
+                deferred.append(migrations.AddField(
+                    new_spec.name, field_spec.name, build_field(field_spec)))
+            else:
+                fields.append(field_spec)
+
+        creations.append(_create_model(new_spec, fields))
+
+    # Likewise, foreign keys between removed models are removed before any of
+    # the models are deleted.
+    removed = set(s.name for t, s in old_specs.items() if t not in new_specs)
+
+    for table, old_spec in old_specs.items():
+
+        if table in new_specs:
+            continue
+
+        for field_spec in old_spec.fields:
+            if _target(field_spec) in removed:
+                removals.append(migrations.RemoveField(old_spec.name,
+                                                       field_spec.name))
+
+        deletions.append(migrations.DeleteModel(old_spec.name))
+
+    return sum([before, removals, creations, deferred, changes, after,
+                deletions], [])
+
+
+def make_migration(old_model, new_model, app_label, name, dependencies=()):
+    """Returns a Django `Migration` with the operations of `make_operations`.
+
+    `name` is the migration's name, e.g. '0002_pedsnet_2_1_0', and
+    `dependencies` a sequence of (app_label, migration name) pairs.
+    `old_model` may be None for an app's initial migration.
+    """
+
+    if old_model is None:
+        old_model = {'tables': [], 'schema': {'constraints': {},
+                                              'indexes': []}}
+
+    migration = migrations.Migration(name, app_label)
+    migration.operations = make_operations(old_model, new_model)
+    migration.dependencies = [_text(tuple(d)) for d in dependencies]
+    migration.initial = not old_model['tables']
+
+    return migration
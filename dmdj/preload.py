@@ -0,0 +1,85 @@
+import gc
+
+import django
+from django.apps import apps
+
+from dmdj.makers import clear_plan_cache
+
+# The `Options` attributes Django computes and caches on first use, as
+# listed by `Options.FORWARD_PROPERTIES` and `REVERSE_PROPERTIES` (Django
+# 1.8 and later).
+META_PROPERTIES = ('fields', 'concrete_fields', 'local_concrete_fields',
+                   'many_to_many', 'related_objects', '_forward_fields_map',
+                   'fields_map', 'managers', 'managers_map', 'base_manager',
+                   'default_manager')
+
+
+def warm_models(models=None):
+    """Computes the lazily cached `_meta` attributes of models, which Django
+    otherwise computes in each process the first time a model is used, and
+    returns the list of models.
+
+    `models` defaults to every model registered with the app registry,
+    including those whose app label isn't an installed app's, as
+    `make_model` allows.
+    """
+
+    if models is None:
+        models = [model for app_models in list(apps.all_models.values())
+                  for model in list(app_models.values())]
+
+    models = list(models)
+
+    for model in models:
+        opts = model._meta
+
+        if hasattr(opts, 'get_fields'):
+            opts.get_fields()
+            opts.get_fields(include_hidden=True)
+        else:
+            # Django 1.7 fills its field, related object and name caches.
+            opts.get_all_field_names()
+
+        for name in META_PROPERTIES:
+            getattr(opts, name, None)
+
+    return models
+
+
+def preload(models=None, clear_plans=True):
+    """Prepares a process that has built its models to be forked into
+    workers, such as a gunicorn master with `preload_app` or a Celery
+    master, and returns the list of models warmed.
+
+    Django is set up first if it isn't already, which builds the models of
+    `dmdj.apps.DataModelsConfig` apps. Then:
+
+    - `warm_models(models)` computes the models' `_meta` caches, so the
+      workers don't each compute them, and write to the pages they share
+      with the master, on their first requests.
+    - If `clear_plans` is true, the table and field plans `make_model` keeps
+      (spec tuples and field keyword dictionaries) are released, since the
+      built models don't refer to them.
+    - A full collection is run, so the garbage the generation left is freed
+      in the master rather than by the first collection in each worker.
+
+    The models themselves are still copied into a worker's memory, a page at
+    a time, as it uses them and updates their reference counts, and its
+    collections still visit them.
+
+    Call it once the models are built and the application is imported, just
+    before the workers are forked, e.g. at the end of the WSGI module or
+    from a gunicorn `when_ready` or Celery `worker_init` hook.
+    """
+
+    if not apps.ready and hasattr(django, 'setup'):
+        django.setup()
+
+    models = warm_models(models)
+
+    if clear_plans:
+        clear_plan_cache()
+
+    gc.collect()
+
+    return models
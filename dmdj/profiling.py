@@ -0,0 +1,388 @@
+import io
+import math
+from collections import OrderedDict, namedtuple
+from copy import copy
+from decimal import Decimal, InvalidOperation
+
+from dmdj.compact import expand
+from dmdj.loaders import PY2, _read_rows
+from dmdj.makers import PKEY_JSON, group_by_table
+
+INTEGER_RANGES = (
+    ('smallinteger', -2 ** 15, 2 ** 15 - 1),
+    ('integer', -2 ** 31, 2 ** 31 - 1),
+    ('biginteger', -2 ** 63, 2 ** 63 - 1)
+)
+
+INTEGER_TYPES = tuple(name for name, low, high in INTEGER_RANGES)
+
+DECIMAL_TYPES = ('number', 'decimal')
+
+STRING_TYPES = ('string',)
+
+# The precision and scale `make_field` uses for decimals without them.
+DEFAULT_PRECISION = 20
+DEFAULT_SCALE = 10
+
+# A change to a field of a data model: `changes` is a dictionary of the field
+# object keys to set, e.g. {'type': 'smallinteger'}, and `reason` says why.
+Suggestion = namedtuple('Suggestion', ['table', 'field', 'changes', 'reason'])
+
+
+class ColumnProfile(object):
+    """What a sample of a column's values needs from its field type: the
+    numbers of `values`, `nulls` and values that don't parse as the type
+    (`invalid`), the `minimum` and `maximum` integers, the longest string
+    (`max_length`) and, for decimals, the most digits before the point
+    (`max_digits`) and after it (`max_scale`).
+    """
+
+    def __init__(self, datatype):
+
+        self.datatype = datatype
+        self.values = 0
+        self.nulls = 0
+        self.invalid = 0
+        self.minimum = None
+        self.maximum = None
+        self.max_length = 0
+        self.max_digits = 0
+        self.max_scale = 0
+
+        if datatype in INTEGER_TYPES:
+            self.update = self._update_integer
+        elif datatype in DECIMAL_TYPES:
+            self.update = self._update_decimal
+        elif datatype in STRING_TYPES:
+            self.update = self._update_string
+        else:
+            self.update = self._update_other
+
+    def _update_integer(self, value):
+
+        try:
+            value = int(value)
+        except ValueError:
+            self.invalid += 1
+            return
+
+        self.values += 1
+
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+
+    def _update_decimal(self, value):
+
+        try:
+            digits, exponent = Decimal(value).as_tuple()[1:]
+        except InvalidOperation:
+            self.invalid += 1
+            return
+
+        if not isinstance(exponent, int):
+            # NaN or infinity.
+            self.invalid += 1
+            return
+
+        self.values += 1
+        self.max_digits = max(self.max_digits, len(digits) + exponent)
+        self.max_scale = max(self.max_scale, -exponent)
+
+    def _update_string(self, value):
+
+        self.values += 1
+        self.max_length = max(self.max_length, len(value))
+
+    def _update_other(self, value):
+
+        self.values += 1
+
+
+class TableProfile(object):
+    """The number of `rows` sampled from a table and a `ColumnProfile` of
+    each of its fields, keyed by field name.
+    """
+
+    def __init__(self, table_json):
+
+        self.name = table_json['name']
+        self.rows = 0
+        self.columns = OrderedDict((f['name'], ColumnProfile(f['type']))
+                                   for f in table_json['fields'])
+
+    def update(self, header, rows, null=''):
+        """Adds rows of raw strings in `header` column order. Values equal
+        to `null` are counted as nulls.
+        """
+
+        updates = []
+
+        for i, name in enumerate(header):
+            if name not in self.columns:
+                raise ValueError('%s has no field named %s' % (
+                    self.name, name))
+            updates.append((i, self.columns[name]))
+
+        for row in rows:
+
+            self.rows += 1
+
+            for i, column in updates:
+                value = row[i]
+                if value == null:
+                    column.nulls += 1
+                else:
+                    column.update(value)
+
+
+def profile_csv(table_json, source, profile=None, delimiter=',', null='',
+                encoding='utf-8'):
+    """Returns the `TableProfile` of a sample of a table's data in a delimited
+    file, read as by `dmdj.loaders.load_csv`.
+
+    `table_json` is the declarative style table object the data belongs to
+    and `source` a path or an open file object, with a header of field names.
+
+    `profile` is a `TableProfile` to add the rows to, e.g. from another file
+    of the same table.
+    """
+
+    if profile is None:
+        profile = TableProfile(table_json)
+
+    if not hasattr(source, 'read'):
+        if PY2:
+            fp = open(source, 'rb')
+        else:
+            fp = io.open(source, newline='', encoding=encoding)
+        with fp:
+            return profile_csv(table_json, fp, profile, delimiter, null,
+                               encoding)
+
+    rows = _read_rows(source, delimiter, encoding)
+    profile.update(next(rows, []), rows, null)
+
+    return profile
+
+
+def profile_data_model(data_model, sources, delimiter=',', null='',
+                       encoding='utf-8'):
+    """Returns a dictionary of `TableProfile`s keyed by table name.
+
+    `sources` maps table names to a path or file object, or a list of them,
+    of sample data as for `profile_csv`.
+    """
+
+    tables = dict((t['name'], t) for t in data_model['tables'])
+    profiles = {}
+
+    for name, paths in sources.items():
+
+        if name not in tables:
+            raise ValueError('The data model has no table named %s' % name)
+
+        if not isinstance(paths, (list, tuple)):
+            paths = [paths]
+
+        profile = TableProfile(tables[name])
+
+        for path in paths:
+            profile_csv(tables[name], path, profile, delimiter, null,
+                        encoding)
+
+        profiles[name] = profile
+
+    return profiles
+
+
+def _integer_type(minimum, maximum):
+
+    for name, low, high in INTEGER_RANGES:
+        if low <= minimum and maximum <= high:
+            return name
+
+    return None
+
+
+def _grow(value, headroom):
+    return int(math.ceil(value * headroom))
+
+
+def _suggest_field(table, field_json, column, headroom, rows=None):
+    # `rows` is the expected number of rows of a table whose primary key is
+    # the field, which its values will reach whatever the sample's range.
+
+    datatype = field_json['type']
+
+    if not column.values or column.invalid:
+        return None
+
+    if datatype in INTEGER_TYPES:
+
+        maximum = max(column.maximum, rows or 0)
+        suggested = _integer_type(_grow(column.minimum, headroom),
+                                  _grow(maximum, headroom))
+
+        if suggested and suggested != datatype:
+            reason = 'values from %d to %d' % (column.minimum,
+                                               column.maximum)
+            if maximum > column.maximum:
+                reason += ' and up to %d rows' % rows
+            return Suggestion(table, field_json['name'], {'type': suggested},
+                              reason)
+
+    elif datatype in DECIMAL_TYPES:
+
+        # The max_digits and decimal_places `make_field` would use.
+        current = (field_json.get('precision') or DEFAULT_PRECISION,
+                   field_json.get('scale') or DEFAULT_SCALE)
+
+        digits = _grow(max(column.max_digits, 1), headroom)
+
+        # Declared precisions and scales are only widened. A scale of 0
+        # means the default, so whole numbers get a scale of 1.
+        if field_json.get('precision') or field_json.get('scale'):
+            scale = max(current[1], column.max_scale)
+            suggested = (max(current[0] - current[1], digits) + scale, scale)
+        else:
+            scale = max(column.max_scale, 1)
+            suggested = (digits + scale, scale)
+
+        if suggested != current:
+            return Suggestion(table, field_json['name'],
+                              {'precision': suggested[0],
+                               'scale': suggested[1]},
+                              'up to %d digits and %d decimal places' % (
+                                  column.max_digits, column.max_scale))
+
+    elif datatype in STRING_TYPES:
+
+        length = field_json.get('length') or 0
+        needed = max(_grow(column.max_length, headroom), 1)
+
+        # Declared lengths are only widened; the default, 255, is replaced.
+        if not length or length < needed:
+            return Suggestion(table, field_json['name'], {'length': needed},
+                              'up to %d characters' % column.max_length)
+
+    return None
+
+
+def suggest_types(data_model, profiles, headroom=1.5, row_counts=None):
+    """Returns a list of `Suggestion`s of narrower or wider field types for a
+    data model, from `TableProfile`s of sample data, such as those returned
+    by `profile_data_model`.
+
+    Integers become 'smallinteger', 'integer' or 'biginteger' fields to fit
+    their range. Decimals without a precision and scale get the smallest
+    that fit instead of 20 and 10, and strings without a length the longest
+    value's length instead of 255. Declared precisions, scales and lengths
+    are only widened, when sample values wouldn't fit them. Columns with
+    values that don't parse as their type are left alone.
+
+    Integers, the lengths of strings and the digits before the point of
+    decimals are multiplied by `headroom` before they are fitted, so values
+    larger than those sampled have room; 1 fits the sample exactly.
+
+    `row_counts` maps table names to their expected numbers of rows, which
+    otherwise are the sampled numbers. An integer field that is its table's
+    primary key is fitted to at least the expected rows, as well as its
+    sampled values. Tables that would get the surrogate `id` primary key
+    `make_table` adds get an explicit 'biginteger' `id` field when their
+    expected rows times `headroom` exceed the range of an 'integer'.
+    """
+
+    row_counts = row_counts or {}
+    table_groups = group_by_table(data_model)
+    suggestions = []
+
+    for table_json in data_model['tables']:
+
+        name = table_json['name']
+        profile = profiles.get(name)
+        primary_keys = table_groups[name][0].get('primary_keys')
+        pkey = None
+
+        if primary_keys and len(primary_keys[0]['fields']) == 1:
+            pkey = primary_keys[0]['fields'][0]
+
+        if profile is not None:
+            for field_json in table_json['fields']:
+                suggestion = _suggest_field(
+                    name, field_json, profile.columns[field_json['name']],
+                    headroom, row_counts.get(name)
+                    if field_json['name'] == pkey else None)
+                if suggestion:
+                    suggestions.append(suggestion)
+
+        if pkey is not None:
+            continue
+
+        rows = row_counts.get(name, profile.rows if profile else 0)
+
+        if _grow(rows, headroom) > INTEGER_RANGES[1][2]:
+            suggestions.append(Suggestion(name, 'id', {'type': 'biginteger'},
+                                          'up to %d rows' % rows))
+
+    return suggestions
+
+
+def _add_primary_key(data_model, table_json, changes):
+    # Replaces the surrogate id `make_table` would add with an explicit field
+    # and primary key, which are planned the same way apart from `changes`.
+    name = table_json['name']
+    constraints = data_model['schema']['constraints']
+    primary_keys = constraints.setdefault('primary_keys', [])
+
+    for pkey in [p for p in primary_keys if p['table'] == name]:
+
+        primary_keys.remove(pkey)
+
+        constraints.setdefault('uniques', []).append({
+            'name': 'xnk_%s' % name,
+            'table': name,
+            'fields': list(pkey['fields'])
+        })
+
+        not_null = constraints.setdefault('not_null', [])
+
+        for field in pkey['fields']:
+            not_null.append({'table': name, 'field': field})
+
+    primary_keys.append({'name': 'xpk_%s' % name, 'table': name,
+                         'fields': ['id']})
+
+    pkey_json = copy(PKEY_JSON)
+    pkey_json['table'] = name
+    pkey_json.update(changes)
+    table_json['fields'].append(pkey_json)
+
+
+def apply_suggestions(data_model, suggestions):
+    """Returns a copy of a data model with `Suggestion`s, such as those
+    returned by `suggest_types`, applied to its fields, ready for
+    `make_model` and the other `dmdj.makers` functions. The data model is not
+    modified.
+    """
+
+    data_model = expand(data_model)
+    tables = dict((t['name'], t) for t in data_model['tables'])
+
+    for suggestion in suggestions:
+
+        table_json = tables[suggestion.table]
+
+        for field_json in table_json['fields']:
+            if field_json['name'] == suggestion.field:
+                field_json.update(suggestion.changes)
+                break
+        else:
+            if suggestion.field != 'id':
+                raise ValueError('%s has no field named %s' % (
+                    suggestion.table, suggestion.field))
+            _add_primary_key(data_model, table_json, suggestion.changes)
+
+    return data_model
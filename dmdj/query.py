@@ -0,0 +1,153 @@
+from collections import deque, namedtuple
+
+from django.apps import apps
+from django.db.models import OneToOneField
+from django.db.models.constants import LOOKUP_SEP
+
+# A step along a join path: the `name` to use in `select_related` or
+# `prefetch_related` lookups, the model it leads to and whether it follows a
+# foreign key forwards (to a single object) rather than backwards (to a set).
+JoinStep = namedtuple('JoinStep', ['name', 'model', 'forward'])
+
+
+def _rel(field):
+    return field.remote_field if hasattr(field, 'remote_field') else field.rel
+
+
+def _accessor_name(field, rel):
+    # Django 1.7 names the reverse accessor on the field's `RelatedObject`.
+    if hasattr(rel, 'get_accessor_name'):
+        return rel.get_accessor_name()
+
+    return field.related.get_accessor_name()
+
+
+def get_join_steps(models=None):
+    """Returns a dictionary of the `JoinStep`s from each model to the models
+    it has foreign keys to and the models with foreign keys to it.
+
+    `models` is the models to join, by default every model registered with
+    Django, including those of apps that aren't installed, such as generated
+    models often are.
+
+    Forward steps are named by the foreign key fields, which for generated
+    models are the data model field names. Backward steps are named by the
+    reverse accessors, which for generated models are the `related_name`s
+    `make_field` sets, e.g. `visit_occurrence_person_id_set`.
+    """
+
+    if models is None:
+        models = [m for app_models in list(apps.all_models.values())
+                  for m in list(app_models.values())]
+
+    steps = dict((model, []) for model in models)
+
+    for model in models:
+        for field in model._meta.local_fields:
+
+            rel = _rel(field)
+
+            if rel is None:
+                continue
+
+            target = getattr(rel, 'model', None) or rel.to
+
+            # Unresolved targets are model name strings.
+            if not hasattr(target, '_meta'):
+                continue
+
+            steps[model].append(JoinStep(field.name, target, True))
+
+            if target in steps:
+                steps[target].append(JoinStep(
+                    _accessor_name(field, rel), model,
+                    isinstance(field, OneToOneField)))
+
+    return steps
+
+
+def find_join_path(source, target, models=None):
+    """Returns the shortest list of `JoinStep`s from the `source` model to the
+    `target` model along foreign keys, in either direction, or raises a
+    `ValueError` if they aren't connected.
+
+    `models` is as for `get_join_steps`. The search is breadth first, so ties
+    are broken by field order.
+    """
+
+    if source is target:
+        return []
+
+    steps = get_join_steps(models)
+    previous = {source: None}
+    todo = deque([source])
+
+    while todo:
+
+        model = todo.popleft()
+
+        for step in steps.get(model, []):
+
+            if step.model in previous:
+                continue
+
+            previous[step.model] = (model, step)
+
+            if step.model is target:
+                path = []
+                node = target
+                while previous[node] is not None:
+                    node, step = previous[node]
+                    path.append(step)
+                return path[::-1]
+
+            todo.append(step.model)
+
+    raise ValueError('%s has no foreign key path to %s' % (
+        source.__name__, target.__name__))
+
+
+def get_join_lookups(path):
+    """Returns the (select_related, prefetch_related) lookups for a join path
+    from `find_join_path`: the forward steps up to the first backward step,
+    and, if there is one, the whole path. Either may be None.
+    """
+
+    names = [step.name for step in path]
+    forward = 0
+
+    while forward < len(path) and path[forward].forward:
+        forward += 1
+
+    select = LOOKUP_SEP.join(names[:forward]) or None
+    prefetch = LOOKUP_SEP.join(names) if forward < len(path) else None
+
+    return select, prefetch
+
+
+def join_queryset(source, target, queryset=None, models=None):
+    """Returns a queryset of `source` objects with the shortest foreign key
+    path to `target` loaded along with them.
+
+    Forward foreign keys are joined with `select_related`, and the rest of
+    the path, from the first reverse relation on, is loaded with
+    `prefetch_related`, so reading the related objects takes one query plus
+    one per reverse relation rather than one per object.
+
+    `queryset` is a queryset of `source` objects to start from, all of them
+    by default, and `models` is as for `get_join_steps`.
+    """
+
+    if queryset is None:
+        queryset = source._default_manager.all()
+
+    path = find_join_path(source, target, models)
+    select, prefetch = get_join_lookups(path)
+
+    if select:
+        queryset = queryset.select_related(select)
+
+    if prefetch:
+        queryset = queryset.prefetch_related(prefetch)
+
+    return queryset
@@ -1,5 +1,307 @@
+import errno
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
+
+try:
+    from http.client import HTTPConnection, HTTPSConnection, HTTPException
+    from urllib.error import HTTPError
+    from urllib.parse import urljoin, urlsplit
+    from urllib.request import Request, getproxies, proxy_bypass, urlopen
+except ImportError:  # Python 2
+    from httplib import HTTPConnection, HTTPSConnection, HTTPException
+    from urllib import getproxies, proxy_bypass
+    from urllib2 import HTTPError, Request, urlopen
+    from urlparse import urljoin, urlsplit
+
 from dmdj import SERVICE
 
+CACHE_DIR = os.environ.get('DMDJ_CACHE_DIR') or \
+    os.path.join(os.path.expanduser('~'), '.cache', 'dmdj')
+
+CACHE_TTL = int(os.environ.get('DMDJ_CACHE_TTL') or 24 * 60 * 60)
+
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+
+MAX_REDIRECTS = 5
+
+# Keep-alive connections are kept per thread, keyed by scheme and host, and
+# registered with the ident of their thread so they can be closed.
+_local = threading.local()
+_open_connections = weakref.WeakKeyDictionary()
+_open_lock = threading.Lock()
+
 
 def get_url(model, version):
     return '{0}schemata/{1}/{2}?format=json'.format(SERVICE, model, version)
+
+
+def get_cache_path(model, version, cache_dir=None):
+    return os.path.join(cache_dir or CACHE_DIR, model, '%s.json' % version)
+
+
+def _read_json(path):
+    with open(path, 'rb') as f:
+        return json.loads(f.read().decode('utf-8'))
+
+
+def _write_atomic(path, data):
+
+    dirname = os.path.dirname(path)
+
+    try:
+        os.makedirs(dirname)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+
+    fd, tmp_path = tempfile.mkstemp(dir=dirname, suffix='.tmp')
+
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        getattr(os, 'replace', os.rename)(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def _get_connection(scheme, netloc, timeout):
+
+    connections = _local.__dict__.setdefault('connections', {})
+    conn = connections.get((scheme, netloc))
+
+    if conn is None:
+        conn_class = HTTPSConnection if scheme == 'https' else HTTPConnection
+        conn = connections[(scheme, netloc)] = conn_class(netloc)
+        with _open_lock:
+            _open_connections[conn] = threading.current_thread().ident
+
+    conn.timeout = timeout
+
+    if conn.sock is not None:
+        conn.sock.settimeout(timeout)
+
+    return conn
+
+
+def close_connections(threads=None):
+    """Closes the keep-alive connections to the service left open by
+    fetches, in every thread or only in those whose idents are in
+    `threads`. A closed connection is reopened by the thread's next fetch,
+    so call it when no fetch is in progress, e.g. at shutdown.
+    """
+
+    with _open_lock:
+        conns = [conn for conn, ident in list(_open_connections.items())
+                 if threads is None or ident in threads]
+
+    for conn in conns:
+        conn.close()
+
+
+def _request_proxied(url, headers, timeout):
+
+    try:
+        response = urlopen(Request(url, headers=headers), timeout=timeout)
+    except HTTPError as e:
+        response = e
+
+    try:
+        return (response.getcode(),
+                dict((k.lower(), v) for k, v in response.info().items()),
+                response.read())
+    finally:
+        response.close()
+
+
+def _request(url, headers, timeout):
+    """Makes a GET request and returns the status, a dictionary of lower case
+    headers and the body. Redirects are followed. Connections are reused
+    unless a proxy is configured for the URL, in which case the request goes
+    through `urlopen`.
+    """
+
+    for _ in range(MAX_REDIRECTS + 1):
+
+        parts = urlsplit(url)
+
+        if getproxies().get(parts.scheme) and \
+                not proxy_bypass(parts.hostname):
+            return _request_proxied(url, headers, timeout)
+
+        path = parts.path or '/'
+
+        if parts.query:
+            path += '?' + parts.query
+
+        conn = _get_connection(parts.scheme, parts.netloc, timeout)
+        reused = conn.sock is not None
+
+        try:
+            conn.request('GET', path, headers=headers)
+            response = conn.getresponse()
+        except (HTTPException, socket.error):
+            conn.close()
+            # The server may have closed an idle keep-alive connection.
+            if not reused:
+                raise
+            conn.request('GET', path, headers=headers)
+            response = conn.getresponse()
+
+        body = response.read()
+
+        if response.status in REDIRECT_CODES and \
+                response.getheader('Location'):
+            url = urljoin(url, response.getheader('Location'))
+            continue
+
+        return (response.status,
+                dict((k.lower(), v) for k, v in response.getheaders()),
+                body)
+
+    raise HTTPError(url, response.status, 'Too many redirects', None, None)
+
+
+def _request_retry(url, headers, timeout, retries, backoff):
+
+    attempt = 0
+
+    while True:
+
+        try:
+            response = _request(url, headers, timeout)
+        except (HTTPException, IOError, OSError):
+            if attempt >= retries:
+                raise
+        else:
+            if response[0] < 500 or attempt >= retries:
+                return response
+
+        time.sleep(backoff * 2 ** attempt)
+        attempt += 1
+
+
+def fetch_model(model, version, cache_dir=None, ttl=None, offline=False,
+                timeout=30, retries=2, backoff=0.5):
+    """Returns the parsed data model JSON, using a local on-disk cache.
+
+    `model` and `version` identify the data model on the service in
+    `dmdj.SERVICE`, as for `get_url`.
+
+    `cache_dir` is the cache directory, `CACHE_DIR` by default, which can be
+    set with the `DMDJ_CACHE_DIR` environment variable. Copies are stored at
+    `<cache_dir>/<model>/<version>.json`.
+
+    `ttl` is the number of seconds a cached copy is used without contacting
+    the service, `CACHE_TTL` by default (`DMDJ_CACHE_TTL`). Stale copies are
+    revalidated with a conditional request using the stored ETag and
+    Last-Modified headers, so an unchanged schema isn't downloaded again.
+
+    If `offline` is true, the service is never contacted and an `IOError` is
+    raised when there is no cached copy. A stale copy is also returned when
+    the service can't be reached.
+
+    `timeout` is the socket timeout of each request in seconds. Connection
+    errors and server errors are retried up to `retries` times, sleeping
+    `backoff` seconds before the first retry and doubling it after each.
+    Connections to the service are kept alive and reused by the same thread.
+    """
+
+    path = get_cache_path(model, version, cache_dir)
+    meta_path = path[:-len('.json')] + '.meta.json'
+
+    if ttl is None:
+        ttl = CACHE_TTL
+
+    cached = os.path.exists(path)
+
+    if offline:
+        if not cached:
+            raise IOError(errno.ENOENT, 'No cached copy of %s %s' %
+                          (model, version), path)
+        return _read_json(path)
+
+    if cached and time.time() - os.path.getmtime(path) < ttl:
+        return _read_json(path)
+
+    url = get_url(model, version)
+    headers = {}
+
+    if cached and os.path.exists(meta_path):
+        meta = _read_json(meta_path)
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+
+    try:
+        status, response_headers, body = _request_retry(url, headers, timeout,
+                                                        retries, backoff)
+    except (HTTPException, IOError, OSError):
+        if cached:
+            return _read_json(path)
+        raise
+
+    if status == 304 and cached:
+        os.utime(path, None)
+        return _read_json(path)
+
+    if status != 200:
+        if cached:
+            return _read_json(path)
+        raise HTTPError(url, status, 'Unexpected response fetching %s %s' %
+                        (model, version), None, None)
+
+    meta = {
+        'url': url,
+        'etag': response_headers.get('etag'),
+        'last_modified': response_headers.get('last-modified')
+    }
+
+    data_model = json.loads(body.decode('utf-8'))
+
+    _write_atomic(path, body)
+    _write_atomic(meta_path, json.dumps(meta).encode('utf-8'))
+
+    return data_model
+
+
+def fetch_models(pairs, workers=8, **kwargs):
+    """Fetches several data models concurrently and returns an ordered
+    dictionary of their parsed JSON, keyed by (model, version).
+
+    `pairs` is an iterable of (model, version) tuples. They are fetched with
+    `fetch_model` on a pool of up to `workers` threads, so the total time is
+    bounded by the slowest fetch rather than the sum of all of them. Other
+    keyword arguments are passed on to `fetch_model`. The first error raised
+    by any fetch is raised once all of them have finished, and the threads'
+    connections are closed.
+    """
+
+    pairs = list(pairs)
+
+    if not pairs:
+        return OrderedDict()
+
+    pool = ThreadPool(min(workers, len(pairs)))
+    threads = set()
+
+    def fetch(pair):
+        threads.add(threading.current_thread().ident)
+        return fetch_model(pair[0], pair[1], **kwargs)
+
+    try:
+        results = pool.map(fetch, pairs)
+    finally:
+        pool.close()
+        pool.join()
+        close_connections(threads)
+
+    return OrderedDict(zip(pairs, results))
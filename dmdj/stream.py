@@ -0,0 +1,205 @@
+import codecs
+import json
+from collections import deque
+
+from dmdj.makers import make_table
+
+WHITESPACE = ' \t\n\r'
+
+
+class JSONStream(object):
+    """An incremental reader for a JSON document in a file-like object.
+
+    Objects and arrays can be walked a member at a time with `iter_object`
+    and `iter_array`, while `value` decodes one complete value. Only the
+    unread part of the current chunk and the value being decoded are held in
+    memory.
+    """
+
+    def __init__(self, fp, chunk_size=64 * 1024):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+        self.charset = codecs.getincrementaldecoder('utf-8')()
+
+    def _fill(self):
+
+        chunk = self.fp.read(self.chunk_size)
+
+        if isinstance(chunk, bytes):
+            chunk = self.charset.decode(chunk, final=not chunk)
+
+        if not chunk:
+            self.eof = True
+
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+
+    def peek(self):
+        """Returns the next non-whitespace character, or '' at the end."""
+
+        while True:
+            buf = self.buf
+            while self.pos < len(buf) and buf[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(buf) or self.eof:
+                return buf[self.pos:self.pos + 1]
+            self._fill()
+
+    def expect(self, char):
+
+        if self.peek() != char:
+            raise ValueError('Expected %r at character %d of the buffer, got '
+                             '%r' % (char, self.pos, self.peek()))
+
+        self.pos += 1
+
+    def value(self):
+        """Decodes and returns the next complete JSON value."""
+
+        self.peek()
+
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except ValueError:
+                if self.eof:
+                    raise
+            else:
+                # A number at the very end of the buffer may continue in the
+                # next chunk.
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            self._fill()
+
+    def iter_array(self):
+        """Walks an array, yielding its index before each element. The caller
+        must consume each element before asking for the next.
+        """
+
+        self.expect('[')
+
+        if self.peek() == ']':
+            self.pos += 1
+            return
+
+        i = 0
+
+        while True:
+            yield i
+            i += 1
+            if self.peek() == ',':
+                self.pos += 1
+            else:
+                self.expect(']')
+                return
+
+    def iter_object(self):
+        """Walks an object, yielding each member's key. The caller must consume
+        each member's value before asking for the next key.
+        """
+
+        self.expect('{')
+
+        if self.peek() == '}':
+            self.pos += 1
+            return
+
+        while True:
+            key = self.value()
+            self.expect(':')
+            yield key
+            if self.peek() == ',':
+                self.pos += 1
+            else:
+                self.expect('}')
+                return
+
+
+def make_model_iter(source, bases, module, app_label, chunk_size=64 * 1024):
+    """Yields dynamically constructed Django model classes table by table while
+    reading a data model JSON document incrementally.
+
+    `source` is a path or a file-like object, in text or binary (UTF-8) mode,
+    containing a declarative style nested data model object retrieved from the
+    chop-dbhi/data-models service or at least matching the format specified
+    there.
+
+    `bases`, `module` and `app_label` are as for `dmdj.makers.make_model`,
+    which this produces the same models as.
+
+    Constraints and indexes are grouped by table as they are read and dropped
+    once their table's model is yielded. Tables are yielded as they are read
+    if the document's `schema` comes before its `tables`, otherwise they are
+    held until the schema has been read.
+    """
+
+    if not hasattr(source, 'read'):
+        with open(source, 'rb') as fp:
+            for model in make_model_iter(fp, bases, module, app_label,
+                                         chunk_size):
+                yield model
+        return
+
+    stream = JSONStream(source, chunk_size)
+
+    con_types = []
+    table_cons = {}
+    table_idxs = {}
+
+    pending = deque()
+    schema_read = False
+
+    def build(table_json):
+        name = table_json['name']
+        cons = table_cons.pop(name, {})
+        cons = {con_type: cons.get(con_type, []) for con_type in con_types}
+        return make_table(table_json, cons, table_idxs.pop(name, []), bases,
+                          module, app_label)
+
+    for key in stream.iter_object():
+
+        if key == 'schema':
+
+            for schema_key in stream.iter_object():
+
+                if schema_key == 'constraints':
+                    for con_type in stream.iter_object():
+                        con_types.append(con_type)
+                        for _ in stream.iter_array():
+                            con = stream.value()
+                            name = con.get('table') or con.get('source_table')
+                            table_cons.setdefault(name, {}) \
+                                .setdefault(con_type, []).append(con)
+
+                elif schema_key == 'indexes':
+                    for _ in stream.iter_array():
+                        index = stream.value()
+                        table_idxs.setdefault(index['table'], []) \
+                            .append(index)
+
+                else:
+                    stream.value()
+
+            schema_read = True
+
+            while pending:
+                yield build(pending.popleft())
+
+        elif key == 'tables':
+
+            for _ in stream.iter_array():
+                if schema_read:
+                    yield build(stream.value())
+                else:
+                    pending.append(stream.value())
+
+        else:
+            stream.value()
+
+    while pending:
+        yield build(pending.popleft())
@@ -0,0 +1,15 @@
+import django
+from django.conf import settings
+
+# Tests that touch the database share an in-memory SQLite database. The other
+# test modules only configure settings if this hasn't already.
+if not settings.configured:
+    settings.configure(DATABASES={
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': ':memory:'
+        }
+    })
+
+if hasattr(django, 'setup'):
+    django.setup()
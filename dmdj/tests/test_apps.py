@@ -0,0 +1,109 @@
+import json
+import os
+import sys
+
+import django
+import dmdj
+from django.apps import apps
+from django.test.utils import override_settings
+from dmdj import cache
+from dmdj.apps import DataModelsConfig
+from dmdj.cache import load_version_plan
+from dmdj.makers import plan_model
+
+if not django.conf.settings.configured:
+    django.conf.settings.configure()
+
+if hasattr(django, 'setup'):
+    django.setup()
+
+model_json = {
+    'schema': {
+        'constraints': {
+            'primary_keys': [{'table': 'apps_person', 'fields': ['key']}],
+            'foreign_keys': [{'source_table': 'apps_visit',
+                              'source_field': 'person',
+                              'target_table': 'apps_person',
+                              'target_field': 'key'}]
+        },
+        'indexes': []
+    },
+    'tables': [{'name': 'apps_visit', 'fields': [{'type': 'integer',
+                                                  'name': 'person'}]},
+               {'name': 'apps_person', 'fields': [{'type': 'integer',
+                                                   'name': 'key'}]}]
+}
+
+
+def write_cache(tmpdir):
+
+    tmpdir.mkdir('apps_test').join('1.0.0.json').write(json.dumps(model_json))
+
+    return str(tmpdir)
+
+
+def import_models(config):
+
+    config.apps = apps
+
+    try:
+        if django.VERSION >= (2, 0):
+            config.import_models()
+        else:
+            config.import_models(apps.all_models[config.label])
+        return config.models_module
+    finally:
+        # The config creates dmdj.models, as the app has none.
+        sys.modules.pop('dmdj.models', None)
+        if hasattr(dmdj, 'models'):
+            del dmdj.models
+
+
+def test_load_version_plan(tmpdir, monkeypatch):
+
+    cache_dir = write_cache(tmpdir)
+
+    specs = load_version_plan('apps_test', '1.0.0', cache_dir, offline=True)
+
+    assert specs == plan_model(model_json)
+    assert len(os.listdir(os.path.join(cache_dir, 'plans'))) == 1
+
+    # The cached plan is used without reading the JSON.
+    monkeypatch.setattr(cache.json, 'loads', None)
+
+    assert load_version_plan('apps_test', '1.0.0', cache_dir,
+                             offline=True) == specs
+
+
+def test_config(tmpdir):
+
+    cache_dir = write_cache(tmpdir)
+
+    class Config(DataModelsConfig):
+        label = 'dmdj_apps'
+        data_models = [{'model': 'apps_test', 'version': '1.0.0',
+                        'cache_dir': cache_dir, 'offline': True}]
+
+    module = import_models(Config('dmdj', dmdj))
+
+    assert module.__name__ == 'dmdj.models'
+    assert module.AppsVisit is apps.all_models['dmdj_apps']['appsvisit']
+    field = module.AppsVisit._meta.get_field('person')
+    target = getattr(field, 'remote_field', None) or field.rel
+    assert (getattr(target, 'model', None) or target.to) is module.AppsPerson
+
+
+def test_settings(tmpdir):
+
+    cache_dir = write_cache(tmpdir)
+
+    class Config(DataModelsConfig):
+        label = 'dmdj_apps_settings'
+
+    with override_settings(DMDJ_MODELS=[
+            {'model': 'apps_test', 'version': '1.0.0', 'cache_dir': cache_dir,
+             'offline': True, 'app_label': 'dmdj_apps_settings'},
+            {'model': 'other', 'version': '1.0.0', 'app_label': 'other'}]):
+        module = import_models(Config('dmdj', dmdj))
+
+    assert module.AppsPerson._meta.app_label == 'dmdj_apps_settings'
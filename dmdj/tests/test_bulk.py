@@ -0,0 +1,132 @@
+import json
+
+import django
+from django.db import connection, transaction
+from django.db.models import Model
+from dmdj import bulk
+from dmdj.bulk import (bulk_load_mode, check_schema, drop_constraints,
+                       get_declared, rebuild_constraints)
+from dmdj.ddl import provision
+from dmdj.makers import make_model
+
+if not django.conf.settings.configured:
+    django.conf.settings.configure()
+
+if hasattr(django, 'setup'):
+    django.setup()
+
+model_json = {
+    'schema': {
+        'constraints': {
+            'primary_keys': [{'table': 'bulk_person', 'fields': ['person_id']},
+                             {'table': 'bulk_visit',
+                              'fields': ['visit_id', 'person_id']}],
+            'foreign_keys': [{'source_table': 'bulk_visit',
+                              'source_field': 'person_id',
+                              'target_table': 'bulk_person',
+                              'target_field': 'person_id'}]
+        },
+        'indexes': [{'table': 'bulk_person', 'fields': ['gender']},
+                    {'table': 'bulk_visit', 'fields': ['visit_id', 'cost']}]
+    },
+    'tables': [{'name': 'bulk_person',
+                'fields': [{'type': 'integer', 'name': 'person_id'},
+                           {'type': 'string', 'name': 'gender',
+                            'length': 8}]},
+               {'name': 'bulk_visit',
+                'fields': [{'type': 'integer', 'name': 'visit_id'},
+                           {'type': 'integer', 'name': 'person_id'},
+                           {'type': 'decimal', 'name': 'cost',
+                            'precision': 8, 'scale': 2}]}]
+}
+
+models = make_model(model_json, (Model,), 'dmdj.tests', 'bulk')
+Person, Visit = models
+
+with connection.schema_editor() as editor:
+    for model in models:
+        editor.create_model(model)
+
+
+def test_declared():
+
+    declared = get_declared(Visit)
+
+    assert declared.indexes == set([('person_id',), ('visit_id', 'cost')])
+    assert declared.uniques == set([('visit_id', 'person_id')])
+    assert declared.foreign_keys == set([('person_id', 'bulk_person',
+                                          'person_id')])
+
+
+def test_drop_and_rebuild():
+
+    assert check_schema(models) == []
+
+    dropped = drop_constraints(models)
+
+    assert sorted((d.table, d.kind) for d in dropped) == [
+        ('bulk_person', 'index'), ('bulk_visit', 'index'),
+        ('bulk_visit', 'index')]
+    assert sorted(check_schema(models)) == [
+        'bulk_person: index on gender', 'bulk_visit: index on person_id',
+        'bulk_visit: index on visit_id, cost']
+
+    rebuild_constraints(dropped)
+
+    assert check_schema(models) == []
+
+
+def test_rebuild_in_atomic_block(monkeypatch):
+
+    dropped = drop_constraints(models)
+
+    # Other connections would wait on the block's locks, so on PostgreSQL
+    # too the constraints are rebuilt on this one.
+    monkeypatch.setattr(connection, 'vendor', 'postgresql')
+    monkeypatch.setattr(bulk, 'ThreadPool', None)
+
+    with transaction.atomic():
+        rebuild_constraints(dropped, workers=4)
+
+    monkeypatch.undo()
+
+    assert check_schema(models) == []
+
+
+def test_bulk_load_mode():
+
+    with bulk_load_mode(models) as dropped:
+        assert len(dropped) == 3
+        Person.objects.create(person_id=1, gender='F')
+
+    assert check_schema(models) == []
+
+
+def test_rebuilt_on_error():
+
+    try:
+        with bulk_load_mode(models):
+            raise KeyError('load failed')
+    except KeyError:
+        pass
+
+    assert check_schema(models) == []
+
+
+def test_provisioned():
+
+    # Tables created by dmdj.ddl have what the models declare too.
+    data_model = json.loads(json.dumps(model_json).replace('bulk_',
+                                                           'bulk_ddl_'))
+    provision(data_model)
+    ddl_models = make_model(data_model, (Model,), 'dmdj.tests', 'bulk_ddl')
+
+    assert check_schema(ddl_models) == []
+
+    dropped = drop_constraints(ddl_models)
+
+    assert len(dropped) == 3
+
+    rebuild_constraints(dropped)
+
+    assert check_schema(ddl_models) == []
@@ -0,0 +1,94 @@
+import os
+
+import django
+from django.db.models import BigIntegerField, Model
+from dmdj import makers
+from dmdj.cache import get_digest, get_plan_path, load_plan, make_cached_model
+from dmdj.makers import plan_model
+
+if not django.conf.settings.configured:
+    django.conf.settings.configure()
+
+if hasattr(django, 'setup'):
+    django.setup()
+
+
+def make_model_json():
+
+    return {
+        'schema': {
+            'constraints': {
+                'primary_keys': [{'table': 'test_table',
+                                  'fields': ['int1', 'int2']}]
+            },
+            'indexes': []
+        },
+        'tables': [{'name': 'test_table', 'fields': [{'type': 'integer',
+                                                      'name': 'int1'},
+                                                     {'type': 'integer',
+                                                      'name': 'int2'}]}]
+    }
+
+
+def test_digest():
+
+    model_json = make_model_json()
+    reordered = {'tables': model_json['tables'],
+                 'schema': model_json['schema']}
+
+    assert get_digest(model_json) == get_digest(reordered)
+
+    reordered = make_model_json()
+    reordered['tables'][0]['name'] = 'other_table'
+    assert get_digest(model_json) != get_digest(reordered)
+
+
+def test_digest_maps(monkeypatch):
+
+    model_json = make_model_json()
+    digest = get_digest(model_json)
+
+    monkeypatch.setitem(makers.FIELD_TYPE_MAP, 'integer', BigIntegerField)
+
+    assert get_digest(model_json) != digest
+
+    monkeypatch.undo()
+    monkeypatch.setitem(makers.FIELD_KWARGS_MAP, 'label', 'help_text')
+
+    assert get_digest(model_json) != digest
+
+
+def test_plan_not_mutating():
+
+    model_json = make_model_json()
+    plan_model(model_json)
+
+    assert model_json == make_model_json()
+
+
+def test_load_plan(tmpdir):
+
+    cache_dir = str(tmpdir)
+    model_json = make_model_json()
+    path = get_plan_path(get_digest(model_json), cache_dir)
+
+    table_specs = load_plan(model_json, cache_dir)
+
+    assert table_specs == plan_model(model_json)
+    assert os.path.exists(path)
+    assert load_plan(model_json, cache_dir) == table_specs
+
+    with open(path, 'wb') as f:
+        f.write(b'corrupt')
+
+    assert load_plan(model_json, cache_dir) == table_specs
+
+
+def test_make_cached_model(tmpdir):
+
+    models = make_cached_model(make_model_json(), (Model,), 'dmdj.tests',
+                               'cached', str(tmpdir))
+
+    assert len(models) == 1
+    assert models[0]._meta.pk.name == 'id'
+    assert models[0]._meta.unique_together == (('int1', 'int2'),)
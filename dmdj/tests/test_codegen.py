@@ -0,0 +1,129 @@
+from __future__ import unicode_literals
+
+import json
+import types
+from copy import deepcopy
+
+import django
+from django.db.models import Model
+from dmdj.cli import main
+from dmdj.codegen import make_source
+from dmdj.makers import make_model
+
+if not django.conf.settings.configured:
+    django.conf.settings.configure()
+
+if hasattr(django, 'setup'):
+    django.setup()
+
+model_json = {
+    'name': 'test',
+    'version': '1.0.0',
+    'schema': {
+        'constraints': {
+            'foreign_keys': [{'source_table': 'test_table_1',
+                              'source_field': 'integer',
+                              'target_table': 'test_table_2',
+                              'target_field': 'integer'}],
+            'not_null': [{'table': 'test_table_1', 'field': 'string'}],
+            'uniques': [{'table': 'test_table_2', 'fields': ['integer']}],
+            'primary_keys': [{'table': 'test_table_1', 'fields': ['pk']},
+                             {'table': 'test_table_2',
+                              'fields': ['integer', 'string']}]
+        },
+        'indexes': [{'table': 'test_table_2', 'fields': ['string']},
+                    {'table': 'test_table_2',
+                     'fields': ['integer', 'number']}]
+    },
+    'tables': [{'name': 'test_table_1', 'fields': [{'type': 'integer',
+                                                    'name': 'pk'},
+                                                   {'type': 'integer',
+                                                    'name': 'integer'},
+                                                   {'type': 'string',
+                                                    'name': 'string',
+                                                    'length': 0}]},
+               {'name': 'test_table_2', 'fields': [{'type': 'integer',
+                                                    'name': 'integer'},
+                                                   {'type': 'string',
+                                                    'name': 'string',
+                                                    'length': 0},
+                                                   {'type': 'decimal',
+                                                    'name': 'number',
+                                                    'description': 'A num.',
+                                                    'precision': 12,
+                                                    'scale': 2}]}]
+}
+
+
+def deconstruct(model):
+
+    fields = []
+
+    for field in model._meta.fields:
+        name, path, args, kwargs = field.deconstruct()
+        if 'to' in kwargs:
+            kwargs['to'] = kwargs['to'].split('.')[-1]
+        fields.append((name, path, args, kwargs))
+
+    return (model.__name__, model._meta.db_table, model._meta.pk.name,
+            model._meta.unique_together, model._meta.index_together, fields)
+
+
+def test_source():
+
+    source = make_source(model_json, ('django.db.models.Model',), 'test')
+
+    assert 'class TestTable1(models.Model):' in source
+    assert 'class TestTable2(models.Model):' in source
+    assert "related_name='test_table_1_integer_set'" in source
+    assert "unique_together = (('integer', 'string'),)" in source
+
+
+def test_app_label_bytes():
+
+    # Byte strings, as Python 2 command line arguments are, are written as
+    # text.
+    source = make_source(model_json, ('django.db.models.Model',),
+                         'test'.encode('ascii'))
+
+    assert "app_label = 'test'" in source
+
+
+def test_codegen_command(tmpdir):
+
+    path = tmpdir.join('model.json')
+    output = tmpdir.join('models.py')
+
+    path.write(json.dumps(model_json))
+
+    main(['codegen', str(path), '--app-label', str('test'), '-o',
+          str(output)])
+
+    assert "app_label = 'test'" in output.read()
+
+
+def test_bases():
+
+    source = make_source(model_json, ('dmdj.tests.base.Base',), 'test')
+
+    assert 'from dmdj.tests.base import Base' in source
+    assert 'class TestTable1(Base):' in source
+
+
+def test_equivalence():
+
+    source = make_source(model_json, ('django.db.models.Model',),
+                         'codegen_static')
+
+    module = types.ModuleType(str('dmdj.tests.codegen_static'))
+    exec(compile(source.encode('utf-8'), '<codegen>', 'exec'),
+         module.__dict__)
+
+    dynamic = make_model(deepcopy(model_json), (Model,),
+                         'dmdj.tests.codegen_dynamic', 'codegen_dynamic')
+
+    assert len(dynamic) == 2
+
+    for model in dynamic:
+        static = getattr(module, model.__name__)
+        assert deconstruct(static) == deconstruct(model)
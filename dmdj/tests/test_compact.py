@@ -0,0 +1,95 @@
+import json
+import pickle
+
+import django
+import pytest
+from django.db.models import Model
+from dmdj.cache import get_digest
+from dmdj.compact import Record, compact, expand
+from dmdj.diff import diff_models
+from dmdj.makers import make_model, plan_model
+
+if not django.conf.settings.configured:
+    django.conf.settings.configure()
+
+if hasattr(django, 'setup'):
+    django.setup()
+
+model_json = {
+    'name': 'test',
+    'schema': {
+        'constraints': {
+            'foreign_keys': [{'source_table': 'test_table_1',
+                              'source_field': 'integer',
+                              'target_table': 'test_table_2',
+                              'target_field': 'integer'}],
+            'not_null': [{'table': 'test_table_1', 'field': 'string'}],
+            'uniques': [{'table': 'test_table_2', 'fields': ['integer']}],
+            'primary_keys': [{'table': 'test_table_1', 'fields': ['pk']},
+                             {'table': 'test_table_2',
+                              'fields': ['integer', 'string']}]
+        },
+        'indexes': [{'table': 'test_table_2', 'fields': ['string']}]
+    },
+    'tables': [{'name': 'test_table_1', 'fields': [{'type': 'integer',
+                                                    'name': 'pk'},
+                                                   {'type': 'integer',
+                                                    'name': 'integer'},
+                                                   {'type': 'string',
+                                                    'name': 'string',
+                                                    'length': 0}]},
+               {'name': 'test_table_2', 'fields': [{'type': 'integer',
+                                                    'name': 'integer'},
+                                                   {'type': 'string',
+                                                    'name': 'string',
+                                                    'length': 0}]}]
+}
+
+
+def test_records():
+
+    data_model = compact(json.loads(json.dumps(model_json)))
+    field = data_model.tables[0].fields[2]
+
+    assert isinstance(field, Record)
+    assert field.name == field['name'] == 'string'
+    assert field.get('label', 'x') == 'x'
+    assert 'length' in field and 'label' not in field
+    assert sorted(field.items()) == [('length', 0), ('name', 'string'),
+                                     ('type', 'string')]
+    assert data_model.tables[0].fields == compact(
+        model_json['tables'][0]['fields'])
+
+    # Equal strings are shared.
+    assert field.name is data_model.tables[1].fields[1].name
+
+    with pytest.raises(KeyError):
+        field['label']
+
+    with pytest.raises(AttributeError):
+        field.name = 'other'
+
+    assert pickle.loads(pickle.dumps(data_model)) == data_model
+    assert expand(data_model) == json.loads(json.dumps(model_json))
+
+
+def test_reserved_keys():
+
+    obj = compact({'items': [1, 2], 'name': 'x'})
+
+    assert isinstance(obj, dict)
+    assert obj['items'] == (1, 2)
+
+
+def test_equivalence():
+
+    data_model = compact(model_json)
+
+    assert plan_model(data_model) == plan_model(model_json)
+    assert get_digest(data_model) == get_digest(model_json)
+    assert not diff_models(model_json, data_model)
+
+    models = make_model(data_model, (Model,), 'dmdj.tests', 'compact')
+
+    assert [m.__name__ for m in models] == ['TestTable1', 'TestTable2']
+    assert models[1]._meta.unique_together == (('integer', 'string'),)
@@ -0,0 +1,122 @@
+from datetime import date, datetime, time
+from decimal import Decimal
+
+import django
+import pytest
+from django.db.models import Model
+from dmdj.converters import make_converter, make_column_converter
+from dmdj.makers import make_model
+
+if not django.conf.settings.configured:
+    django.conf.settings.configure()
+
+if hasattr(django, 'setup'):
+    django.setup()
+
+model_json = {
+    'schema': {
+        'constraints': {
+            'foreign_keys': [{'source_table': 'test_table_1',
+                              'source_field': 'other',
+                              'target_table': 'test_table_2',
+                              'target_field': 'integer'}],
+        },
+        'indexes': []
+    },
+    'tables': [{'name': 'test_table_1', 'fields': [
+        {'type': 'integer', 'name': 'integer'},
+        {'type': 'decimal', 'name': 'decimal', 'precision': 5, 'scale': 2},
+        {'type': 'float', 'name': 'float'},
+        {'type': 'string', 'name': 'string', 'length': 0},
+        {'type': 'date', 'name': 'date'},
+        {'type': 'datetime', 'name': 'datetime'},
+        {'type': 'time', 'name': 'time'},
+        {'type': 'boolean', 'name': 'boolean'},
+        {'type': 'blob', 'name': 'blob'},
+        {'type': 'integer', 'name': 'other'}]},
+        {'name': 'test_table_2', 'fields': [
+            {'type': 'integer', 'name': 'integer'}]}]
+}
+
+Table1, Table2 = make_model(model_json, (Model,), 'dmdj.tests', 'converters')
+
+columns = ['integer', 'decimal', 'float', 'string', 'date', 'datetime',
+           'time', 'boolean', 'blob', 'other']
+
+
+def test_converter():
+
+    convert = make_converter(Table1, columns)
+
+    row = ['1', '12.34', '0.5', 'foo', '2001-02-03', '2001-02-03 04:05:06',
+           '04:05:06', 'T', '\\x6869', '7']
+
+    assert convert(row) == (1, Decimal('12.34'), 0.5, 'foo', date(2001, 2, 3),
+                            datetime(2001, 2, 3, 4, 5, 6), time(4, 5, 6),
+                            True, b'hi', 7)
+
+    assert convert([''] * len(columns)) == (None,) * len(columns)
+
+
+def test_formats():
+
+    convert = make_converter(Table1, ['date', 'blob'], null='NULL',
+                             formats={'date': '%m/%d/%Y', 'blob': 'base64'})
+
+    assert convert(['02/03/2001', 'aGk=']) == (date(2001, 2, 3), b'hi')
+    assert convert(['NULL', 'NULL']) == (None, None)
+
+
+def test_invalid():
+
+    convert = make_converter(Table1, ['integer'])
+
+    with pytest.raises(ValueError):
+        convert(['one'])
+
+    with pytest.raises(ValueError):
+        convert(['1', '2'])
+
+
+def test_invalid_dates():
+
+    for column in ('date', 'datetime', 'time'):
+        convert = make_converter(Table1, [column])
+
+        for value in ('bad', '2020/01/01', '2020-13-01x', '12/34/56',
+                      '2020-01-01T00:00:0x'):
+            with pytest.raises(ValueError):
+                convert([value])
+
+    assert make_converter(Table1, ['datetime'])(['2001-02-03T04:05:06']) == \
+        (datetime(2001, 2, 3, 4, 5, 6),)
+
+
+def test_decimal_places():
+
+    # Precision 5, scale 2.
+    convert = make_converter(Table1, ['decimal'])
+
+    assert convert(['1.005']) == (Decimal('1.00'),)
+    assert str(convert(['-999.994'])[0]) == '-999.99'
+
+    for value in ('1000', '-999.995', '123456.789', 'NaN', 'Infinity'):
+        with pytest.raises(ValueError):
+            convert([value])
+
+
+def test_column_converter():
+
+    numpy = pytest.importorskip('numpy')
+
+    convert = make_column_converter(Table1, ['integer', 'date', 'boolean',
+                                             'decimal'])
+
+    integers, dates, booleans, decimals = convert([
+        ['1', '2'], ['2001-02-03', ''], ['yes', 'f'], ['1.5', '2']])
+
+    assert integers.dtype == numpy.int64
+    assert list(integers) == [1, 2]
+    assert list(dates) == [date(2001, 2, 3), None]
+    assert list(booleans) == [True, False]
+    assert list(decimals) == [Decimal('1.5'), Decimal('2')]
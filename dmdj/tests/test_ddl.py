@@ -0,0 +1,127 @@
+import django
+from django.db import DatabaseError, connection
+from django.db.models import Model
+from dmdj.ddl import finish_provision, make_ddl, provision
+from dmdj.makers import make_model
+
+if not django.conf.settings.configured:
+    django.conf.settings.configure()
+
+if hasattr(django, 'setup'):
+    django.setup()
+
+
+def make_json(prefix):
+    return {
+        'schema': {
+            'constraints': {
+                'primary_keys': [{'table': prefix + 'person',
+                                  'fields': ['person_id']},
+                                 {'table': prefix + 'visit',
+                                  'fields': ['visit_id', 'person_id']}],
+                'foreign_keys': [{'source_table': prefix + 'visit',
+                                  'source_field': 'person_id',
+                                  'target_table': prefix + 'person',
+                                  'target_field': 'person_id'}]
+            },
+            'indexes': [{'table': prefix + 'person', 'fields': ['gender']},
+                        {'table': prefix + 'visit',
+                         'fields': ['visit_id', 'cost']}]
+        },
+        'tables': [{'name': prefix + 'person',
+                    'fields': [{'type': 'integer', 'name': 'person_id'},
+                               {'type': 'string', 'name': 'gender',
+                                'length': 8}]},
+                   {'name': prefix + 'visit',
+                    'fields': [{'type': 'integer', 'name': 'visit_id'},
+                               {'type': 'integer', 'name': 'person_id'},
+                               {'type': 'decimal', 'name': 'cost',
+                                'precision': 8, 'scale': 2}]}]
+    }
+
+
+def get_indexes(table):
+
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, table)
+
+    return sorted(tuple(c['columns']) for c in constraints.values()
+                  if c['index'] and not c['unique'] and not c['primary_key'])
+
+
+def test_postgresql():
+
+    ddl = make_ddl(make_json(''), 'postgresql')
+
+    assert ddl.tables[1] == (
+        'CREATE TABLE "visit" (\n'
+        '    "visit_id" integer NOT NULL,\n'
+        '    "person_id" integer NOT NULL,\n'
+        '    "cost" numeric(8, 2) NOT NULL,\n'
+        '    "id" integer NOT NULL PRIMARY KEY,\n'
+        '    UNIQUE ("visit_id", "person_id")\n'
+        ')')
+    assert ddl.indexes == [
+        'CREATE INDEX "person_gender_idx" ON "person" ("gender")',
+        'CREATE INDEX "visit_person_id_idx" ON "visit" ("person_id")',
+        'CREATE INDEX "visit_visit_id_cost_idx" ON "visit" ("visit_id", '
+        '"cost")']
+    assert ddl.foreign_keys == [
+        'ALTER TABLE "visit" ADD CONSTRAINT "visit_person_id_fk" FOREIGN KEY '
+        '("person_id") REFERENCES "person" ("person_id") DEFERRABLE '
+        'INITIALLY DEFERRED']
+    assert ddl.script().count(';\n') == 6
+
+
+def test_models():
+
+    data_model = make_json('')
+    models = make_model(data_model, (Model,), 'dmdj.tests', 'ddl')
+
+    assert make_ddl(models, 'sqlite') == make_ddl(data_model, 'sqlite')
+
+
+def test_provision():
+
+    data_model = make_json('ddl_')
+    ddl = provision(data_model)
+
+    assert ddl.foreign_keys == []
+    assert 'REFERENCES "ddl_person"' in ddl.tables[1]
+    assert get_indexes('ddl_person') == [('gender',)]
+    assert get_indexes('ddl_visit') == [('person_id',), ('visit_id', 'cost')]
+
+    Person, Visit = make_model(data_model, (Model,), 'dmdj.tests', 'ddl_db')
+    person = Person.objects.create(person_id=1, gender='F')
+    Visit.objects.create(visit_id=1, person_id=person, cost='1.50')
+
+    assert Visit.objects.get().person_id == person
+
+
+def test_deferred():
+
+    ddl = provision(make_json('ddl_deferred_'), deferred=True)
+
+    assert get_indexes('ddl_deferred_person') == []
+
+    finish_provision(ddl)
+
+    assert get_indexes('ddl_deferred_person') == [('gender',)]
+
+
+def test_single_transaction():
+
+    data_model = make_json('ddl_atomic_')
+    data_model['tables'].append(data_model['tables'][0])
+
+    try:
+        provision(data_model)
+    except DatabaseError:
+        pass
+    else:
+        assert False
+
+    with connection.cursor() as cursor:
+        tables = connection.introspection.table_names(cursor)
+
+    assert 'ddl_atomic_person' not in tables
@@ -0,0 +1,117 @@
+from copy import deepcopy
+
+import django
+from django.apps import apps
+from django.db.models import Model
+from dmdj.diff import IncrementalBuilder, diff_models
+
+if not django.conf.settings.configured:
+    django.conf.settings.configure()
+
+if hasattr(django, 'setup'):
+    django.setup()
+
+old_json = {
+    'schema': {
+        'constraints': {
+            'foreign_keys': [{'source_table': 'visit',
+                              'source_field': 'person_id',
+                              'target_table': 'person',
+                              'target_field': 'person_id'}],
+            'primary_keys': [{'table': 'person', 'fields': ['person_id']}]
+        },
+        'indexes': []
+    },
+    'tables': [{'name': 'person', 'fields': [{'type': 'integer',
+                                              'name': 'person_id'},
+                                             {'type': 'string',
+                                              'name': 'gender',
+                                              'length': 8}]},
+               {'name': 'visit', 'fields': [{'type': 'integer',
+                                             'name': 'person_id'}]},
+               {'name': 'site', 'fields': [{'type': 'string',
+                                            'name': 'name',
+                                            'length': 0}]},
+               {'name': 'note', 'fields': [{'type': 'text',
+                                            'name': 'text'}]}]
+}
+
+
+def make_new_json():
+
+    new_json = deepcopy(old_json)
+    person = new_json['tables'][0]
+    person['fields'][1]['length'] = 16
+    person['fields'].append({'type': 'date', 'name': 'birth_date'})
+    new_json['schema']['indexes'].append({'table': 'person',
+                                          'fields': ['birth_date']})
+    del new_json['tables'][3]
+    new_json['tables'].append({'name': 'provider', 'fields': [
+        {'type': 'integer', 'name': 'provider_id'}]})
+
+    return new_json
+
+
+def test_diff_models():
+
+    diff = diff_models(old_json, make_new_json())
+
+    assert diff
+    assert diff.added_tables == ('provider',)
+    assert diff.removed_tables == ('note',)
+    assert len(diff.changed_tables) == 1
+
+    person = diff.changed_tables[0]
+    assert person.name == 'person'
+    assert person.added_fields == ('birth_date',)
+    assert person.removed_fields == ()
+    assert person.changed_fields == ('gender',)
+    assert person.added_indexes == ({'table': 'person',
+                                     'fields': ['birth_date']},)
+    assert person.added_constraints == ()
+
+    assert not diff_models(old_json, deepcopy(old_json))
+
+
+def test_constraint_diff():
+
+    new_json = deepcopy(old_json)
+    new_json['schema']['constraints']['uniques'] = [
+        {'table': 'site', 'fields': ['name']}]
+
+    diff = diff_models(old_json, new_json)
+
+    assert [t.name for t in diff.changed_tables] == ['site']
+    assert diff.changed_tables[0].added_constraints == (
+        ('uniques', {'table': 'site', 'fields': ['name']}),)
+
+
+def test_incremental_builder():
+
+    builder = IncrementalBuilder((Model,), 'dmdj.tests', 'incremental')
+
+    result = builder.update(old_json)
+    assert result.built == ['person', 'visit', 'site', 'note']
+
+    site = builder.models['Site']
+    person = builder.models['Person']
+
+    result = builder.update(make_new_json())
+
+    assert result.built == ['person', 'visit', 'provider']
+    assert result.reused == ['site']
+    assert result.removed == ['note']
+    assert result.diff.removed_tables == ('note',)
+
+    assert builder.models['Site'] is site
+    assert builder.models['Person'] is not person
+    assert list(builder.models) == ['Person', 'Visit', 'Site', 'Provider']
+
+    registered = apps.all_models['incremental']
+    assert 'note' not in registered
+    assert registered['person'] is builder.models['Person']
+
+    field = builder.models['Visit']._meta.get_field('person_id')
+    target = getattr(field, 'remote_field', None) or field.rel
+    assert (getattr(target, 'model', None) or target.to) is \
+        builder.models['Person']
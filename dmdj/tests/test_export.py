@@ -0,0 +1,129 @@
+import bz2
+import csv
+import gzip
+import io
+import json
+import os
+from collections import OrderedDict
+from datetime import date
+
+import django
+import pytest
+from django.db import connection
+from django.db.models import Model
+from dmdj.export import export_table, export_tables, get_export_fields
+from dmdj.makers import make_model
+
+if not django.conf.settings.configured:
+    django.conf.settings.configure()
+
+if hasattr(django, 'setup'):
+    django.setup()
+
+model_json = {
+    'schema': {
+        'constraints': {
+            'primary_keys': [{'table': 'export_person',
+                              'fields': ['person_id']},
+                             {'table': 'export_visit',
+                              'fields': ['visit_id', 'person_id']}]
+        },
+        'indexes': []
+    },
+    'tables': [{'name': 'export_person', 'fields': [{'type': 'string',
+                                                     'name': 'gender',
+                                                     'length': 8},
+                                                    {'type': 'integer',
+                                                     'name': 'person_id'}]},
+               {'name': 'export_visit', 'fields': [{'type': 'integer',
+                                                    'name': 'visit_id'},
+                                                   {'type': 'integer',
+                                                    'name': 'person_id'},
+                                                   {'type': 'date',
+                                                    'name': 'day'}]}]
+}
+
+Person, Visit = make_model(model_json, (Model,), 'dmdj.tests', 'export')
+
+
+@pytest.fixture(scope='module')
+def tables():
+
+    with connection.schema_editor() as editor:
+        editor.create_model(Person)
+        editor.create_model(Visit)
+
+    Person.objects.bulk_create([
+        Person(person_id=i, gender=[None, 'F', 'M'][i % 3])
+        for i in range(1, 8)])
+    Visit.objects.create(id=1, visit_id=1, person_id=2, day=date(2016, 1, 1))
+
+    yield
+
+    with connection.schema_editor() as editor:
+        editor.delete_model(Visit)
+        editor.delete_model(Person)
+
+
+def read_csv(path, opener=io.open):
+
+    with opener(path, 'rb') as fp:
+        text = fp.read().decode('utf-8')
+
+    return list(csv.reader(str(line) for line in text.splitlines()))
+
+
+def test_export_fields():
+
+    # The data model's field order, without the surrogate id.
+    assert [f.column for f in get_export_fields(Person)] == \
+        ['gender', 'person_id']
+    assert [f.column for f in get_export_fields(Visit)] == \
+        ['visit_id', 'person_id', 'day']
+
+
+def test_export_csv(tables, tmpdir):
+
+    path = str(tmpdir.join('person.csv.gz'))
+    batches = []
+
+    stats = export_table(Person, path, batch_size=3, progress=batches.append)
+
+    assert (stats.rows, stats.batches) == (7, 3)
+    assert [s.rows for s in batches] == [3, 6, 7]
+    assert read_csv(path, gzip.open) == [
+        ['gender', 'person_id'], ['F', '1'], ['M', '2'], ['', '3'],
+        ['F', '4'], ['M', '5'], ['', '6'], ['F', '7']]
+
+
+def test_export_jsonl(tables, tmpdir):
+
+    path = str(tmpdir.join('visit.jsonl'))
+
+    export_table(Visit, path, format='jsonl', compression='bz2')
+
+    with bz2.BZ2File(path, 'rb') as fp:
+        lines = fp.read().decode('utf-8').splitlines()
+
+    assert lines == ['{"visit_id":1,"person_id":2,"day":"2016-01-01"}']
+    row = json.loads(lines[0], object_pairs_hook=OrderedDict)
+
+    assert list(row) == [u'visit_id', u'person_id', u'day']
+
+
+def test_export_tables(tables, tmpdir):
+
+    results = export_tables([Person, Visit], str(tmpdir), workers=1,
+                            compression='gzip')
+
+    assert list(results) == ['export_person', 'export_visit']
+    assert results['export_person'].rows == 7
+    assert sorted(os.listdir(str(tmpdir))) == ['export_person.csv.gz',
+                                               'export_visit.csv.gz']
+    assert read_csv(str(tmpdir.join('export_visit.csv.gz')), gzip.open) == [
+        ['visit_id', 'person_id', 'day'], ['1', '2', '2016-01-01']]
+
+
+def test_export_no_tables(tmpdir):
+
+    assert export_tables([], str(tmpdir), workers=4) == OrderedDict()
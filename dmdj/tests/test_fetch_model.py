@@ -0,0 +1,152 @@
+import json
+import os
+import threading
+import time
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:  # Python 2
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+import pytest
+from dmdj import settings
+from dmdj.settings import fetch_model, fetch_models, get_cache_path
+
+model_json = {'name': 'test', 'version': '1.0.0', 'tables': [],
+              'schema': {'constraints': {}, 'indexes': []}}
+
+
+class Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class Handler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    requests = []
+    clients = set()
+
+    def do_GET(self):
+        Handler.requests.append((self.path,
+                                 self.headers.get('If-None-Match')))
+        Handler.clients.add(self.client_address)
+
+        if '/slow/' in self.path:
+            time.sleep(0.3)
+
+        if '/flaky/' in self.path and len(Handler.requests) == 1:
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        if self.headers.get('If-None-Match') == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        body = json.dumps(model_json).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('ETag', '"v1"')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def service(monkeypatch):
+    server = Server(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever,
+                              kwargs={'poll_interval': 0.01})
+    thread.daemon = True
+    thread.start()
+    Handler.requests = []
+    Handler.clients = set()
+    monkeypatch.setattr(settings, 'SERVICE', 'http://127.0.0.1:%d/' %
+                        server.server_address[1])
+    yield server
+    settings.close_connections()
+    server.shutdown()
+    server.server_close()
+
+
+def test_fetch_and_cache(service, tmpdir):
+
+    cache_dir = str(tmpdir)
+
+    assert fetch_model('test', '1.0.0', cache_dir=cache_dir) == model_json
+    assert os.path.exists(get_cache_path('test', '1.0.0', cache_dir))
+    assert Handler.requests == [('/schemata/test/1.0.0?format=json', None)]
+
+    assert fetch_model('test', '1.0.0', cache_dir=cache_dir) == model_json
+    assert len(Handler.requests) == 1
+
+
+def test_revalidate(service, tmpdir):
+
+    cache_dir = str(tmpdir)
+
+    fetch_model('test', '1.0.0', cache_dir=cache_dir)
+    assert fetch_model('test', '1.0.0', cache_dir=cache_dir, ttl=0,
+                       retries=0) == model_json
+    assert Handler.requests[1][1] == '"v1"'
+
+
+def test_offline(service, tmpdir):
+
+    cache_dir = str(tmpdir)
+
+    with pytest.raises(IOError):
+        fetch_model('test', '1.0.0', cache_dir=cache_dir, offline=True)
+
+    fetch_model('test', '1.0.0', cache_dir=cache_dir)
+    assert fetch_model('test', '1.0.0', cache_dir=cache_dir,
+                       offline=True) == model_json
+    assert len(Handler.requests) == 1
+
+
+def test_unreachable(service, tmpdir, monkeypatch):
+
+    cache_dir = str(tmpdir)
+
+    fetch_model('test', '1.0.0', cache_dir=cache_dir)
+    monkeypatch.setattr(settings, 'SERVICE', 'http://127.0.0.1:1/')
+    assert fetch_model('test', '1.0.0', cache_dir=cache_dir, ttl=0,
+                       retries=0) == model_json
+
+
+def test_connection_reuse(service, tmpdir):
+
+    for version in ('1.0.0', '2.0.0', '3.0.0'):
+        fetch_model('test', version, cache_dir=str(tmpdir))
+
+    assert len(Handler.requests) == 3
+    assert len(Handler.clients) == 1
+
+
+def test_retry(service, tmpdir):
+
+    assert fetch_model('flaky', '1.0.0', cache_dir=str(tmpdir),
+                       backoff=0.01) == model_json
+    assert len(Handler.requests) == 2
+
+
+def test_fetch_models(service, tmpdir):
+
+    pairs = [('slow', v) for v in ('1.0.0', '1.1.0', '2.0.0', '2.1.0')]
+
+    start = time.time()
+    models = fetch_models(pairs, cache_dir=str(tmpdir))
+
+    assert time.time() - start < 0.9
+    assert list(models) == pairs
+    # The pool threads' connections aren't left open.
+    assert all(c.sock is None for c in list(settings._open_connections))
+    assert all(m == model_json for m in models.values())
@@ -0,0 +1,85 @@
+import django
+from django.db.models import Model
+from dmdj.graph import ForeignKeyGraph
+from dmdj.makers import make_model
+
+if not django.conf.settings.configured:
+    django.conf.settings.configure()
+
+if hasattr(django, 'setup'):
+    django.setup()
+
+
+def fkey(source, target):
+    return {'source_table': source, 'source_field': '%s_id' % target,
+            'target_table': target, 'target_field': 'id'}
+
+
+model_json = {
+    'schema': {
+        'constraints': {
+            'foreign_keys': [fkey('visit', 'person'),
+                             fkey('visit', 'provider'),
+                             fkey('provider', 'care_site'),
+                             fkey('care_site', 'provider'),
+                             fkey('person', 'person'),
+                             fkey('note', 'outside')]
+        },
+        'indexes': []
+    },
+    'tables': [{'name': name, 'fields': [{'type': 'integer',
+                                          'name': '%s_id' % target}
+                                         for target in targets]}
+               for name, targets in [('visit', ['person', 'provider']),
+                                     ('person', ['person']),
+                                     ('provider', ['care_site']),
+                                     ('care_site', ['provider']),
+                                     ('note', ['outside']),
+                                     ('concept', [])]]
+}
+
+
+def test_edges():
+
+    graph = ForeignKeyGraph.from_data_model(model_json)
+
+    assert graph.edges['visit'] == ('person', 'provider')
+    assert graph.edges['note'] == ()
+
+
+def test_order():
+
+    graph = ForeignKeyGraph.from_data_model(model_json)
+
+    assert graph.strong_components() == [('person',), ('provider',
+                                                       'care_site'),
+                                         ('visit',), ('note',), ('concept',)]
+    assert graph.topological_order() == ['person', 'provider', 'care_site',
+                                         'visit', 'note', 'concept']
+    assert graph.cycles() == [('person',), ('provider', 'care_site')]
+
+
+def test_connected_components():
+
+    graph = ForeignKeyGraph.from_data_model(model_json)
+
+    assert graph.connected_components() == [
+        ('visit', 'person', 'provider', 'care_site'), ('note',), ('concept',)]
+
+
+def test_long_chain():
+
+    edges = dict(('t%d' % i, ('t%d' % (i + 1),)) for i in range(5000))
+    edges['t5000'] = ()
+
+    order = ForeignKeyGraph(edges).topological_order()
+
+    assert order[0] == 't5000' and order[-1] == 't0'
+
+
+def test_from_models():
+
+    models = make_model(model_json, (Model,), 'dmdj.tests', 'graph')
+    graph = ForeignKeyGraph.from_models(models)
+
+    assert graph.edges == ForeignKeyGraph.from_data_model(model_json).edges
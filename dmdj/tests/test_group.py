@@ -0,0 +1,73 @@
+from dmdj.makers import group_by_table, group_by_field
+
+model_json = {
+    'schema': {
+        'constraints': {
+            'foreign_keys': [{'source_table': 'test_table_1',
+                              'source_field': 'integer',
+                              'target_table': 'test_table_2',
+                              'target_field': 'integer'}],
+            'not_null': [{'table': 'test_table_1', 'field': 'string'}],
+            'uniques': [{'table': 'test_table_2', 'fields': ['integer']}],
+            'primary_keys': [{'table': 'test_table_1', 'fields': ['pk']}]
+        },
+        'indexes': [{'table': 'test_table_2', 'fields': ['string']},
+                    {'table': 'other_table', 'fields': ['string']}]
+    },
+    'tables': [{'name': 'test_table_1', 'fields': [{'type': 'integer',
+                                                    'name': 'pk'},
+                                                   {'type': 'integer',
+                                                    'name': 'integer'},
+                                                   {'type': 'string',
+                                                    'name': 'string',
+                                                    'length': 0}]},
+               {'name': 'test_table_2', 'fields': [{'type': 'integer',
+                                                    'name': 'integer'},
+                                                   {'type': 'string',
+                                                    'name': 'string',
+                                                    'length': 0}]}]
+}
+
+
+def test_group_by_table():
+
+    groups = group_by_table(model_json)
+
+    assert sorted(groups) == ['test_table_1', 'test_table_2']
+
+    cons, idxs = groups['test_table_1']
+    assert len(cons['foreign_keys']) == 1
+    assert len(cons['not_null']) == 1
+    assert cons['uniques'] == []
+    assert len(cons['primary_keys']) == 1
+    assert idxs == []
+
+    cons, idxs = groups['test_table_2']
+    assert cons['foreign_keys'] == []
+    assert len(cons['uniques']) == 1
+    assert idxs == [{'table': 'test_table_2', 'fields': ['string']}]
+
+
+def test_group_by_field():
+
+    fields_json = [{'name': 'int1'}, {'name': 'int2'}]
+    constraints = {
+        'primary_keys': [{'fields': ['int1', 'int2']}],
+        'not_null': [{'field': 'int2'}],
+        'foreign_keys': [{'source_field': 'int1'}]
+    }
+    indexes = [{'fields': ['int1', 'int1']}]
+
+    groups = group_by_field(fields_json, constraints, indexes)
+
+    cons, idxs = groups['int1']
+    assert len(cons['primary_keys']) == 1
+    assert cons['not_null'] == []
+    assert len(cons['foreign_keys']) == 1
+    assert len(idxs) == 1
+
+    cons, idxs = groups['int2']
+    assert len(cons['primary_keys']) == 1
+    assert len(cons['not_null']) == 1
+    assert cons['foreign_keys'] == []
+    assert idxs == []
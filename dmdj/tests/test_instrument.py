@@ -0,0 +1,88 @@
+import threading
+
+import django
+from django.db.models import Model
+from dmdj import makers
+from dmdj.instrument import instrument
+from dmdj.makers import make_model
+
+if not django.conf.settings.configured:
+    django.conf.settings.configure()
+
+if hasattr(django, 'setup'):
+    django.setup()
+
+model_json = {
+    'schema': {
+        'constraints': {
+            'primary_keys': [{'table': 'test_table_1', 'fields': ['pk']}]
+        },
+        'indexes': []
+    },
+    'tables': [{'name': 'test_table_1', 'fields': [{'type': 'integer',
+                                                    'name': 'pk'}]},
+               {'name': 'test_table_2', 'fields': [{'type': 'integer',
+                                                    'name': 'integer'}]}]
+}
+
+
+def test_instrument():
+
+    calls = []
+
+    with instrument(callback=lambda *args: calls.append(args)) as recorder:
+        make_model(model_json, (Model,), 'dmdj.tests', 'instrument')
+
+    assert getattr(makers._local, 'recorder', None) is None
+    assert sorted(recorder.phase_totals()) == ['class', 'fields', 'group',
+                                               'meta', 'plan']
+    assert sorted(recorder.table_totals()) == ['test_table_1',
+                                               'test_table_2']
+    assert len(recorder.slowest_tables(1)) == 1
+    assert len(calls) == 1 + 2 * 4
+    assert calls[0][:2] == (None, 'group')
+
+    summary = recorder.summary()
+    assert 'Slowest tables:' in summary
+    assert 'test_table_1' in summary
+
+
+def test_not_sampled():
+
+    with instrument(sample_rate=0) as recorder:
+        assert getattr(makers._local, 'recorder', None) is None
+        make_model(model_json, (Model,), 'dmdj.tests', 'instrument_off')
+
+    assert not recorder.sampled
+    assert recorder.phase_totals() == {}
+
+
+def test_threads():
+
+    # Blocks that overlap in two threads each record only their thread's
+    # generation, and are each removed from their own thread.
+    entered = threading.Event()
+    finish = threading.Event()
+    recorders = []
+
+    def other():
+        with instrument() as recorder:
+            recorders.append(recorder)
+            entered.set()
+            finish.wait()
+        recorders.append(getattr(makers._local, 'recorder', None))
+
+    thread = threading.Thread(target=other)
+    thread.start()
+    entered.wait()
+
+    with instrument() as recorder:
+        make_model(model_json, (Model,), 'dmdj.tests', 'instrument_thread')
+        finish.set()
+        thread.join()
+
+    assert getattr(makers._local, 'recorder', None) is None
+    assert recorders[1] is None
+    assert sorted(recorder.table_totals()) == ['test_table_1',
+                                               'test_table_2']
+    assert recorders[0].table_totals() == {}
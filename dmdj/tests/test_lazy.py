@@ -0,0 +1,110 @@
+import django
+from django.apps import apps
+from django.db.models import Model, ForeignKey
+from dmdj import lazy
+from dmdj.lazy import LazyModels
+
+if not django.conf.settings.configured:
+    django.conf.settings.configure()
+
+if hasattr(django, 'setup'):
+    django.setup()
+
+
+def make_model_json():
+
+    return {
+        'schema': {
+            'constraints': {
+                'foreign_keys': [{'source_table': 'test_table_1',
+                                  'source_field': 'integer',
+                                  'target_table': 'test_table_2',
+                                  'target_field': 'integer'}],
+                'uniques': [{'table': 'test_table_2', 'fields': ['integer']}]
+            },
+            'indexes': []
+        },
+        'tables': [{'name': 'test_table_1', 'fields': [{'type': 'integer',
+                                                        'name': 'integer'}]},
+                   {'name': 'test_table_2', 'fields': [{'type': 'integer',
+                                                        'name': 'integer'}]},
+                   {'name': 'test_table_3', 'fields': [{'type': 'integer',
+                                                        'name': 'integer'}]}]
+    }
+
+
+def test_mapping():
+
+    models = LazyModels(make_model_json(), (Model,), 'dmdj.tests',
+                        'lazy_mapping')
+
+    assert list(models) == ['TestTable1', 'TestTable2', 'TestTable3']
+    assert len(models) == 3
+    assert 'TestTable1' in models
+    assert models.loaded() == []
+    assert 'testtable1' not in apps.all_models['lazy_mapping']
+
+
+def test_access_builds_targets():
+
+    models = LazyModels(make_model_json(), (Model,), 'dmdj.tests',
+                        'lazy_access')
+
+    table = models.TestTable1
+
+    assert table is models['TestTable1']
+    assert table.__name__ == 'TestTable1'
+    assert models.loaded() == ['TestTable1', 'TestTable2']
+    assert sorted(apps.all_models['lazy_access']) == ['testtable1',
+                                                      'testtable2']
+
+    field = table._meta.get_field('integer')
+    assert isinstance(field, ForeignKey)
+    target = getattr(field, 'remote_field', None) or field.rel
+    assert (getattr(target, 'model', None) or target.to) is models.TestTable2
+
+
+def test_published_after_targets(monkeypatch):
+
+    models = LazyModels(make_model_json(), (Model,), 'dmdj.tests',
+                        'lazy_publish')
+    make_table = lazy.make_table
+    published = []
+
+    def tracked(table_json, *args):
+        published.append(models.loaded())
+        return make_table(table_json, *args)
+
+    monkeypatch.setattr(lazy, 'make_table', tracked)
+
+    models.TestTable1
+
+    # Other threads don't see TestTable1 before TestTable2 is built.
+    assert published == [[], []]
+    assert models.loaded() == ['TestTable1', 'TestTable2']
+
+
+def test_missing():
+
+    models = LazyModels(make_model_json(), (Model,), 'dmdj.tests',
+                        'lazy_missing')
+
+    try:
+        models.Missing
+    except AttributeError:
+        pass
+    else:
+        assert False
+
+    assert models.get('Missing') is None
+
+
+def test_build_all():
+
+    models = LazyModels(make_model_json(), (Model,), 'dmdj.tests',
+                        'lazy_all')
+
+    built = models.build_all()
+
+    assert [m.__name__ for m in built] == list(models)
+    assert len(apps.all_models['lazy_all']) == 3
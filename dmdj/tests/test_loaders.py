@@ -0,0 +1,206 @@
+import io
+import os
+from decimal import Decimal
+
+import django
+import pytest
+from django.db import connection
+from django.db.models import Model
+from dmdj.loaders import get_columns, load_csv, load_tables
+from dmdj.makers import make_model
+
+if not django.conf.settings.configured:
+    django.conf.settings.configure()
+
+if hasattr(django, 'setup'):
+    django.setup()
+
+model_json = {
+    'schema': {
+        'constraints': {
+            'primary_keys': [{'table': 'person', 'fields': ['person_id']}],
+            'foreign_keys': [{'source_table': 'visit',
+                              'source_field': 'person_id',
+                              'target_table': 'person',
+                              'target_field': 'person_id'}]
+        },
+        'indexes': []
+    },
+    'tables': [{'name': 'person', 'fields': [{'type': 'integer',
+                                              'name': 'person_id'},
+                                             {'type': 'date',
+                                              'name': 'birth_date'},
+                                             {'type': 'string',
+                                              'name': 'gender',
+                                              'length': 8}]},
+               {'name': 'visit', 'fields': [{'type': 'integer',
+                                             'name': 'person_id'},
+                                            {'type': 'decimal',
+                                             'name': 'cost',
+                                             'precision': 8,
+                                             'scale': 2}]}]
+}
+
+Person, Visit = make_model(model_json, (Model,), 'dmdj.tests', 'loaders')
+
+sched_json = {
+    'schema': {
+        'constraints': {
+            'primary_keys': [{'table': t, 'fields': ['key']}
+                             for t in ('sched_a', 'sched_b', 'sched_c')],
+            'foreign_keys': [{'source_table': source, 'source_field': field,
+                              'target_table': target, 'target_field': 'key'}
+                             for source, field, target in (
+                                 ('sched_a', 'b', 'sched_b'),
+                                 ('sched_b', 'a', 'sched_a'),
+                                 ('sched_c', 'a', 'sched_a'))]
+        },
+        'indexes': []
+    },
+    'tables': [{'name': name, 'fields': [{'type': 'integer', 'name': 'key'},
+                                         {'type': 'integer', 'name': target}]}
+               for name, target in (('sched_c', 'a'), ('sched_a', 'b'),
+                                    ('sched_b', 'a'))]
+}
+
+sched_models = make_model(sched_json, (Model,), 'dmdj.tests', 'loaders')
+
+
+@pytest.fixture(scope='module')
+def tables():
+
+    with connection.schema_editor() as editor:
+        for model in [Person, Visit] + sched_models:
+            editor.create_model(model)
+
+    yield
+
+    with connection.schema_editor() as editor:
+        for model in sched_models[::-1] + [Visit, Person]:
+            editor.delete_model(model)
+
+
+def test_columns():
+
+    columns = get_columns(Visit)
+
+    assert sorted(columns) == ['cost', 'id', 'person_id']
+    assert columns['person_id'].name == 'person_id'
+
+
+def test_load_csv(tables, tmpdir):
+
+    path = tmpdir.join('person.csv')
+    path.write('person_id,gender,birth_date\n'
+               '1,F,2001-02-03\n'
+               '2,,2002-03-04\n'
+               '3,M,\n')
+
+    batches = []
+
+    stats = load_csv(Person, str(path), batch_size=2,
+                     progress=batches.append)
+
+    assert stats.rows == 3
+    assert stats.batches == 2
+    assert stats.rows_per_second > 0
+    assert [b.rows for b in batches] == [2, 3]
+
+    people = list(Person.objects.order_by('person_id'))
+
+    assert [p.gender for p in people] == ['F', None, 'M']
+    assert people[0].birth_date.year == 2001
+    assert people[2].birth_date is None
+
+
+def test_load_tsv(tables):
+
+    source = io.BytesIO(b'person_id\tcost\n1\t12.50\n') if str is bytes \
+        else io.StringIO('person_id\tcost\n1\t12.50\n')
+
+    stats = load_csv(Visit, source, delimiter='\t',
+                     transaction_mode='batch')
+
+    assert stats.rows == 1
+    # Django 1.7 reads decimals from SQLite without their trailing zeros.
+    assert Visit.objects.get().cost == Decimal('12.50')
+
+
+def test_unknown_column():
+
+    source = io.BytesIO(b'nope\n1\n') if str is bytes \
+        else io.StringIO('nope\n1\n')
+
+    try:
+        load_csv(Person, source)
+    except ValueError as e:
+        assert 'nope' in str(e)
+    else:
+        assert False
+
+
+def write_sources(tmpdir):
+
+    sources = {}
+
+    for model in sched_models:
+        model.objects.all().delete()
+
+    for model, column in zip(sched_models, ['a', 'b', 'a']):
+        path = tmpdir.join('%s.csv' % model._meta.db_table)
+        path.write('key,%s\n1,1\n2,2\n' % column)
+        sources[model._meta.db_table] = str(path)
+
+    return sources
+
+
+def test_load_tables(tables, tmpdir):
+
+    results = load_tables(sched_models, write_sources(tmpdir), workers=1)
+
+    assert list(results) == ['sched_a', 'sched_b', 'sched_c']
+    assert [stats.rows for stats in results.values()] == [2, 2, 2]
+    assert sched_models[0].objects.count() == 2
+
+
+def test_load_tables_workers(tables, tmpdir):
+
+    # Each worker writes to its own copy of the in-memory database, so only
+    # the returned stats can be checked.
+    results = load_tables(sched_models, write_sources(tmpdir), workers=2)
+
+    assert list(results) == ['sched_a', 'sched_b', 'sched_c']
+    assert [stats.rows for stats in results.values()] == [2, 2, 2]
+
+
+def test_load_tables_error(tables, tmpdir):
+
+    sources = write_sources(tmpdir)
+    tmpdir.join('sched_c.csv').write('nope\n1\n')
+
+    try:
+        load_tables(sched_models, sources, workers=1)
+    except RuntimeError as e:
+        assert 'sched_c' in str(e) and 'nope' in str(e)
+    else:
+        assert False
+
+
+def exit_worker(stats):
+    os._exit(1)
+
+
+def test_load_tables_worker_failure(tables, tmpdir):
+
+    sources = write_sources(tmpdir)
+
+    # Arguments that can't be pickled, and a worker that exits, fail the
+    # load rather than leaving it waiting.
+    for progress, message in [(lambda stats: None, 'sched_a'),
+                              (exit_worker, 'worker process exited')]:
+        try:
+            load_tables(sched_models, sources, workers=2, progress=progress)
+        except RuntimeError as e:
+            assert message in str(e)
+        else:
+            assert False
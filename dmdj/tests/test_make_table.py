@@ -1,6 +1,8 @@
+from copy import deepcopy
+
 import django
 from django.db.models import Model, ForeignKey
-from dmdj.makers import make_table
+from dmdj.makers import LRUCache, clear_plan_cache, make_table, plan_table
 
 if not django.conf.settings.configured:
     django.conf.settings.configure()
@@ -145,3 +147,72 @@ def test_foreign_key():
             assert isinstance(field, ForeignKey)
             assert field.to_fields[0] == 'field'
             assert field.related_query_name() == 'test_table_integer_set'
+
+
+def test_not_mutated():
+
+    table_json = {'name': 'test_table', 'fields': [{'type': 'integer',
+                                                    'name': 'int1'},
+                                                   {'type': 'integer',
+                                                    'name': 'int2'}]}
+    constraint_json = {'primary_keys': [{'fields': ['int1', 'int2']}]}
+    expected = deepcopy((table_json, constraint_json))
+
+    first = make_table(table_json, constraint_json, [], (Model,),
+                       'dmdj.tests', 'memo_1')
+    second = make_table(table_json, constraint_json, [], (Model,),
+                        'dmdj.tests', 'memo_2')
+
+    assert (table_json, constraint_json) == expected
+    assert [f.name for f in first._meta.fields] == \
+        [f.name for f in second._meta.fields] == ['int1', 'int2', 'id']
+    assert first._meta.get_field('int1') is not \
+        second._meta.get_field('int1')
+
+
+def test_plan_cache():
+
+    clear_plan_cache()
+
+    table_json = {'name': 'test_table', 'fields': [{'type': 'integer',
+                                                    'name': 'integer'}]}
+    reordered = {'fields': [{'name': 'integer', 'type': 'integer'}],
+                 'name': 'test_table'}
+
+    spec = plan_table(table_json, {}, [])
+
+    assert plan_table(reordered, {}, []) is spec
+    assert plan_table(table_json, {'not_null': []}, []) is not spec
+
+    cache = LRUCache(2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_plan_cache_text():
+
+    clear_plan_cache()
+
+    # Byte strings on Python 2, as in a data model from a str literal.
+    byte_json = {str('name'): str('text_table'),
+                 str('fields'): [{str('type'): str('integer'),
+                                  str('name'): str('code')}]}
+    text_json = {u'name': u'text_table',
+                 u'fields': [{u'type': u'integer', u'name': u'code'}]}
+
+    byte_spec = plan_table(byte_json, {}, [])
+    text_spec = plan_table(text_json, {}, [])
+
+    assert text_spec == byte_spec
+
+    for spec in (byte_spec, text_spec):
+        assert type(spec.name) is type(u'')
+        assert type(spec.meta.db_table) is type(u'')
+        assert type(dict(spec.fields[0].kwargs)['db_column']) is type(u'')
+        assert type(dict(spec.fields[1].kwargs)['help_text']) is type(u'')
@@ -0,0 +1,185 @@
+import json
+from copy import deepcopy
+
+import django
+from django.db import connection, migrations
+from django.db.migrations.state import ProjectState
+from dmdj.cli import main
+from dmdj.makers import plan_model
+from dmdj.operations import make_migration, make_operations
+
+if not django.conf.settings.configured:
+    django.conf.settings.configure()
+
+if hasattr(django, 'setup'):
+    django.setup()
+
+old_json = {
+    'schema': {
+        'constraints': {
+            'primary_keys': [{'table': 'ops_person', 'fields': ['person_id']},
+                             {'table': 'ops_visit',
+                              'fields': ['visit_id', 'person_id']}],
+            'foreign_keys': [{'source_table': 'ops_visit',
+                              'source_field': 'person_id',
+                              'target_table': 'ops_person',
+                              'target_field': 'person_id'}]
+        },
+        'indexes': []
+    },
+    'tables': [{'name': 'ops_person', 'fields': [{'type': 'integer',
+                                                  'name': 'person_id'},
+                                                 {'type': 'string',
+                                                  'name': 'gender',
+                                                  'length': 8},
+                                                 {'type': 'string',
+                                                  'name': 'race',
+                                                  'length': 8}]},
+               {'name': 'ops_visit', 'fields': [{'type': 'integer',
+                                                 'name': 'visit_id'},
+                                                {'type': 'integer',
+                                                 'name': 'person_id'}]},
+               {'name': 'ops_note', 'fields': [{'type': 'text',
+                                                'name': 'text'}]}]
+}
+
+
+def make_new_json():
+
+    new_json = deepcopy(old_json)
+    person, visit, note = new_json['tables']
+
+    person['fields'][1]['length'] = 16
+    del person['fields'][2]
+    visit['fields'].append({'type': 'integer', 'name': 'provider_id'})
+
+    new_json['tables'] = [person, visit, {
+        'name': 'ops_provider', 'fields': [{'type': 'integer',
+                                            'name': 'provider_id'},
+                                           {'type': 'integer',
+                                            'name': 'visit_id'}]}]
+
+    constraints = new_json['schema']['constraints']
+    constraints['primary_keys'].append({'table': 'ops_provider',
+                                        'fields': ['provider_id']})
+    # A cycle between an existing and a new table.
+    constraints['foreign_keys'].extend([
+        {'source_table': 'ops_visit', 'source_field': 'provider_id',
+         'target_table': 'ops_provider', 'target_field': 'provider_id'},
+        {'source_table': 'ops_provider', 'source_field': 'visit_id',
+         'target_table': 'ops_visit', 'target_field': 'id'}])
+    new_json['schema']['indexes'].append({'table': 'ops_visit',
+                                          'fields': ['visit_id',
+                                                     'provider_id']})
+
+    return new_json
+
+
+def apply(operations, state, database=True):
+
+    for operation in operations:
+        new_state = state.clone()
+        operation.state_forwards('ops', new_state)
+        if database:
+            with connection.schema_editor() as editor:
+                operation.database_forwards('ops', editor, state, new_state)
+        state = new_state
+
+    return state
+
+
+def describe(state):
+
+    tables = {}
+
+    # Django 1.7 only renders a state's apps on request.
+    for model in (state.apps or state.render()).get_models():
+        fields = []
+        for field in model._meta.local_fields:
+            name, path, args, kwargs = field.deconstruct()
+            if 'to' in kwargs:
+                kwargs['to'] = kwargs['to'].split('.')[-1]
+            fields.append((name, path, kwargs))
+        tables[model._meta.db_table] = (
+            sorted(fields), set(model._meta.unique_together),
+            set(model._meta.index_together))
+
+    return tables
+
+
+def test_operations():
+
+    operations = make_operations(old_json, make_new_json())
+
+    assert [type(o).__name__ for o in operations] == [
+        'RemoveField', 'CreateModel', 'AlterField', 'AddField',
+        'AlterIndexTogether', 'DeleteModel']
+
+    state = apply(make_operations({'tables': [], 'schema': {
+        'constraints': {}, 'indexes': []}}, old_json), ProjectState())
+    state = apply(operations, state)
+
+    expected = apply(make_operations({'tables': [], 'schema': {
+        'constraints': {}, 'indexes': []}}, make_new_json()), ProjectState(),
+        database=False)
+
+    assert describe(state) == describe(expected)
+
+    with connection.cursor() as cursor:
+        tables = connection.introspection.table_names(cursor)
+        columns = [c.name for c in connection.introspection
+                   .get_table_description(cursor, 'ops_visit')]
+
+    assert 'ops_provider' in tables
+    assert 'ops_note' not in tables
+    assert sorted(columns) == ['id', 'person_id', 'provider_id', 'visit_id']
+
+    # The migrated state makes the same Meta decisions as the plan.
+    visit = [s for s in plan_model(make_new_json())
+             if s.meta.db_table == 'ops_visit'][0]
+    assert describe(state)['ops_visit'][2] == set(visit.meta.index_together)
+
+
+def test_no_changes():
+
+    assert make_operations(old_json, deepcopy(old_json)) == []
+
+
+def test_migration():
+
+    migration = make_migration(None, old_json, 'ops', '0001_initial')
+
+    assert isinstance(migration, migrations.Migration)
+    assert migration.initial
+    assert [type(o).__name__ for o in migration.operations] == [
+        'CreateModel'] * 3
+
+    migration = make_migration(old_json, make_new_json(), 'ops', '0002_next',
+                               [('ops', '0001_initial')])
+
+    assert not migration.initial
+    assert migration.dependencies == [('ops', '0001_initial')]
+
+    migration = make_migration(old_json, make_new_json(), 'ops', '0002_next',
+                               [(b'ops', b'0001_initial')])
+
+    assert [type(v) for v in migration.dependencies[0]] == [type(u'')] * 2
+
+
+def test_migration_command(tmpdir):
+
+    old_path = tmpdir.join('old.json')
+    new_path = tmpdir.join('new.json')
+    output = tmpdir.join('0002_next.py')
+
+    old_path.write(json.dumps(old_json))
+    new_path.write(json.dumps(make_new_json()))
+
+    main(['migration', str(old_path), str(new_path), '--app-label', 'ops',
+          '--name', '0002_next', '--dependency', 'ops.0001_initial', '-o',
+          str(output)])
+
+    source = output.read()
+
+    assert "('ops', '0001_initial')" in source
+    assert "migrations.DeleteModel(\n            name='OpsNote'," in source
@@ -0,0 +1,56 @@
+import django
+from django.db.models import Model
+from dmdj import makers
+from dmdj.makers import make_model
+from dmdj.preload import preload, warm_models
+
+if not django.conf.settings.configured:
+    django.conf.settings.configure()
+
+if hasattr(django, 'setup'):
+    django.setup()
+
+model_json = {
+    'schema': {
+        'constraints': {
+            'primary_keys': [{'table': 'preload_person',
+                              'fields': ['person_id']}],
+            'foreign_keys': [{'source_table': 'preload_visit',
+                              'source_field': 'person_id',
+                              'target_table': 'preload_person',
+                              'target_field': 'person_id'}]
+        },
+        'indexes': []
+    },
+    'tables': [{'name': 'preload_person', 'fields': [{'type': 'integer',
+                                                      'name': 'person_id'}]},
+               {'name': 'preload_visit', 'fields': [{'type': 'integer',
+                                                     'name': 'person_id'}]}]
+}
+
+Person, Visit = make_model(model_json, (Model,), 'dmdj.tests', 'preload')
+
+# The caches of field names and related objects (Django 1.7's before 1.8).
+if django.VERSION < (1, 8):
+    FIELDS_CACHE, RELATED_CACHE = '_name_map', '_related_objects_cache'
+else:
+    FIELDS_CACHE, RELATED_CACHE = 'fields_map', 'related_objects'
+
+
+def test_warm_models():
+
+    assert warm_models([Visit]) == [Visit]
+    assert FIELDS_CACHE in Visit._meta.__dict__
+
+
+def test_preload():
+
+    make_model(model_json, (Model,), 'dmdj.tests', 'preload_plans')
+
+    assert len(makers._plan_cache)
+
+    models = preload()
+
+    assert Person in models
+    assert RELATED_CACHE in Person._meta.__dict__
+    assert not len(makers._plan_cache)
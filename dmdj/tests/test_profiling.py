@@ -0,0 +1,148 @@
+import io
+
+import django
+from dmdj.makers import make_field, plan_model
+from dmdj.profiling import (Suggestion, apply_suggestions, profile_data_model,
+                            suggest_types)
+
+if not django.conf.settings.configured:
+    django.conf.settings.configure()
+
+if hasattr(django, 'setup'):
+    django.setup()
+
+
+def field(datatype, name, length=0, precision=0, scale=0):
+    return {'type': datatype, 'name': name, 'length': length,
+            'precision': precision, 'scale': scale}
+
+
+model_json = {
+    'schema': {
+        'constraints': {
+            'primary_keys': [{'table': 'fact', 'fields': ['person_id',
+                                                          'code']}],
+            'uniques': [{'table': 'fact', 'fields': ['code', 'amount']}],
+            'not_null': []
+        },
+        'indexes': []
+    },
+    'tables': [{'name': 'fact', 'fields': [field('integer', 'person_id'),
+                                           field('integer', 'count'),
+                                           field('string', 'code'),
+                                           field('string', 'note', 4),
+                                           field('decimal', 'amount'),
+                                           field('decimal', 'rate',
+                                                 precision=4, scale=2),
+                                           field('integer', 'bad'),
+                                           field('date', 'day')]}]
+}
+
+rows = u'''person_id,count,code,note,amount,rate,bad,day
+3000000000,1,AB,short,12.5,1.125,1,2016-01-01
+1,200,ABCD,,0.05,-3.5,x,
+'''
+
+
+def write(tmpdir, text):
+
+    path = str(tmpdir.join('fact.csv'))
+
+    with io.open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+    return path
+
+
+def test_profile(tmpdir):
+
+    profile = profile_data_model(model_json, {'fact': write(tmpdir, rows)})[
+        'fact']
+
+    assert profile.rows == 2
+    assert profile.columns['person_id'].maximum == 3000000000
+    assert profile.columns['code'].max_length == 4
+    assert profile.columns['note'].nulls == 1
+    assert profile.columns['amount'].max_digits == 2
+    assert profile.columns['amount'].max_scale == 2
+    assert profile.columns['bad'].invalid == 1
+
+
+def test_suggest(tmpdir):
+
+    profiles = profile_data_model(model_json, {'fact': write(tmpdir, rows)})
+
+    suggestions = dict((s.field, s.changes) for s in suggest_types(
+        model_json, profiles, headroom=1))
+
+    assert suggestions == {
+        'person_id': {'type': 'biginteger'},
+        'count': {'type': 'smallinteger'},
+        'code': {'length': 4},
+        'note': {'length': 5},
+        'amount': {'precision': 4, 'scale': 2},
+        'rate': {'precision': 5, 'scale': 3}
+    }
+
+    suggestions = dict((s.field, s.changes) for s in suggest_types(
+        model_json, profiles, headroom=2))
+
+    assert suggestions['code'] == {'length': 8}
+    assert suggestions['amount'] == {'precision': 6, 'scale': 2}
+
+
+def test_big_table():
+
+    suggestions = suggest_types(model_json, {},
+                                row_counts={'fact': 2 ** 31})
+
+    assert suggestions == [Suggestion('fact', 'id', {'type': 'biginteger'},
+                                      'up to 2147483648 rows')]
+
+    narrowed = apply_suggestions(model_json, suggestions)
+
+    # The data model isn't modified.
+    assert 'id' not in [f['name'] for f in model_json['tables'][0]['fields']]
+
+    old_spec = plan_model(model_json)[0]
+    new_spec = plan_model(narrowed)[0]
+
+    assert old_spec.meta == new_spec.meta
+    assert old_spec.fields[:-1] == new_spec.fields[:-1]
+    assert new_spec.fields[-1] == old_spec.fields[-1]._replace(
+        type='django.db.models.fields.BigIntegerField')
+
+
+def test_primary_key_rows(tmpdir):
+
+    pkey_json = {
+        'schema': {
+            'constraints': {
+                'primary_keys': [{'table': 'fact', 'fields': ['count']}]
+            },
+            'indexes': []
+        },
+        'tables': [{'name': 'fact', 'fields': [field('integer', 'count')]}]
+    }
+
+    profiles = profile_data_model(pkey_json, {'fact': write(
+        tmpdir, u'count\n1\n2\n3\n')})
+
+    def suggest(rows):
+        return [(s.field, s.changes) for s in suggest_types(
+            pkey_json, profiles, row_counts=rows and {'fact': rows})]
+
+    # The sampled keys alone would fit a smallinteger, but the primary key
+    # of a table of the expected rows needs room for as many values.
+    assert suggest(None) == [('count', {'type': 'smallinteger'})]
+    assert suggest(100000) == []
+    assert suggest(2 ** 31) == [('count', {'type': 'biginteger'})]
+
+
+def test_field_types():
+
+    small = make_field(field('smallinteger', 'a'), {}, [])
+    big = make_field(field('biginteger', 'a'), {}, [])
+
+    assert small.get_internal_type() == 'SmallIntegerField'
+    assert big.get_internal_type() == 'BigIntegerField'
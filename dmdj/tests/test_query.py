@@ -0,0 +1,114 @@
+import django
+import pytest
+from django.db import connection
+from django.db.models import Model
+from django.test.utils import CaptureQueriesContext
+from dmdj.makers import make_model
+from dmdj.query import find_join_path, get_join_lookups, join_queryset
+
+if not django.conf.settings.configured:
+    django.conf.settings.configure()
+
+if hasattr(django, 'setup'):
+    django.setup()
+
+
+def fkey(source, field, target):
+    return {'source_table': source, 'source_field': field,
+            'target_table': target, 'target_field': 'id'}
+
+
+model_json = {
+    'schema': {
+        'constraints': {
+            'foreign_keys': [fkey('query_visit', 'person', 'query_person'),
+                             fkey('query_visit', 'provider',
+                                  'query_provider'),
+                             fkey('query_condition', 'visit', 'query_visit')]
+        },
+        'indexes': []
+    },
+    'tables': [{'name': 'query_person', 'fields': []},
+               {'name': 'query_provider', 'fields': []},
+               {'name': 'query_visit', 'fields': [{'type': 'integer',
+                                                   'name': 'person'},
+                                                  {'type': 'integer',
+                                                   'name': 'provider'}]},
+               {'name': 'query_condition', 'fields': [{'type': 'integer',
+                                                       'name': 'visit'}]},
+               {'name': 'query_note', 'fields': []}]
+}
+
+models = make_model(model_json, (Model,), 'dmdj.tests', 'query')
+Person, Provider, Visit, Condition, Note = models
+
+
+@pytest.fixture(scope='module')
+def person():
+
+    with connection.schema_editor() as editor:
+        for model in models:
+            editor.create_model(model)
+
+    # The generated id primary keys aren't auto-incrementing.
+    person = Person.objects.create(id=1)
+    provider = Provider.objects.create(id=1)
+
+    for i in range(3):
+        visit = Visit.objects.create(id=i, person=person, provider=provider)
+        Condition.objects.create(id=i, visit=visit)
+
+    yield person
+
+    with connection.schema_editor() as editor:
+        for model in reversed(models):
+            editor.delete_model(model)
+
+
+def names(path):
+    return [step.name for step in path]
+
+
+def test_paths():
+
+    assert names(find_join_path(Condition, Person)) == ['visit', 'person']
+    assert names(find_join_path(Person, Condition)) == [
+        'query_visit_person_set', 'query_condition_visit_set']
+    assert names(find_join_path(Provider, Person)) == [
+        'query_visit_provider_set', 'person']
+    assert find_join_path(Person, Person) == []
+
+    try:
+        find_join_path(Person, Note)
+    except ValueError as e:
+        assert 'QueryNote' in str(e)
+    else:
+        assert False
+
+
+def test_lookups():
+
+    assert get_join_lookups(find_join_path(Condition, Person)) == (
+        'visit__person', None)
+    assert get_join_lookups(find_join_path(Provider, Person)) == (
+        None, 'query_visit_provider_set__person')
+
+
+def test_select_related(person):
+
+    with CaptureQueriesContext(connection) as queries:
+        people = [c.visit.person for c in join_queryset(Condition, Person)]
+
+    assert people == [person] * 3
+    assert len(queries) == 1
+
+
+def test_prefetch_related(person):
+
+    with CaptureQueriesContext(connection) as queries:
+        conditions = [c for p in join_queryset(Person, Condition)
+                      for v in p.query_visit_person_set.all()
+                      for c in v.query_condition_visit_set.all()]
+
+    assert len(conditions) == 3
+    assert len(queries) == 3
@@ -0,0 +1,113 @@
+import io
+import json
+
+import django
+from django.db.models import Model
+from dmdj.makers import make_model
+from dmdj.stream import JSONStream, make_model_iter
+
+if not django.conf.settings.configured:
+    django.conf.settings.configure()
+
+if hasattr(django, 'setup'):
+    django.setup()
+
+model_json = {
+    'name': 'test',
+    'schema': {
+        'constraints': {
+            'foreign_keys': [{'source_table': 'test_table_1',
+                              'source_field': 'integer',
+                              'target_table': 'test_table_2',
+                              'target_field': 'integer'}],
+            'not_null': [{'table': 'test_table_1', 'field': 'string'}],
+            'uniques': [{'table': 'test_table_2', 'fields': ['integer']}],
+            'primary_keys': [{'table': 'test_table_1', 'fields': ['pk']},
+                             {'table': 'test_table_2',
+                              'fields': ['integer', 'string']}]
+        },
+        'indexes': [{'table': 'test_table_2', 'fields': ['string']}]
+    },
+    'tables': [{'name': 'test_table_1', 'fields': [{'type': 'integer',
+                                                    'name': 'pk'},
+                                                   {'type': 'integer',
+                                                    'name': 'integer'},
+                                                   {'type': 'string',
+                                                    'name': 'string',
+                                                    'length': 0}]},
+               {'name': 'test_table_2', 'fields': [{'type': 'integer',
+                                                    'name': 'integer'},
+                                                   {'type': 'decimal',
+                                                    'name': 'number',
+                                                    'precision': 12345,
+                                                    'scale': 2},
+                                                   {'type': 'string',
+                                                    'name': 'string',
+                                                    'length': 0}]}]
+}
+
+
+def describe(model):
+
+    fields = []
+
+    for field in model._meta.fields:
+        name, path, args, kwargs = field.deconstruct()
+        if 'to' in kwargs:
+            kwargs['to'] = kwargs['to'].split('.')[-1]
+        fields.append((name, path, args, kwargs))
+
+    return (model.__name__, model._meta.pk.name, model._meta.unique_together,
+            fields)
+
+
+def dump(keys):
+    # Serializes model_json with its top level keys in the given order.
+    members = ['%s: %s' % (json.dumps(k), json.dumps(model_json[k]))
+               for k in keys]
+    return '{%s}' % ', '.join(members)
+
+
+def test_stream_values():
+
+    stream = JSONStream(io.StringIO(u'{"a": [1, 23456, {"b": null}], '
+                                    u'"c": "d"}'), chunk_size=3)
+
+    items = []
+
+    for key in stream.iter_object():
+        if key == 'a':
+            for _ in stream.iter_array():
+                items.append(stream.value())
+        else:
+            items.append(stream.value())
+
+    assert items == [1, 23456, {'b': None}, 'd']
+    assert stream.peek() == ''
+
+
+def test_schema_first():
+
+    source = io.BytesIO(dump(['name', 'schema', 'tables']).encode('utf-8'))
+    models = make_model_iter(source, (Model,), 'dmdj.tests', 'stream_first',
+                             chunk_size=16)
+
+    first = next(models)
+
+    assert first.__name__ == 'TestTable1'
+    assert source.tell() < len(source.getvalue())
+    assert [m.__name__ for m in models] == ['TestTable2']
+
+
+def test_equivalence():
+
+    # Round trip through JSON so strings have the same type on Python 2.
+    expected = [describe(m) for m in
+                make_model(json.loads(dump(['schema', 'tables'])), (Model,),
+                           'dmdj.tests', 'stream_dyn')]
+
+    for i, keys in enumerate([['schema', 'tables'], ['tables', 'schema']]):
+        source = io.BytesIO(dump(keys).encode('utf-8'))
+        models = make_model_iter(source, (Model,), 'dmdj.tests',
+                                 'stream_%d' % i, chunk_size=7)
+        assert [describe(m) for m in models] == expected
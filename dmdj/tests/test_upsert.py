@@ -0,0 +1,211 @@
+import io
+import os
+from datetime import date
+
+import django
+import pytest
+from django.db import connection, connections, transaction
+from django.db.models import Model
+from dmdj.makers import make_model
+from dmdj.upsert import _upsert_sql, natural_key, upsert_csv, upsert_rows
+
+if not django.conf.settings.configured:
+    django.conf.settings.configure()
+
+if hasattr(django, 'setup'):
+    django.setup()
+
+model_json = {
+    'schema': {
+        'constraints': {
+            'primary_keys': [{'table': 'upsert_person',
+                              'fields': ['person_id']},
+                             {'table': 'upsert_visit',
+                              'fields': ['visit_id', 'person_id']}]
+        },
+        'indexes': []
+    },
+    'tables': [{'name': 'upsert_person', 'fields': [{'type': 'integer',
+                                                     'name': 'person_id'},
+                                                    {'type': 'string',
+                                                     'name': 'gender',
+                                                     'length': 8}]},
+               {'name': 'upsert_visit', 'fields': [{'type': 'integer',
+                                                    'name': 'visit_id'},
+                                                   {'type': 'integer',
+                                                    'name': 'person_id'},
+                                                   {'type': 'date',
+                                                    'name': 'day'}]}]
+}
+
+Person, Visit = make_model(model_json, (Model,), 'dmdj.tests', 'upsert')
+
+
+def create_tables(using):
+
+    with connections[using].schema_editor() as editor:
+        editor.create_model(Person)
+        editor.create_model(Visit)
+
+
+def drop_tables(using):
+
+    with connections[using].schema_editor() as editor:
+        editor.delete_model(Visit)
+        editor.delete_model(Person)
+
+
+@pytest.fixture(scope='module')
+def tables():
+
+    create_tables('default')
+    yield 'default'
+    drop_tables('default')
+
+
+def test_natural_key():
+
+    assert natural_key(Person) == ('person_id',)
+    assert natural_key(Visit) == ('visit_id', 'person_id')
+
+
+def test_upsert_rows(tables):
+
+    stats = upsert_rows(Person, ['person_id', 'gender'],
+                        [(1, 'F'), (2, 'M'), (3, None)])
+
+    assert (stats.rows, stats.written) == (3, 3)
+
+    stats = upsert_rows(Person, ['person_id', 'gender'],
+                        [(1, 'F'), (2, 'F'), (4, 'M')], batch_size=2)
+
+    # The unchanged row isn't rewritten.
+    assert (stats.rows, stats.written, stats.batches) == (3, 2, 2)
+    assert list(Person.objects.order_by('person_id').values_list(
+        'person_id', 'gender')) == [(1, 'F'), (2, 'F'), (3, None), (4, 'M')]
+
+
+def test_upsert_csv_hashes(tables):
+
+    hashes = {}
+
+    stats = upsert_csv(Visit, io.StringIO(u'''visit_id,person_id,day
+1,1,2016-01-01
+1,2,2016-01-02
+'''), hashes=hashes)
+
+    assert (stats.rows, stats.skipped, stats.written) == (2, 0, 2)
+    assert len(hashes) == 2
+
+    stats = upsert_csv(Visit, io.StringIO(u'''visit_id,person_id,day
+1,1,2016-01-01
+1,2,2016-02-02
+2,2,2016-01-03
+'''), hashes=hashes)
+
+    assert (stats.rows, stats.skipped, stats.written) == (3, 1, 2)
+    assert sorted(Visit.objects.values_list('visit_id', 'person_id',
+                                            'day')) == [
+        (1, 1, django.utils.dateparse.parse_date('2016-01-01')),
+        (1, 2, django.utils.dateparse.parse_date('2016-02-02')),
+        (2, 2, django.utils.dateparse.parse_date('2016-01-03'))]
+
+
+def test_upsert_hashes_rollback(tables):
+
+    hashes = {}
+
+    # Digests are only stored once the caller's transaction commits.
+    try:
+        with transaction.atomic():
+            upsert_rows(Person, ['person_id', 'gender'], [(21, 'F')],
+                        hashes=hashes, transaction_mode=None)
+            raise RuntimeError
+    except RuntimeError:
+        pass
+
+    assert hashes == {}
+    assert not Person.objects.filter(person_id=21).exists()
+
+    with transaction.atomic():
+        upsert_rows(Person, ['person_id', 'gender'], [(21, 'F')],
+                    hashes=hashes, transaction_mode='batch')
+        assert hashes == {}
+
+    assert len(hashes) == (1 if hasattr(transaction, 'on_commit') else 0)
+
+
+def test_upsert_sql():
+
+    sql = _upsert_sql(connection, 'upsert_visit', ['visit_id', 'person_id',
+                                                   'day', 'id'],
+                      ('visit_id', 'person_id'), 1, 'id')
+
+    assert 'SET "day" = excluded."day" WHERE' in sql
+    assert '"id" = excluded' not in sql
+
+
+def check_surrogate_ids(using):
+
+    visits = Visit.objects.using(using)
+    top = max([0] + list(visits.values_list('id', flat=True)))
+
+    # The repeated key is sent once, with the last row's values.
+    stats = upsert_rows(Visit, ['visit_id', 'person_id', 'day'],
+                        [(5, 5, date(2016, 1, 1)), (6, 5, date(2016, 1, 1)),
+                         (5, 5, date(2016, 1, 2))], using=using)
+
+    assert (stats.rows, stats.skipped, stats.written) == (3, 1, 2)
+
+    ids = dict(visits.filter(person_id=5).values_list('visit_id', 'id'))
+
+    assert sorted(ids.values()) == [top + 1, top + 2]
+
+    upsert_rows(Visit, ['visit_id', 'person_id', 'day'],
+                [(5, 5, date(2016, 1, 3))], using=using)
+
+    # Existing rows keep their ids.
+    assert list(visits.filter(person_id=5, visit_id=5).values_list(
+        'id', 'day')) == [(ids[5], date(2016, 1, 3))]
+
+
+def test_upsert_surrogate_ids(tables):
+
+    check_surrogate_ids(tables)
+
+
+@pytest.fixture(scope='module')
+def postgres():
+    # A PostgreSQL database to test against, named by DMDJ_TEST_POSTGRES and
+    # reached with the libpq environment variables (PGHOST, PGUSER...).
+    name = os.environ.get('DMDJ_TEST_POSTGRES')
+
+    if not name:
+        pytest.skip('DMDJ_TEST_POSTGRES is not set')
+
+    pytest.importorskip('psycopg2')
+
+    connections.databases['postgres'] = {
+        'ENGINE': 'django.db.backends.postgresql_psycopg2', 'NAME': name}
+
+    create_tables('postgres')
+    yield 'postgres'
+    drop_tables('postgres')
+
+    connections['postgres'].close()
+    del connections.databases['postgres']
+
+
+def test_upsert_postgres(postgres):
+
+    stats = upsert_rows(Person, ['person_id', 'gender'],
+                        [(1, 'F'), (2, 'M'), (1, 'M')], using=postgres)
+
+    assert (stats.rows, stats.written) == (3, 2)
+
+    stats = upsert_rows(Person, ['person_id', 'gender'],
+                        [(1, 'M'), (2, 'F')], using=postgres)
+
+    assert stats.written == 1
+
+    check_surrogate_ids(postgres)
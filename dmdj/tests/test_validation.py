@@ -0,0 +1,152 @@
+import io
+
+import django
+from django.db.models import Model
+from dmdj.makers import make_model
+from dmdj.validation import KeySet, validate_csv, validate_tables
+
+if not django.conf.settings.configured:
+    django.conf.settings.configure()
+
+if hasattr(django, 'setup'):
+    django.setup()
+
+
+def field(datatype, name, length=0, precision=0, scale=0):
+    return {'type': datatype, 'name': name, 'length': length,
+            'precision': precision, 'scale': scale}
+
+
+model_json = {
+    'schema': {
+        'constraints': {
+            'primary_keys': [{'table': 'val_person', 'fields': ['person_id']}],
+            'foreign_keys': [{'source_table': 'val_visit',
+                              'source_field': 'person_id',
+                              'target_table': 'val_person',
+                              'target_field': 'person_id'}],
+            'uniques': [{'table': 'val_visit', 'fields': ['person_id',
+                                                          'day']}],
+            'not_null': [{'table': 'val_person', 'field': 'gender'}]
+        },
+        'indexes': []
+    },
+    'tables': [{'name': 'val_person',
+                'fields': [field('integer', 'person_id'),
+                           field('string', 'gender', 2),
+                           field('smallinteger', 'siblings')]},
+               {'name': 'val_visit',
+                'fields': [field('integer', 'person_id'),
+                           field('date', 'day'),
+                           field('decimal', 'cost', precision=5, scale=2)]}]
+}
+
+Person, Visit = make_model(model_json, (Model,), 'dmdj.tests', 'validation')
+
+people = u'''person_id,gender,siblings
+1,F,0
+2,,1
+2,M,40000
+3,FEMALE,x
+'''
+
+visits = u'''person_id,day,cost
+1,2016-01-01,10.50
+1,2016-01-01,1000.5
+9,2016-02-30,1.125
+3,2016-01-02
+'''
+
+
+def write(tmpdir, name, text):
+
+    path = str(tmpdir.join(name))
+
+    with io.open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+    return path
+
+
+def check(report):
+
+    assert report.rows == {'val_person': 4, 'val_visit': 4}
+    assert report.counts == {
+        ('val_person', 'gender', 'not_null'): 1,
+        ('val_person', 'gender', 'length'): 1,
+        ('val_person', 'siblings', 'range'): 1,
+        ('val_person', 'siblings', 'type'): 1,
+        ('val_person', 'person_id', 'unique'): 1,
+        ('val_visit', None, 'columns'): 1,
+        ('val_visit', 'day', 'type'): 1,
+        ('val_visit', 'cost', 'precision'): 1,
+        ('val_visit', 'cost', 'scale'): 1,
+        ('val_visit', 'person_id, day', 'unique'): 1,
+        ('val_visit', 'person_id', 'foreign_key'): 1
+    }
+    assert report.examples['val_person', 'person_id', 'unique'] == [
+        (3, '2, as row 2')]
+    assert report.examples['val_visit', 'person_id', 'foreign_key'] == [
+        (3, '9')]
+
+
+def test_validate(tmpdir):
+
+    sources = {'val_person': write(tmpdir, 'person.csv', people),
+               'val_visit': write(tmpdir, 'visit.csv', visits)}
+
+    report = validate_tables([Person, Visit], sources, workers=1)
+
+    check(report)
+    assert not report
+    assert report.format().splitlines()[0] == \
+        "val_person.gender not_null: 1 rows, e.g. row 2: ''"
+
+
+def test_validate_parallel(tmpdir):
+
+    sources = {'val_person': write(tmpdir, 'person.csv', people),
+               'val_visit': write(tmpdir, 'visit.csv', visits)}
+
+    check(validate_tables([Person, Visit], sources, workers=2,
+                          chunk_size=1, max_keys=1))
+
+
+def test_validate_csv(tmpdir):
+
+    report = validate_csv(Visit, write(tmpdir, 'visit.csv', u'''person_id,day
+1,2016-01-01
+9,2016-01-01
+'''))
+
+    assert report
+
+
+def test_validate_formats(tmpdir):
+
+    source = write(tmpdir, 'formats.csv', u'''person_id,day
+1,01/02/2016
+''')
+
+    assert validate_csv(Visit, source, workers=1,
+                        formats={'date': '%m/%d/%Y'})
+
+    # The checker of the first call isn't reused with other formats.
+    report = validate_csv(Visit, source, workers=1)
+
+    assert report.counts == {('val_visit', 'day', 'type'): 1}
+
+
+def test_key_set(tmpdir):
+
+    keys = KeySet(max_keys=2, directory=str(tmpdir))
+    keys.extend([('b', 1), ('a', 2), ('c', 3)])
+    keys.extend([('a', 4)])
+
+    assert len(keys.runs) == 1
+    assert len(keys) == 4
+    assert list(keys) == [('a', 2), ('a', 4), ('b', 1), ('c', 3)]
+
+    keys.close()
+
+    assert tmpdir.listdir() == []
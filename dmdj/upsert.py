@@ -0,0 +1,321 @@
+import hashlib
+import io
+import sqlite3
+import time
+from collections import OrderedDict, namedtuple
+
+from django.db import connections, transaction
+from django.db.models import Max
+
+from dmdj.converters import make_converter
+from dmdj.loaders import (PY2, TRANSACTION_MODES, _batches, _nullcontext,
+                          _read_rows, get_columns)
+from dmdj.makers import PKEY_JSON
+
+try:
+    text_type = unicode
+except NameError:  # Python 3
+    text_type = str
+
+# SQLite supports INSERT ... ON CONFLICT DO UPDATE from 3.24.0.
+SQLITE_UPSERT_VERSION = (3, 24, 0)
+
+
+class UpsertStats(namedtuple('UpsertStats', ['rows', 'skipped', 'written',
+                                             'batches', 'seconds'])):
+    """Rows read, rows `skipped` because their hash was unchanged or a
+    later row of their batch has the same key, rows inserted or updated
+    (`written`), batches sent and the seconds it took.
+    """
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else float(self.rows)
+
+
+def _is_surrogate(field):
+    # The `id` primary key `make_table` adds to tables without a primary key
+    # or with a composite one.
+    return field.name == PKEY_JSON['name'] and \
+        text_type(field.help_text) == PKEY_JSON['description']
+
+
+def natural_key(model):
+    """Returns the tuple of database column names identifying a generated
+    model's rows in the data model.
+
+    That is the primary key column, unless it is the surrogate `id`
+    `make_table` adds, in which case it is the columns of the data model's
+    composite primary key, which `make_table` turns into the last of the
+    model's `unique_together` constraints (the `xnk_` unique) with not null
+    fields. A `ValueError` is raised if the table has neither.
+    """
+
+    pk = model._meta.pk
+
+    if not _is_surrogate(pk):
+        return (pk.column,)
+
+    fields = dict((f.name, f) for f in model._meta.concrete_fields)
+
+    for names in reversed(model._meta.unique_together):
+        if not any(fields[n].null for n in names):
+            return tuple(fields[n].column for n in names)
+
+    raise ValueError('%s has no natural key' % model.__name__)
+
+
+def _digest(values):
+
+    text = '\x1f'.join('\x00' if v is None else text_type(v) for v in values)
+
+    return hashlib.md5(text.encode('utf-8')).hexdigest()
+
+
+def _upsert_sql(connection, table, columns, key, rows, pk):
+
+    quote = connection.ops.quote_name
+    placeholders = '(%s)' % ', '.join(['%s'] * len(columns))
+    # The primary key of an existing row is never rewritten.
+    others = [c for c in columns if c not in key and c != pk]
+
+    sql = 'INSERT INTO %s (%s) VALUES %s ON CONFLICT (%s) ' % (
+        quote(table), ', '.join(quote(c) for c in columns),
+        ', '.join([placeholders] * rows), ', '.join(quote(c) for c in key))
+
+    if not others:
+        return sql + 'DO NOTHING'
+
+    distinct = 'IS DISTINCT FROM' if connection.vendor == 'postgresql' \
+        else 'IS NOT'
+
+    # Rows that haven't changed aren't rewritten.
+    return sql + 'DO UPDATE SET %s WHERE %s' % (
+        ', '.join('%s = excluded.%s' % (quote(c), quote(c)) for c in others),
+        ' OR '.join('%s.%s %s excluded.%s' % (quote(table), quote(c),
+                                              distinct, quote(c))
+                    for c in others))
+
+
+def _check_vendor(connection):
+
+    if connection.vendor == 'postgresql':
+        return
+
+    if connection.vendor == 'sqlite' and \
+            sqlite3.sqlite_version_info >= SQLITE_UPSERT_VERSION:
+        return
+
+    raise ValueError('Upserts need PostgreSQL or SQLite %s or later' %
+                     '.'.join(str(v) for v in SQLITE_UPSERT_VERSION))
+
+
+def _upsert(model, columns, rows, key, hashes, batch_size, using,
+            transaction_mode, progress, convert=None):
+    # Keys and digests are made from the `rows` as given, and only the rows
+    # sent are converted to Python values with `convert`.
+    if transaction_mode not in TRANSACTION_MODES:
+        raise ValueError('transaction_mode must be one of %r' %
+                         (TRANSACTION_MODES,))
+
+    connection = connections[using]
+    _check_vendor(connection)
+
+    if key is None:
+        key = natural_key(model)
+
+    missing = [c for c in key if c not in columns]
+
+    if missing:
+        raise ValueError('The key columns %s are missing' % ', '.join(missing))
+
+    pk = model._meta.pk
+    columns = list(columns)
+    positions = [columns.index(c) for c in key]
+    table = model._meta.db_table
+
+    # The surrogate `id` isn't serial, so rows without one are given the
+    # next ids after the table's largest, which an existing row keeps.
+    add_ids = _is_surrogate(pk) and pk.column not in columns
+
+    if add_ids:
+        columns.append(pk.column)
+
+    fields = [get_columns(model)[c] for c in columns]
+
+    size = min(batch_size, connection.ops.bulk_batch_size(
+        fields, [None] * batch_size))
+    statements = {}
+
+    # The digests of the rows sent, stored in `hashes` once committed.
+    digests = {}
+
+    def store():
+        # In a transaction the caller owns, the digests are only stored when
+        # it commits (and not at all before Django 1.9, which can't tell),
+        # so a rollback doesn't leave the digests of rows never written.
+        if connection.in_atomic_block:
+            if hasattr(transaction, 'on_commit'):
+                transaction.on_commit(
+                    lambda committed=dict(digests): hashes.update(committed),
+                    using)
+        else:
+            hashes.update(digests)
+        digests.clear()
+
+    def changed(batch):
+        for row in batch:
+            row_key = '\x1f'.join(text_type(row[i]) for i in positions)
+            digest = _digest(row)
+            if hashes.get(row_key) != digest:
+                digests[row_key] = digest
+                yield row
+
+    def dedupe(batch):
+        # A statement can't update a row twice, so only the last row of a
+        # key in a batch is sent.
+        last = OrderedDict()
+        for row in batch:
+            row_key = tuple(row[i] for i in positions)
+            last.pop(row_key, None)
+            last[row_key] = row
+        return batch if len(last) == len(batch) else list(last.values())
+
+    next_id = []
+
+    def with_ids(batch):
+        if not next_id:
+            top = model._default_manager.using(using).aggregate(
+                top=Max(pk.attname))['top']
+            next_id.append((top or 0) + 1)
+        start = next_id[0]
+        next_id[0] += len(batch)
+        return [tuple(row) + (start + i,) for i, row in enumerate(batch)]
+
+    def send(batch):
+
+        if len(batch) not in statements:
+            statements[len(batch)] = _upsert_sql(connection, table, columns,
+                                                 key, len(batch), pk.column)
+
+        params = []
+
+        for values in batch:
+            params.extend(field.get_db_prep_save(value, connection)
+                          for field, value in zip(fields, values))
+
+        with connection.cursor() as cursor:
+            cursor.execute(statements[len(batch)], params)
+            return max(cursor.rowcount, 0)
+
+    start = time.time()
+    stats = UpsertStats(0, 0, 0, 0, 0.0)
+
+    with transaction.atomic(using) if transaction_mode == 'load' else \
+            _nullcontext():
+
+        for batch in _batches(rows, size):
+
+            sent = batch if hashes is None else list(changed(batch))
+
+            if convert is not None:
+                sent = [convert(row) for row in sent]
+
+            sent = dedupe(sent)
+            written = 0
+
+            if sent:
+                with transaction.atomic(using) if \
+                        transaction_mode == 'batch' else _nullcontext():
+                    written = send(with_ids(sent) if add_ids else sent)
+
+            if transaction_mode != 'load' and digests:
+                store()
+
+            stats = UpsertStats(stats.rows + len(batch),
+                                stats.skipped + len(batch) - len(sent),
+                                stats.written + written,
+                                stats.batches + bool(sent),
+                                time.time() - start)
+
+            if progress:
+                progress(stats)
+
+    if digests:
+        store()
+
+    return stats._replace(seconds=time.time() - start)
+
+
+def upsert_rows(model, columns, rows, key=None, hashes=None, batch_size=1000,
+                using='default', transaction_mode='load', progress=None):
+    """Inserts rows into a model's table, updating the rows with the same
+    natural key instead where they exist, and returns `UpsertStats`.
+
+    `model` is a Django model class, such as one generated by `make_model`,
+    `columns` the database column names (the data model's field names) of
+    the values in each row and `rows` an iterable of sequences of Python
+    values. Columns missing from `columns` are left to their defaults.
+
+    `key` is the columns identifying a row, by default `natural_key(model)`,
+    which must be among `columns` and have a unique constraint. Rows are
+    sent in batches of `batch_size` (fewer on SQLite, which limits the
+    number of query parameters) with PostgreSQL's or SQLite's `INSERT ...
+    ON CONFLICT DO UPDATE`, which only rewrites the existing rows whose
+    values have changed, and never their primary key. Of the rows of a batch
+    with the same key, only the last is sent.
+
+    If `columns` doesn't include the surrogate `id` primary key `make_table`
+    adds, new rows are given the ids following the table's largest, so
+    upserts into such a table shouldn't run concurrently.
+
+    `hashes`, if given, is a mutable mapping of string keys to string
+    digests of each row's values, e.g. `{}` or a `shelve` kept from the
+    previous refresh. Rows whose digest is unchanged are skipped without
+    being sent, and the digests of the rows sent are stored once they are
+    committed, so a refresh only sends the rows that changed since the last
+    one. Inside a transaction of the caller's, they are stored when it
+    commits, or on Django 1.7 and 1.8 not at all.
+
+    `transaction_mode` and `progress` are as for `dmdj.loaders.load_csv`.
+    """
+
+    return _upsert(model, columns, rows, key, hashes, batch_size, using,
+                   transaction_mode, progress)
+
+
+def upsert_csv(model, source, key=None, hashes=None, delimiter=',',
+               batch_size=1000, using='default', transaction_mode='load',
+               null='', encoding='utf-8', formats=None, progress=None):
+    """Upserts the rows of a delimited file into a model's table with
+    `upsert_rows` and returns `UpsertStats`.
+
+    `source` is read as by `dmdj.loaders.load_csv`, whose other arguments
+    have the same meaning. Digests in `hashes` are of the raw values, so a
+    mapping used with `upsert_csv` shouldn't be used with `upsert_rows`.
+    """
+
+    if not hasattr(source, 'read'):
+        if PY2:
+            fp = open(source, 'rb')
+        else:
+            fp = io.open(source, newline='', encoding=encoding)
+        with fp:
+            return upsert_csv(model, fp, key, hashes, delimiter, batch_size,
+                              using, transaction_mode, null, encoding,
+                              formats, progress)
+
+    rows = _read_rows(source, delimiter, encoding)
+
+    columns = get_columns(model)
+    header = next(rows, [])
+    unknown = [name for name in header if name not in columns]
+
+    if unknown:
+        raise ValueError('%s has no columns named %s' % (
+            model.__name__, ', '.join(unknown)))
+
+    convert = make_converter(model, header, null, formats)
+
+    return _upsert(model, header, rows, key, hashes, batch_size, using,
+                   transaction_mode, progress, convert)
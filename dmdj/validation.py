@@ -0,0 +1,487 @@
+import heapq
+import io
+import itertools
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+from collections import OrderedDict
+from decimal import Decimal
+
+from django.apps import apps
+
+from dmdj.converters import get_cell_converter, get_target_field
+from dmdj.loaders import PY2, _InlinePool, _batches, _make_pool, _read_rows
+
+try:
+    text_type = unicode
+except NameError:  # Python 3
+    text_type = str
+
+INTEGER_RANGES = {
+    'SmallIntegerField': (-2 ** 15, 2 ** 15 - 1),
+    'PositiveSmallIntegerField': (0, 2 ** 15 - 1),
+    'IntegerField': (-2 ** 31, 2 ** 31 - 1),
+    'PositiveIntegerField': (0, 2 ** 31 - 1),
+    'AutoField': (-2 ** 31, 2 ** 31 - 1),
+    'BigIntegerField': (-2 ** 63, 2 ** 63 - 1),
+    'BigAutoField': (-2 ** 63, 2 ** 63 - 1)
+}
+
+# The checks a value can fail, in report order.
+CHECKS = ('columns', 'not_null', 'type', 'range', 'length', 'precision',
+          'scale', 'unique', 'foreign_key')
+
+
+def _rel(field):
+    return field.remote_field if hasattr(field, 'remote_field') else field.rel
+
+
+def _key_text(value):
+    # Equal values of a type give equal text, e.g. 1.5 and 1.50.
+    if isinstance(value, Decimal):
+        value = value.normalize()
+    return value if isinstance(value, text_type) else text_type(value)
+
+
+class KeySet(object):
+    """(key, row) pairs of string keys and the rows they were read from,
+    iterated in sorted order. Up to `max_keys` pairs are kept in memory; more
+    are spilled to sorted runs in temporary files in `directory`, which are
+    merged when iterated, so memory stays bounded however many keys are
+    added. Call `close` to remove the files.
+    """
+
+    def __init__(self, max_keys=1000000, directory=None):
+
+        self.max_keys = max_keys
+        self.directory = directory
+        self.runs = []
+        self._items = []
+
+    def __len__(self):
+        return len(self._items) + sum(n for path, n in self.runs)
+
+    def extend(self, items):
+
+        self._items.extend(items)
+
+        if len(self._items) >= self.max_keys:
+            self._spill()
+
+    def _spill(self):
+
+        fd, path = tempfile.mkstemp(prefix='dmdj-keys-', dir=self.directory)
+
+        with os.fdopen(fd, 'w') as f:
+            for key, row in sorted(self._items):
+                f.write('%s\t%d\n' % (key, row))
+
+        self.runs.append((path, len(self._items)))
+        self._items = []
+
+    @staticmethod
+    def _read_run(path):
+
+        with open(path) as f:
+            for line in f:
+                key, row = line.rstrip('\n').rsplit('\t', 1)
+                yield key, int(row)
+
+    def __iter__(self):
+
+        iterators = [self._read_run(path) for path, n in self.runs]
+        iterators.append(iter(sorted(self._items)))
+
+        return heapq.merge(*iterators)
+
+    def close(self):
+
+        for path, n in self.runs:
+            os.remove(path)
+
+        self.runs = []
+        self._items = []
+
+
+class Report(object):
+    """The outcome of a validation: the number of `rows` read per table and,
+    per (table, column, check), the number of failures in `counts` and up to
+    `max_examples` (row, value) examples in `examples`. Rows are numbered
+    from 1, the first row after the header. Checks are those in `CHECKS`.
+    """
+
+    def __init__(self, max_examples=10):
+
+        self.max_examples = max_examples
+        self.rows = OrderedDict()
+        self.counts = {}
+        self.examples = {}
+
+    def __bool__(self):
+        return not self.counts
+
+    __nonzero__ = __bool__
+
+    def add(self, table, column, check, row, value, count=1):
+
+        key = (table, column, check)
+        self.counts[key] = self.counts.get(key, 0) + count
+        examples = self.examples.setdefault(key, [])
+
+        if len(examples) < self.max_examples:
+            examples.append((row, value))
+
+    def _merge(self, table, counts, examples):
+        # Adds a worker's counts and examples for one table.
+        for (column, check), count in counts.items():
+            key = (table, column, check)
+            self.counts[key] = self.counts.get(key, 0) + count
+            kept = self.examples.setdefault(key, [])
+            room = self.max_examples - len(kept)
+            kept.extend(examples[column, check][:room])
+
+    def format(self):
+        """Returns the report as text, a line per table, column and check
+        that failed, ordered by table, column and check.
+        """
+
+        tables = list(self.rows)
+        lines = []
+
+        def order(key):
+            table, column, check = key
+            return (tables.index(table) if table in tables else -1,
+                    column or '', CHECKS.index(check))
+
+        for key in sorted(self.counts, key=order):
+            table, column, check = key
+            examples = ', '.join("row %d: '%s'" % e for e in sorted(
+                self.examples[key]))
+            lines.append('%s.%s %s: %d rows, e.g. %s' % (
+                table, column or '-', check, self.counts[key], examples))
+
+        return '\n'.join(lines)
+
+
+class _TableChecker(object):
+    # Checks chunks of a table's rows, in worker processes, against its
+    # model's fields: the row-local checks, plus the keys of the unique and
+    # foreign key checks, which need every row and are left to the caller.
+
+    def __init__(self, model, header, null='', formats=None):
+
+        fields = dict((f.column, f) for f in model._meta.concrete_fields)
+        unknown = [name for name in header if name not in fields]
+
+        if unknown:
+            raise ValueError('%s has no columns named %s' % (
+                model.__name__, ', '.join(unknown)))
+
+        self.null = null
+        self.width = len(header)
+        self.columns = []
+        self.key_specs = []
+
+        position = dict((c, i) for i, c in enumerate(header))
+
+        for i, column in enumerate(header):
+
+            field = fields[column]
+            target = get_target_field(field)
+            internal_type = target.get_internal_type()
+
+            self.columns.append((
+                i, column, field.primary_key or not field.null,
+                # Decimals are parsed as they are, for the scale and
+                # precision checks, rather than rounded as they'd be loaded.
+                Decimal if internal_type == 'DecimalField' else
+                get_cell_converter(field, formats),
+                INTEGER_RANGES.get(internal_type),
+                target.max_length if internal_type == 'CharField' else None,
+                (target.max_digits, target.decimal_places)
+                if internal_type == 'DecimalField' else None))
+
+            if field.primary_key or field.unique:
+                self.key_specs.append(('unique', (column,), (i,)))
+
+            if _rel(field) is not None:
+                self.key_specs.append((
+                    'foreign_key', (column, target.model._meta.db_table,
+                                    target.column), (i,)))
+
+        names = dict((f.name, f.column) for f in model._meta.concrete_fields)
+
+        for field_names in model._meta.unique_together:
+            columns = tuple(names[n] for n in field_names)
+            if all(c in position for c in columns):
+                self.key_specs.append((
+                    'unique', columns, tuple(position[c] for c in columns)))
+
+    def check(self, start, rows, max_examples=10):
+
+        null = self.null
+        counts = {}
+        examples = {}
+        keys = [[] for spec in self.key_specs]
+
+        def fail(column, check, row, value):
+            key = (column, check)
+            counts[key] = counts.get(key, 0) + 1
+            found = examples.setdefault(key, [])
+            if len(found) < max_examples:
+                found.append((row, value))
+
+        for n, cells in enumerate(rows, start):
+
+            if len(cells) != self.width:
+                fail(None, 'columns', n, '%d cells' % len(cells))
+                continue
+
+            values = {}
+
+            for i, column, not_null, convert, bounds, max_length, digits in \
+                    self.columns:
+
+                value = cells[i]
+
+                if value == null:
+                    if not_null:
+                        fail(column, 'not_null', n, value)
+                    continue
+
+                if max_length is not None and len(value) > max_length:
+                    fail(column, 'length', n, value)
+
+                if convert is None:
+                    values[i] = value
+                    continue
+
+                try:
+                    parsed = convert(value)
+                except Exception:
+                    parsed = None
+
+                if parsed is None:
+                    fail(column, 'type', n, value)
+                    continue
+
+                values[i] = parsed
+
+                if bounds is not None and not \
+                        bounds[0] <= parsed <= bounds[1]:
+                    fail(column, 'range', n, value)
+
+                if digits is not None:
+                    digit_tuple, exponent = parsed.as_tuple()[1:]
+                    if not isinstance(exponent, int):
+                        fail(column, 'type', n, value)
+                    elif -exponent > digits[1]:
+                        fail(column, 'scale', n, value)
+                    elif len(digit_tuple) + exponent > digits[0] - digits[1]:
+                        fail(column, 'precision', n, value)
+
+            for found, (kind, spec, indexes) in zip(keys, self.key_specs):
+                if all(i in values for i in indexes):
+                    found.append((json.dumps([_key_text(values[i])
+                                              for i in indexes]), n))
+
+        return len(rows), counts, examples, keys
+
+
+# The checkers of the `validate_tables` call whose chunks are being checked
+# in this process, keyed by table and header, and that call's number.
+_checkers = {}
+_runs = itertools.count()
+_run = [None]
+
+
+def _check_chunk(task):
+    # Runs in a worker process, which looks the model up by name and keeps
+    # its checker for the following chunks of the same file. Checkers are
+    # only kept for one `validate_tables` call, whose `null`, `formats` and
+    # models may differ from the last one's.
+    run, app_label, model_name, header, null, formats, start, rows, \
+        max_examples = task
+    key = (app_label, model_name, tuple(header))
+
+    if _run[0] != run:
+        _checkers.clear()
+        _run[0] = run
+
+    if key not in _checkers:
+        model = apps.all_models[app_label][model_name]
+        _checkers[key] = _TableChecker(model, header, null, formats)
+
+    return _checkers[key].check(start, rows, max_examples)
+
+
+def _open(source, encoding):
+
+    if PY2:
+        return open(source, 'rb')
+
+    return io.open(source, newline='', encoding=encoding)
+
+
+def _check_keys(report, uniques, foreign_keys):
+
+    for (table, columns), keys in uniques.items():
+
+        previous = None
+
+        for key, row in keys:
+            if previous is not None and key == previous[0]:
+                report.add(table, ', '.join(columns), 'unique', row,
+                           '%s, as row %d' % (', '.join(json.loads(key)),
+                                              previous[1]))
+            else:
+                previous = (key, row)
+
+    for (table, spec), keys in foreign_keys.items():
+
+        column, target_table, target_column = spec
+
+        targets = uniques.get((target_table, (target_column,)))
+
+        # Foreign keys to tables that weren't validated aren't checked.
+        if targets is None:
+            continue
+
+        targets = iter(targets)
+        target = next(targets, None)
+
+        for key, row in keys:
+            while target is not None and target[0] < key:
+                target = next(targets, None)
+            if target is None or target[0] != key:
+                report.add(table, column, 'foreign_key', row,
+                           json.loads(key)[0])
+
+
+def validate_tables(models, sources, workers=None, chunk_size=10000,
+                    delimiter=',', null='', encoding='utf-8', formats=None,
+                    max_keys=1000000, max_examples=10, directory=None):
+    """Checks delimited files against the constraints of the models of
+    their tables and returns a `Report` of the failures.
+
+    `models` and `sources` are as for `dmdj.loaders.load_tables`, and files
+    are read as by `dmdj.loaders.load_csv`, with `delimiter`, `null`,
+    `encoding` and `formats`.
+
+    Each row is checked for missing or extra cells, and each value for not
+    null constraints, parsing as the field's type, integer ranges, string
+    lengths and decimal precisions and scales, in chunks of `chunk_size`
+    rows spread over `workers` worker processes (the number of CPUs by
+    default; with one, in this process). The workers are forked, as for
+    `load_tables`.
+
+    Primary keys, unique fields and composite unique constraints are checked
+    for duplicates and foreign keys for values missing from the validated
+    file of the table they point to, which must be among `sources`. Their
+    keys are kept in `KeySet`s, which hold up to `max_keys` keys in memory
+    each and spill the rest to sorted runs in `directory`, a temporary
+    directory by default.
+    """
+
+    by_table = dict((m._meta.db_table, m) for m in models)
+    unknown = [t for t in sources if t not in by_table]
+
+    if unknown:
+        raise ValueError('No models for tables %s' % ', '.join(unknown))
+
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+
+    run = next(_runs)
+    report = Report(max_examples)
+    uniques = OrderedDict()
+    foreign_keys = OrderedDict()
+    spill_directory = directory or tempfile.mkdtemp(prefix='dmdj-')
+    pool = _InlinePool() if workers <= 1 else _make_pool(workers)
+
+    def merge(table, key_sets, result):
+
+        rows, counts, examples, keys = result
+        report.rows[table] += rows
+        report._merge(table, counts, examples)
+
+        for key_set, found in zip(key_sets, keys):
+            key_set.extend(found)
+
+    try:
+        for table in [m._meta.db_table for m in models]:
+
+            if table not in sources:
+                continue
+
+            model = by_table[table]
+            report.rows[table] = 0
+
+            with _open(sources[table], encoding) as fp:
+
+                rows = _read_rows(fp, delimiter, encoding)
+                header = next(rows, [])
+                checker = _TableChecker(model, header, null, formats)
+                key_sets = []
+
+                for kind, spec, indexes in checker.key_specs:
+                    group = uniques if kind == 'unique' else foreign_keys
+                    key_sets.append(group.setdefault(
+                        (table, spec), KeySet(max_keys, spill_directory)))
+
+                # At most two chunks per worker are in flight, so the file
+                # is read no faster than it is checked.
+                pending = []
+                start = 1
+
+                for batch in _batches(rows, chunk_size):
+
+                    task = (run, model._meta.app_label,
+                            model._meta.model_name, header, null, formats,
+                            start, batch, max_examples)
+                    start += len(batch)
+
+                    if workers <= 1:
+                        merge(table, key_sets, _check_chunk(task))
+                        continue
+
+                    pending.append(pool.apply_async(_check_chunk, (task,)))
+
+                    while len(pending) >= 2 * workers:
+                        merge(table, key_sets, pending.pop(0).get())
+
+                while pending:
+                    merge(table, key_sets, pending.pop(0).get())
+
+        pool.close()
+
+        _check_keys(report, uniques, foreign_keys)
+
+    except BaseException:
+        pool.terminate()
+        raise
+
+    finally:
+        pool.join()
+
+        _checkers.clear()
+        _run[0] = None
+
+        for key_set in list(uniques.values()) + list(foreign_keys.values()):
+            key_set.close()
+
+        if directory is None:
+            shutil.rmtree(spill_directory, ignore_errors=True)
+
+    return report
+
+
+def validate_csv(model, source, **kwargs):
+    """Checks a delimited file against the constraints of a model's table and
+    returns a `Report`, as `validate_tables` does for one table. Foreign
+    keys to other tables aren't checked.
+    """
+
+    return validate_tables([model], {model._meta.db_table: source}, **kwargs)
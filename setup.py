@@ -43,6 +43,9 @@ setuptools.setup(
     author_email='cbmisupport@email.chop.edu',
     license='Other/Proprietary',
     packages=setuptools.find_packages(),
+    entry_points={
+        'console_scripts': ['dmdj = dmdj.cli:main']
+    },
     install_requires=[
         'Django>=1.7,<1.11'
     ],